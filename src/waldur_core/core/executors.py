@@ -47,6 +47,32 @@ class BaseExecutor:
     ):
         """ Execute high level-operation """
         cls.pre_apply(instance, is_async=is_async, **kwargs)
+        return cls.apply_signature(
+            instance,
+            is_async=is_async,
+            countdown=countdown,
+            is_heavy_task=is_heavy_task,
+            **kwargs
+        )
+
+    @classmethod
+    def execute_many(cls, instances, **kwargs):
+        """ Execute high level-operation for several instances.
+
+        Synchronous actions are performed by pre_apply_many, so that
+        state changes could be applied to all instances at once.
+        """
+        # Subclass may extend execute, in this case it is called for each instance
+        if cls.execute.__func__ is not BaseExecutor.execute.__func__:
+            return [cls.execute(instance, **kwargs) for instance in instances]
+        instances = cls.pre_apply_many(instances, **kwargs)
+        return [cls.apply_signature(instance, **kwargs) for instance in instances]
+
+    @classmethod
+    def apply_signature(
+        cls, instance, is_async=True, countdown=2, is_heavy_task=False, **kwargs
+    ):
+        """ Apply signature of already pre-applied instance """
         serialized_instance = utils.serialize_instance(instance)
 
         signature = cls.get_task_signature(instance, serialized_instance, **kwargs)
@@ -73,6 +99,15 @@ class BaseExecutor:
         """ Perform synchronous actions before signature apply """
         pass
 
+    @classmethod
+    def pre_apply_many(cls, instances, **kwargs):
+        """ Perform synchronous actions for several instances.
+            Return instances for which signature should be applied.
+        """
+        for instance in instances:
+            cls.pre_apply(instance, **kwargs)
+        return instances
+
     @classmethod
     def as_signature(cls, instance, **kwargs):
         serialized_instance = utils.serialize_instance(instance)
@@ -183,6 +218,13 @@ class DeleteExecutor(DeleteExecutorMixin, BaseExecutor):
         instance.schedule_deleting()
         instance.save(update_fields=['state'])
 
+    @classmethod
+    def pre_apply_many(cls, instances, **kwargs):
+        # Subclass may extend pre_apply, in this case it is applied to each instance
+        if cls.pre_apply.__func__ is not DeleteExecutor.pre_apply.__func__:
+            return super(DeleteExecutor, cls).pre_apply_many(instances, **kwargs)
+        return utils.bulk_transition(instances, 'schedule_deleting')
+
 
 class ActionExecutor(SuccessExecutorMixin, ErrorExecutorMixin, BaseExecutor):
     """ Default states transition for executing action with object.
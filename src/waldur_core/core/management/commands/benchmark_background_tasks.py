@@ -0,0 +1,121 @@
+import time
+from unittest import mock
+from uuid import uuid4
+
+import prettytable
+from celery import Task as CeleryTask
+from django.core.management.base import BaseCommand, CommandError
+
+from waldur_core.core.tasks import BackgroundTask
+from waldur_core.server.celery import app
+
+
+def send_task(task, args=None, kwargs=None, task_id=None, **options):
+    return task.AsyncResult(task_id)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures latency of scheduling background task with apply_async "
+        "depending on number of workers. Uncompleted tasks are detected either "
+        "by leases stored in cache or by broadcast inspection of workers. "
+        "Message broker is mocked and replies of workers are generated, "
+        "so that only overhead of deduplication is measured. "
+        "Broadcast round trip is emulated by --reply-delay."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-r',
+            '--repeat',
+            type=int,
+            default=10,
+            help='Number of times task is scheduled for each number of workers.',
+        )
+        parser.add_argument(
+            '-w',
+            '--workers',
+            type=int,
+            nargs='+',
+            default=[1, 10, 50, 100],
+            help='Numbers of workers replying to inspection.',
+        )
+        parser.add_argument(
+            '--tasks-per-worker',
+            type=int,
+            default=10,
+            help='Number of uncompleted tasks reported by each worker.',
+        )
+        parser.add_argument(
+            '--reply-delay',
+            type=float,
+            default=0,
+            help='Delay in milliseconds of each broadcast inspection request.',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or min(options['workers']) < 1:
+            raise CommandError('Number of repeats and workers should be positive.')
+
+        task = next(
+            task for task in app.tasks.values() if isinstance(task, BackgroundTask)
+        )
+        table = prettytable.PrettyTable(['Workers', 'Inspect, ms', 'Lease, ms'])
+        with mock.patch.object(CeleryTask, 'apply_async', send_task):
+            for workers in options['workers']:
+                replies = self.get_replies(task, workers, options['tasks_per_worker'])
+
+                def acquire_lease(task, task_id, *args, **kwargs):
+                    return not self.is_previous_task_processing(
+                        task, replies, options['reply_delay'], *args, **kwargs
+                    )
+
+                with mock.patch.object(BackgroundTask, 'acquire_lease', acquire_lease):
+                    inspect_time = self.measure(task, options['repeat'])
+                lease_time = self.measure(task, options['repeat'])
+                table.add_row([workers, '%.2f' % inspect_time, '%.2f' % lease_time])
+        self.stdout.write(str(table))
+
+    def get_replies(self, task, workers, tasks_per_worker):
+        replies = {}
+        for worker in range(workers):
+            replies['worker-%s' % worker] = [
+                dict(
+                    id=str(uuid4()),
+                    name=task.name,
+                    args=['uncompleted-%s-%s' % (worker, index)],
+                    kwargs={},
+                )
+                for index in range(tasks_per_worker)
+            ]
+        return replies
+
+    def is_previous_task_processing(self, task, replies, delay, *args, **kwargs):
+        """
+        Emulate deduplication which requests active, scheduled and reserved tasks
+        from all workers and compares them with the task being scheduled.
+        """
+        key = task.get_lease_key(*args, **kwargs)
+        uncompleted = []
+        for _ in ('active', 'scheduled', 'reserved'):
+            time.sleep(delay / 1000)
+            uncompleted.extend(sum(replies.values(), []))
+        return any(
+            other['name'] == task.name
+            and task.get_lease_key(*other['args'], **other['kwargs']) == key
+            for other in uncompleted
+        )
+
+    def measure(self, task, repeat):
+        """
+        Return average latency of apply_async in milliseconds.
+        """
+        task_args = [('benchmark-%s' % uuid4(),) for _ in range(repeat)]
+        task_ids = [str(uuid4()) for _ in range(repeat)]
+        started = time.perf_counter()
+        for args, task_id in zip(task_args, task_ids):
+            task.apply_async(args=args, task_id=task_id)
+        elapsed = (time.perf_counter() - started) * 1000 / repeat
+        for args, task_id in zip(task_args, task_ids):
+            task.release_lease(task_id, *args)
+        return elapsed
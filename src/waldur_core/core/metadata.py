@@ -107,10 +107,57 @@ class WaldurCore(BaseModel):
     USE_ATOMIC_TRANSACTION = Field(
         True, description='Wrap action views in atomic transaction.'
     )
+    PERMISSION_CACHE_TIMEOUT = Field(
+        timedelta(hours=1),
+        description='Time to keep IDs of organizations and projects visible to user in cache. '
+        'Cache is invalidated when role is granted or revoked.',
+    )
+    BACKGROUND_TASK_LEASE_TIMEOUT = Field(
+        timedelta(hours=1),
+        description='Maximum time during which background task with the same arguments is not scheduled again '
+        'if previous task has not been completed, for example, because worker has been stopped.',
+    )
     NOTIFICATION_SUBJECT = Field(
         'Notifications from Waldur',
         description='It is used as a subject of email emitted by event logging hook.',
     )
+    WEBHOOK_TIMEOUT = Field(
+        10, description='Timeout in seconds for HTTP request sent by web hook.'
+    )
+    WEBHOOK_MAX_ATTEMPTS = Field(
+        5,
+        description='Maximum number of attempts to deliver event to web hook before delivery is marked as erred.',
+    )
+    WEBHOOK_RETRY_DELAY = Field(
+        timedelta(minutes=1),
+        description='Delay before the first retry of failed web hook delivery. It is doubled after each failure.',
+    )
+    WEBHOOK_MAX_CONCURRENCY_PER_HOST = Field(
+        4,
+        description='Maximum number of concurrent HTTP requests sent by web hooks to the same host.',
+    )
+    WEBHOOK_BATCH_SIZE = Field(
+        1,
+        description='Maximum number of events sent to web hook in one HTTP request. '
+        'If batch contains several events, JSON list of events is sent instead of single event.',
+    )
+    WEBHOOK_DISPATCH_LIMIT = Field(
+        500,
+        description='Maximum number of web hook deliveries processed by dispatcher in one run.',
+    )
+    WEBHOOK_DELIVERY_LIFETIME = Field(
+        timedelta(days=7),
+        description='Time to keep completed and erred web hook deliveries.',
+    )
+    EMAIL_DIGEST_PERIOD: Optional[timedelta] = Field(
+        None,
+        description='If it is set, events matched by email hooks and system notifications are accumulated '
+        'and sent to each recipient as single digest email once per this period.',
+    )
+    EMAIL_DIGEST_BATCH_SIZE = Field(
+        1000,
+        description='Maximum number of digest emails sent over single SMTP connection in one run.',
+    )
     LOGGING_REPORT_DIRECTORY = Field(
         '/var/log/waldur', description='Directory where log files are located.'
     )
@@ -123,6 +170,11 @@ class WaldurCore(BaseModel):
         description='Chunk size for resource fetching from backend API. '
         'It is needed in order to avoid too long HTTP request error.',
     )
+    EVENT_BUFFER_FLUSH_SIZE = Field(
+        500,
+        description='Maximum number of buffered events written to database in one batch. '
+        'It is used when events are emitted within buffered_events block, for example, in pull tasks.',
+    )
     ONLY_STAFF_CAN_INVITE_USERS = Field(
         False, description='Allow to limit invitation management to staff only.'
     )
@@ -426,6 +478,10 @@ class WaldurSlurm(BaseModel):
         '/etc/waldur/id_rsa',
         description='Path to private key file used as SSH identity file for accessing SLURM master.',
     )
+    SSH_CONTROL_PERSIST = Field(
+        600,
+        description='Number of seconds multiplexed SSH connection to SLURM master is kept open after last command. Set to 0 to open new connection for each command.',
+    )
     DEFAULT_LIMITS = Field(
         {
             'CPU': 16000,  # Measured unit is CPU-hours
@@ -6,3 +6,7 @@ pre_serializer_fields = django.dispatch.Signal(providing_args=['fields'])
 # This signal allows to implement deletion validation in dependent
 # application without introducing circular dependency
 pre_delete_validate = django.dispatch.Signal(providing_args=['instance', 'user'])
+
+# Sent once per model after FSM transition has been applied to several instances
+# with single query, so that handlers could process them in bulk
+bulk_transition_applied = django.dispatch.Signal(providing_args=['instances', 'name'])
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import logging
 import traceback
 from uuid import uuid4
@@ -7,6 +9,8 @@ from celery import current_app
 from celery.app.task import _reprtask
 from celery.local import Proxy
 from celery.worker.request import Request
+from django.conf import settings
+from django.core.cache import cache
 from django.db import IntegrityError
 from django.db import models as django_models
 from django.db.models import ObjectDoesNotExist
@@ -379,6 +383,16 @@ class PreApplyExecutorTask(Task):
         self.executor.pre_apply(instance, **kwargs)
 
 
+BACKGROUND_TASK_LEASE_KEY = 'waldur_core.core.background_task_lease.%s'
+
+
+def get_background_task_lease_key(name, args, kwargs):
+    payload = json.dumps(
+        [name, list(args or []), kwargs or {}], sort_keys=True, default=str
+    )
+    return BACKGROUND_TASK_LEASE_KEY % hashlib.sha256(payload.encode()).hexdigest()
+
+
 class BackgroundTask(CeleryTask, metaclass=TaskType):
     """ Task that is run in background via celerybeat.
 
@@ -390,47 +404,57 @@ class BackgroundTask(CeleryTask, metaclass=TaskType):
            should log themselves explicitly and make sure that they will not
            spam error messages.
 
-        Implement "is_equal" method to define what tasks are equal and should
-        be executed simultaneously.
+        Uncompleted tasks are tracked by leases stored in cache. Lease is acquired
+        atomically when task is scheduled and released when task returns.
+        If worker dies, lease expires after BACKGROUND_TASK_LEASE_TIMEOUT.
+        Override "get_lease_key" method to define what tasks are equal.
     """
 
     is_background = True
 
-    def is_equal(self, other_task, *args, **kwargs):
-        """ Return True if task do the same operation as other_task.
+    def get_lease_key(self, *args, **kwargs):
+        return get_background_task_lease_key(self.name, args, kwargs)
 
-            Note! Other task is represented as serialized celery task - dictionary.
-        """
-        raise NotImplementedError(
-            'BackgroundTask should implement "is_equal" method to avoid queue overload.'
+    def acquire_lease(self, task_id, *args, **kwargs):
+        """ Return True if lease is acquired, ie there is no equal uncompleted task """
+        timeout = settings.WALDUR_CORE['BACKGROUND_TASK_LEASE_TIMEOUT']
+        return cache.add(
+            self.get_lease_key(*args, **kwargs), task_id, timeout.total_seconds()
         )
 
+    def release_lease(self, task_id, *args, **kwargs):
+        key = self.get_lease_key(*args, **kwargs)
+        # Lease could be expired and acquired by another task
+        if cache.get(key) == task_id:
+            cache.delete(key)
+
     def is_previous_task_processing(self, *args, **kwargs):
         """ Return True if exist task that is equal to current and is uncompleted """
-        app = self._get_app()
-        inspect = app.control.inspect()
-        active = inspect.active() or {}
-        scheduled = inspect.scheduled() or {}
-        reserved = inspect.reserved() or {}
-        uncompleted = sum(
-            list(active.values()) + list(scheduled.values()) + list(reserved.values()),
-            [],
-        )
-        return any(self.is_equal(task, *args, **kwargs) for task in uncompleted)
+        return cache.get(self.get_lease_key(*args, **kwargs)) is not None
 
     def apply_async(self, args=None, kwargs=None, **options):
         """ Do not run background task if previous task is uncompleted """
-        if self.is_previous_task_processing(*args, **kwargs):
+        args = args or ()
+        kwargs = kwargs or {}
+        task_id = options.pop('task_id', None) or str(uuid4())
+        if not self.acquire_lease(task_id, *args, **kwargs):
             message = (
                 'Background task %s was not scheduled, because its predecessor is not completed yet.'
                 % self.name
             )
             logger.info(message)
             # It is expected by Celery that apply_async return AsyncResult, otherwise celerybeat dies
-            return self.AsyncResult(options.get('task_id') or str(uuid4()))
-        return super(BackgroundTask, self).apply_async(
-            args=args, kwargs=kwargs, **options
-        )
+            return self.AsyncResult(task_id)
+        try:
+            return super(BackgroundTask, self).apply_async(
+                args=args, kwargs=kwargs, task_id=task_id, **options
+            )
+        except Exception:
+            self.release_lease(task_id, *args, **kwargs)
+            raise
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        self.release_lease(task_id, *(args or ()), **(kwargs or {}))
 
 
 def log_celery_task(request):
@@ -0,0 +1,54 @@
+from unittest import mock
+
+from celery import Task as CeleryTask
+from django.test import TestCase, override_settings
+
+from waldur_core.core import tasks
+
+
+class DummyBackgroundTask(tasks.BackgroundTask):
+    name = 'waldur_core.core.tests.DummyBackgroundTask'
+
+    def run(self, *args, **kwargs):
+        pass
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+)
+class BackgroundTaskTest(TestCase):
+    def setUp(self):
+        self.task = DummyBackgroundTask()
+        patcher = mock.patch.object(CeleryTask, 'apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_equal_task_is_not_scheduled_until_previous_one_is_completed(self):
+        self.task.apply_async(args=('instance',))
+        self.task.apply_async(args=('instance',))
+        self.assertEqual(self.apply_async.call_count, 1)
+
+    def test_task_with_other_arguments_is_scheduled(self):
+        self.task.apply_async(args=('instance',))
+        self.task.apply_async(args=('other_instance',))
+        self.assertEqual(self.apply_async.call_count, 2)
+
+    def test_task_is_scheduled_when_previous_one_returns(self):
+        self.task.apply_async(args=('instance',), task_id='task_id')
+        self.task.after_return('SUCCESS', None, 'task_id', ['instance'], {}, None)
+
+        self.task.apply_async(args=('instance',))
+        self.assertEqual(self.apply_async.call_count, 2)
+
+    def test_lease_of_other_task_is_not_released(self):
+        self.task.apply_async(args=('instance',), task_id='task_id')
+        self.task.after_return('SUCCESS', None, 'other_id', ['instance'], {}, None)
+
+        self.assertTrue(self.task.is_previous_task_processing('instance'))
+
+    def test_lease_is_released_if_task_could_not_be_scheduled(self):
+        self.apply_async.side_effect = OSError()
+        with self.assertRaises(OSError):
+            self.task.apply_async(args=('instance',))
+
+        self.assertFalse(self.task.is_previous_task_processing('instance'))
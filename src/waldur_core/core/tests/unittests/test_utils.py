@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.test import TestCase
+from django_fsm import signals as fsm_signals
+
+from waldur_core.core import utils
+from waldur_core.core.signals import bulk_transition_applied
+from waldur_core.structure.tests import factories, models
+
+States = models.TestNewInstance.States
+
+
+class BulkTransitionTest(TestCase):
+    def setUp(self):
+        self.ok_vm = factories.TestNewInstanceFactory(state=States.OK)
+        self.erred_vm = factories.TestNewInstanceFactory(state=States.ERRED)
+        self.creating_vm = factories.TestNewInstanceFactory(state=States.CREATING)
+
+    def test_transition_is_applied_only_if_it_is_allowed(self):
+        changed = utils.bulk_transition(
+            [self.ok_vm, self.erred_vm, self.creating_vm], 'schedule_deleting'
+        )
+
+        self.assertEqual(set(changed), {self.ok_vm, self.erred_vm})
+        self.creating_vm.refresh_from_db()
+        self.assertEqual(self.creating_vm.state, States.CREATING)
+        for vm in (self.ok_vm, self.erred_vm):
+            vm.refresh_from_db()
+            self.assertEqual(vm.state, States.DELETION_SCHEDULED)
+
+    def test_extra_values_are_saved(self):
+        utils.bulk_transition([self.ok_vm], 'set_erred', error_message='Timeout')
+
+        self.ok_vm.refresh_from_db()
+        self.assertEqual(self.ok_vm.state, States.ERRED)
+        self.assertEqual(self.ok_vm.error_message, 'Timeout')
+
+    def test_signals_are_sent(self):
+        post_transition_handler = mock.Mock()
+        bulk_handler = mock.Mock()
+        fsm_signals.post_transition.connect(
+            post_transition_handler, sender=models.TestNewInstance
+        )
+        bulk_transition_applied.connect(bulk_handler, sender=models.TestNewInstance)
+        self.addCleanup(
+            fsm_signals.post_transition.disconnect,
+            post_transition_handler,
+            sender=models.TestNewInstance,
+        )
+        self.addCleanup(
+            bulk_transition_applied.disconnect,
+            bulk_handler,
+            sender=models.TestNewInstance,
+        )
+
+        utils.bulk_transition([self.ok_vm, self.erred_vm], 'recover')
+
+        self.assertEqual(post_transition_handler.call_count, 1)
+        self.assertEqual(post_transition_handler.call_args[1]['source'], States.ERRED)
+        bulk_handler.assert_called_once()
+        self.assertEqual(bulk_handler.call_args[1]['instances'], [self.erred_vm])
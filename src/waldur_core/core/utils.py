@@ -8,7 +8,7 @@ import time
 import unicodedata
 import uuid
 import warnings
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from itertools import chain
 from operator import itemgetter
 
@@ -22,7 +22,8 @@ from django.core.mail import EmailMultiAlternatives
 from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models import F
+from django.db import transaction
+from django.db.models import F, signals
 from django.db.models.sql.query import get_order_dir
 from django.http import QueryDict
 from django.template import Context
@@ -457,3 +458,90 @@ def get_system_robot():
         )
     except ObjectDoesNotExist:
         return
+
+
+def bulk_transition(instances, transition_name, **values):
+    """
+    Apply FSM transition to instances using single UPDATE query per model.
+
+    Body of transition method is not executed, therefore it is suitable only
+    for transitions without side effects, such as set_erred or schedule_deleting.
+    Instances which do not allow transition in their current database state are skipped.
+    Extra values are stored together with new state.
+
+    Signals post_transition and post_save are sent for each changed instance
+    so that existing handlers keep working, then bulk_transition_applied signal
+    is sent once per model. Return list of changed instances.
+    """
+    from django_fsm import signals as fsm_signals
+
+    from waldur_core.core.signals import bulk_transition_applied
+
+    instances_by_model = OrderedDict()
+    for instance in instances:
+        instances_by_model.setdefault(instance._meta.model, []).append(instance)
+
+    changed_instances = []
+    for model, model_instances in instances_by_model.items():
+        meta = getattr(model, transition_name)._django_fsm
+        field_name = meta.field if isinstance(meta.field, str) else meta.field.name
+        update_fields = [field_name] + list(values.keys())
+
+        with transaction.atomic():
+            states = dict(
+                model.objects.select_for_update()
+                .filter(pk__in=[instance.pk for instance in model_instances])
+                .values_list('pk', field_name)
+            )
+            transitions = []
+            pks_by_target = defaultdict(list)
+            for instance in model_instances:
+                source = states.get(instance.pk)
+                if (
+                    source is None
+                    or not meta.has_transition(source)
+                    or not meta.conditions_met(instance, source)
+                ):
+                    continue
+                target = meta.next_state(source)
+                transitions.append((instance, source, target))
+                pks_by_target[target].append(instance.pk)
+
+            for target, pks in pks_by_target.items():
+                model.objects.filter(pk__in=pks).update(
+                    **{field_name: target}, **values
+                )
+
+            for instance, source, target in transitions:
+                setattr(instance, field_name, target)
+                for field, value in values.items():
+                    setattr(instance, field, value)
+                fsm_signals.post_transition.send(
+                    sender=model,
+                    instance=instance,
+                    name=transition_name,
+                    source=source,
+                    target=target,
+                )
+                signals.post_save.send(
+                    sender=model,
+                    instance=instance,
+                    created=False,
+                    update_fields=update_fields,
+                    raw=False,
+                    using=instance._state.db,
+                )
+                tracker = getattr(instance, 'tracker', None)
+                if tracker is not None:
+                    tracker.set_saved_fields()
+
+            model_changed_instances = [instance for instance, _, _ in transitions]
+            if model_changed_instances:
+                bulk_transition_applied.send(
+                    sender=model,
+                    instances=model_changed_instances,
+                    name=transition_name,
+                )
+            changed_instances.extend(model_changed_instances)
+
+    return changed_instances
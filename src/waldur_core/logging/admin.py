@@ -88,6 +88,21 @@ class WebHookAdmin(BaseHookAdmin):
     list_display = BaseHookAdmin.list_display + ('destination_url',)
 
 
+class WebHookDeliveryAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = (
+        'hook',
+        'event',
+        'state',
+        'attempts',
+        'created',
+        'delivered',
+        'duration',
+    )
+    list_filter = ('state', 'created')
+    readonly_fields = ('hook', 'event', 'error_message')
+    ordering = ('-created',)
+
+
 class EmailHookAdmin(BaseHookAdmin):
     list_display = BaseHookAdmin.list_display + ('email',)
 
@@ -126,6 +141,7 @@ if admin.site.is_registered(Group):
 
 admin.site.register(models.SystemNotification, SystemNotificationAdmin)
 admin.site.register(models.WebHook, WebHookAdmin)
+admin.site.register(models.WebHookDelivery, WebHookDeliveryAdmin)
 admin.site.register(models.EmailHook, EmailHookAdmin)
 admin.site.register(models.Report, ReportAdmin)
 admin.site.register(models.Event, EventAdmin)
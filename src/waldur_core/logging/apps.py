@@ -14,3 +14,18 @@ class EventsConfig(AppConfig):
             sender=models.Event,
             dispatch_uid='waldur_core.logging.handlers.process_hook',
         )
+
+        for model in models.BaseHook.get_all_models() + [models.SystemNotification]:
+            signals.post_save.connect(
+                handlers.invalidate_hook_index,
+                sender=model,
+                dispatch_uid='waldur_core.logging.handlers.invalidate_hook_index_on_save_%s'
+                % model.__name__,
+            )
+
+            signals.post_delete.connect(
+                handlers.invalidate_hook_index,
+                sender=model,
+                dispatch_uid='waldur_core.logging.handlers.invalidate_hook_index_on_delete_%s'
+                % model.__name__,
+            )
@@ -0,0 +1,116 @@
+import logging
+import smtplib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Min
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from waldur_core.logging import models
+
+logger = logging.getLogger(__name__)
+
+
+def get_due_emails(threshold, limit):
+    """
+    Returns recipients whose oldest accumulated event is older than threshold.
+    """
+    rows = (
+        models.EmailDigestItem.objects.values('email')
+        .annotate(first_created=Min('created'))
+        .filter(first_created__lte=threshold)
+        .order_by('first_created')[:limit]
+    )
+    return [row['email'] for row in rows]
+
+
+def get_message(email, events):
+    subject = settings.WALDUR_CORE['NOTIFICATION_SUBJECT']
+    text_message = '\n'.join(event.message for event in events)
+    html_message = render_to_string('logging/email.html', {'events': events})
+    message = EmailMultiAlternatives(
+        subject, text_message, settings.DEFAULT_FROM_EMAIL, [email]
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def claim_items(emails):
+    """
+    Deletes accumulated events of given recipients and returns them.
+    Rows are locked only within short transaction so that
+    SMTP session is not performed while database locks are held.
+    """
+    with transaction.atomic():
+        items = list(
+            models.EmailDigestItem.objects.select_for_update(
+                skip_locked=True, of=('self',)
+            )
+            .filter(email__in=emails)
+            .select_related('event')
+            .order_by('event__created')
+        )
+        models.EmailDigestItem.objects.filter(
+            id__in=[item.id for item in items]
+        ).delete()
+    return items
+
+
+def requeue_items(items):
+    """
+    Restores accumulated events so that they are sent in the next run.
+    """
+    models.EmailDigestItem.objects.bulk_create(
+        [
+            models.EmailDigestItem(
+                email=item.email, event=item.event, created=item.created
+            )
+            for item in items
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def send_digests():
+    """
+    Sends single email with all accumulated events to each recipient
+    whose digest period has passed. All emails are sent over one SMTP connection.
+    Events which have not been sent are restored for the next run.
+    """
+    period = settings.WALDUR_CORE['EMAIL_DIGEST_PERIOD']
+    threshold = timezone.now()
+    if period:
+        threshold -= period
+
+    emails = get_due_emails(threshold, settings.WALDUR_CORE['EMAIL_DIGEST_BATCH_SIZE'])
+    if not emails:
+        return
+
+    items = claim_items(emails)
+    digests = OrderedDict()
+    for item in items:
+        digests.setdefault(item.email, []).append(item)
+
+    sent_emails = set()
+    try:
+        with get_connection() as connection:
+            for email, email_items in digests.items():
+                events = [item.event for item in email_items]
+                logger.debug(
+                    'Submitting email digest with %s events to %s', len(events), email
+                )
+                try:
+                    connection.send_messages([get_message(email, events)])
+                except (smtplib.SMTPException, OSError) as e:
+                    logger.warning(
+                        'Unable to send email digest to %s. Error: %s', email, e
+                    )
+                else:
+                    sent_emails.add(email)
+    except (smtplib.SMTPException, OSError) as e:
+        logger.warning('Unable to open SMTP connection. Error: %s', e)
+    finally:
+        requeue_items([item for item in items if item.email not in sent_emails])
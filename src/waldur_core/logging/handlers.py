@@ -1,7 +1,14 @@
 from django.db import transaction
 
-from waldur_core.logging import tasks
+from waldur_core.logging import models, tasks
 
 
 def process_hook(sender, instance, created=False, **kwargs):
     transaction.on_commit(lambda: tasks.process_event.delay(instance.pk))
+
+
+def invalidate_hook_index(sender, instance, **kwargs):
+    # Index is invalidated again on commit because other process
+    # could rebuild it before transaction is committed.
+    models.hook_index.invalidate()
+    transaction.on_commit(models.hook_index.invalidate)
@@ -4,12 +4,17 @@ import datetime
 import decimal
 import importlib
 import logging
+import threading
 import types
 import uuid
 from collections import defaultdict
+from contextlib import contextmanager
 
 from django.apps import apps
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import signals
 
 from waldur_core.logging import models
 from waldur_core.logging.log import EventLoggerAdapter
@@ -17,6 +22,8 @@ from waldur_core.logging.middleware import get_event_context
 
 logger = logging.getLogger(__name__)
 
+_buffers = threading.local()
+
 
 class LoggerError(AttributeError):
     pass
@@ -226,13 +233,99 @@ class EventLogger(BaseLogger):
         log = getattr(self.logger, level)
         log(msg, extra={'event_type': event_type, 'event_context': context})
 
+        scopes = []
+        if event_context:
+            scopes = [
+                scope
+                for scope in self.get_scopes(event_context) or []
+                if scope and scope.id
+            ]
+
+        buffer = get_event_buffer()
+        if buffer:
+            event = models.Event(event_type=event_type, message=msg, context=context)
+            buffer.add(event, scopes)
+            return
+
         event = models.Event.objects.create(
             event_type=event_type, message=msg, context=context,
         )
-        if event_context:
-            for scope in self.get_scopes(event_context) or []:
-                if scope and scope.id:
-                    models.Feed.objects.create(scope=scope, event=event)
+        for scope in scopes:
+            models.Feed.objects.create(scope=scope, event=event)
+
+
+class EventBuffer:
+    """ Collects events and writes them together with their feeds using bulk_create.
+        Buffer is flushed when it reaches flush size and when it is closed.
+        If buffer is closed within transaction, remaining events are written on commit.
+    """
+
+    def __init__(self, flush_size=None):
+        self.flush_size = flush_size or settings.WALDUR_CORE['EVENT_BUFFER_FLUSH_SIZE']
+        self.events = []
+        self.feeds = []
+
+    def add(self, event, scopes):
+        self.events.append(event)
+        self.feeds.extend((event, scope) for scope in scopes)
+        if len(self.events) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if not self.events:
+            return
+
+        events, feeds = self.events, self.feeds
+        self.events, self.feeds = [], []
+
+        models.Event.objects.bulk_create(events)
+        models.Feed.objects.bulk_create(
+            [models.Feed(event=event, scope=scope) for (event, scope) in feeds]
+        )
+
+        # bulk_create does not send post_save signal, but hooks are processed by its handler
+        for event in events:
+            signals.post_save.send(
+                sender=models.Event,
+                instance=event,
+                created=True,
+                raw=False,
+                update_fields=None,
+            )
+
+    def close(self):
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(self.flush)
+        else:
+            self.flush()
+
+
+def get_event_buffer():
+    stack = getattr(_buffers, 'stack', None)
+    return stack and stack[-1] or None
+
+
+@contextmanager
+def buffered_events(flush_size=None):
+    """ Opt-in for batched writing of events emitted within the block.
+
+        Example usage:
+
+        .. code-block:: python
+
+            with buffered_events():
+                for instance in instances:
+                    event_logger.instance.info(...)
+    """
+    buffer = EventBuffer(flush_size)
+    if not hasattr(_buffers, 'stack'):
+        _buffers.stack = []
+    _buffers.stack.append(buffer)
+    try:
+        yield buffer
+    finally:
+        _buffers.stack.pop()
+        buffer.close()
 
 
 class LoggableMixin:
@@ -293,6 +386,18 @@ class LoggableMixin:
     def get_permitted_objects(cls, user):
         return cls.objects.none()
 
+    @classmethod
+    def get_permitted_users(cls, object_ids, users):
+        """
+        Returns IDs of users who are permitted to see at least one of given objects.
+        Override it in order to check permissions of all users at once.
+        """
+        return {
+            user.id
+            for user in users
+            if cls.get_permitted_objects(user).filter(id__in=object_ids).exists()
+        }
+
 
 class BaseLoggerRegistry:
     def get_loggers(self):
@@ -0,0 +1,77 @@
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logging', '0009_delete_pushhook'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebHookDelivery',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'state',
+                    models.CharField(
+                        choices=[
+                            ('pending', 'Pending'),
+                            ('done', 'Done'),
+                            ('erred', 'Erred'),
+                        ],
+                        default='pending',
+                        max_length=10,
+                    ),
+                ),
+                (
+                    'created',
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    'next_attempt',
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('delivered', models.DateTimeField(blank=True, null=True)),
+                (
+                    'duration',
+                    models.FloatField(
+                        help_text='Duration of successful HTTP request in seconds.',
+                        null=True,
+                    ),
+                ),
+                ('error_message', models.TextField(blank=True)),
+                (
+                    'event',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='logging.Event',
+                    ),
+                ),
+                (
+                    'hook',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='deliveries',
+                        to='logging.WebHook',
+                    ),
+                ),
+            ],
+            options={'index_together': {('state', 'next_attempt')},},
+        ),
+    ]
@@ -0,0 +1,44 @@
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logging', '0010_webhookdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailDigestItem',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('email', models.EmailField(max_length=75)),
+                (
+                    'created',
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    'event',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='logging.Event',
+                    ),
+                ),
+            ],
+            options={'unique_together': {('email', 'event')},},
+        ),
+    ]
@@ -1,12 +1,13 @@
 import logging
+from collections import defaultdict
 
-import requests
 from django.apps import apps
 from django.conf import settings
 from django.contrib.contenttypes import fields as ct_fields
 from django.contrib.contenttypes import models as ct_models
 from django.contrib.postgres.fields import JSONField as BetterJSONField
 from django.core import validators
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.db import models
 from django.template.loader import render_to_string
@@ -94,19 +95,23 @@ class BaseHook(EventTypesMixin, UuidMixin, TimeStampedModel):
 
     @property
     def all_event_types(self):
+        return set(self.event_types) | self.get_base_event_types()
+
+    @classmethod
+    def get_base_event_types(cls):
+        """
+        Returns event types of system notification configured for hook model.
+        """
         from waldur_core.logging import loggers
 
-        self_types = set(self.event_types)
         try:
-            hook_ct = ct_models.ContentType.objects.get_for_model(self)
+            hook_ct = ct_models.ContentType.objects.get_for_model(cls)
             base_types = SystemNotification.objects.get(hook_content_type=hook_ct)
         except SystemNotification.DoesNotExist:
-            return self_types
+            return set()
         else:
-            return (
-                self_types
-                | set(loggers.expand_event_groups(base_types.event_groups))
-                | set(base_types.event_types)
+            return set(loggers.expand_event_groups(base_types.event_groups)) | set(
+                base_types.event_types
             )
 
     @classmethod
@@ -129,6 +134,53 @@ class BaseHook(EventTypesMixin, UuidMixin, TimeStampedModel):
         return ct_models.ContentType.objects.filter(id__in=ids)
 
 
+class HookIndex:
+    """
+    In-process index mapping event type to active hooks subscribed to it.
+    Index version is stored in cache so that index is rebuilt in all
+    processes when any hook or system notification is changed.
+    """
+
+    cache_key = 'waldur_core.logging.hook_index_version'
+
+    def __init__(self):
+        self.version = None
+        self.hooks = {}
+
+    def invalidate(self):
+        self.version = None
+        try:
+            cache.incr(self.cache_key)
+        except ValueError:
+            cache.set(self.cache_key, 1, None)
+
+    def get_version(self):
+        version = cache.get(self.cache_key)
+        if version is None:
+            version = 1
+            cache.add(self.cache_key, version, None)
+        return version
+
+    def get_hooks(self, event_type):
+        version = self.get_version()
+        if version != self.version:
+            self.hooks = self.build()
+            self.version = version
+        return self.hooks.get(event_type, [])
+
+    def build(self):
+        hooks = defaultdict(list)
+        for hook_class in BaseHook.__subclasses__():
+            base_types = hook_class.get_base_event_types()
+            for hook in hook_class.objects.filter(is_active=True):
+                for event_type in set(hook.event_types) | base_types:
+                    hooks[event_type].append(hook)
+        return dict(hooks)
+
+
+hook_index = HookIndex()
+
+
 class WebHook(BaseHook):
     class ContentTypeChoices:
         JSON = 1
@@ -142,30 +194,64 @@ class WebHook(BaseHook):
 
     def process(self, event):
         logger.debug(
-            'Submitting web hook to URL %s, payload: %s', self.destination_url, event
+            'Scheduling delivery of web hook to URL %s, payload: %s',
+            self.destination_url,
+            event,
         )
-        payload = dict(
+        WebHookDelivery.objects.create(hook=self, event=event)
+
+    def get_payload(self, event):
+        return dict(
             created=event.created.isoformat(),
             message=event.message,
             context=event.context,
             event_type=event.event_type,
         )
 
-        # encode event as JSON
-        if self.content_type == WebHook.ContentTypeChoices.JSON:
-            requests.post(
-                self.destination_url,
-                json=payload,
-                verify=settings.VERIFY_WEBHOOK_REQUESTS,
-            )
 
-        # encode event as form
-        elif self.content_type == WebHook.ContentTypeChoices.FORM:
-            requests.post(
-                self.destination_url,
-                data=payload,
-                verify=settings.VERIFY_WEBHOOK_REQUESTS,
-            )
+class WebHookDelivery(models.Model):
+    """
+    Outbox of web hook deliveries. Deliveries are sent by dispatcher
+    in background and retried with exponential backoff on failure.
+    """
+
+    class States:
+        PENDING = 'pending'
+        DONE = 'done'
+        ERRED = 'erred'
+
+        CHOICES = (
+            (PENDING, 'Pending'),
+            (DONE, 'Done'),
+            (ERRED, 'Erred'),
+        )
+
+    hook = models.ForeignKey(
+        on_delete=models.CASCADE, to=WebHook, related_name='deliveries'
+    )
+    event = models.ForeignKey(on_delete=models.CASCADE, to='Event', related_name='+')
+    state = models.CharField(
+        choices=States.CHOICES, default=States.PENDING, max_length=10
+    )
+    created = AutoCreatedField()
+    next_attempt = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    delivered = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(
+        null=True, help_text=_('Duration of successful HTTP request in seconds.')
+    )
+    error_message = models.TextField(blank=True)
+
+    class Meta:
+        index_together = ('state', 'next_attempt')
+
+    @property
+    def latency(self):
+        """
+        Number of seconds passed from event creation until its delivery.
+        """
+        if self.delivered:
+            return (self.delivered - self.event.created).total_seconds()
 
 
 class EmailHook(BaseHook):
@@ -178,6 +264,10 @@ class EmailHook(BaseHook):
                 % self.pk
             )
             return
+        if settings.WALDUR_CORE['EMAIL_DIGEST_PERIOD']:
+            logger.debug('Adding event %s to email digest of %s', event.id, self.email)
+            EmailDigestItem.objects.get_or_create(email=self.email, event=event)
+            return
         subject = settings.WALDUR_CORE.get(
             'NOTIFICATION_SUBJECT', 'Notifications from Waldur'
         )
@@ -195,6 +285,19 @@ class EmailHook(BaseHook):
         )
 
 
+class EmailDigestItem(models.Model):
+    """
+    Event accumulated for recipient until digest email is sent.
+    """
+
+    email = models.EmailField(max_length=75)
+    event = models.ForeignKey(on_delete=models.CASCADE, to='Event', related_name='+')
+    created = AutoCreatedField()
+
+    class Meta:
+        unique_together = ('email', 'event')
+
+
 class SystemNotification(EventTypesMixin, models.Model):
     # Model doesn't inherit NameMixin, because this is circular dependence.
     name = models.CharField(_('name'), max_length=150)
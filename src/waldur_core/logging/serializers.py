@@ -115,3 +115,7 @@ class EmailHookSerializer(BaseHookSerializer):
 
     def get_hook_type(self, hook):
         return 'email'
+
+
+class WebHookDeliveryStatsSerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
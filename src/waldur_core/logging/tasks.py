@@ -2,13 +2,23 @@ import datetime
 import logging
 import tarfile
 import traceback
+from collections import defaultdict
 
 from celery import shared_task
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 
 from waldur_core.core.utils import deserialize_instance
-from waldur_core.logging.models import BaseHook, Event, Feed, Report, SystemNotification
+from waldur_core.logging import digests, webhooks
+from waldur_core.logging.models import (
+    Event,
+    Feed,
+    Report,
+    SystemNotification,
+    WebHook,
+    hook_index,
+)
 from waldur_core.logging.utils import create_report_archive
 from waldur_core.structure import models as structure_models
 
@@ -18,41 +28,86 @@ logger = logging.getLogger(__name__)
 @shared_task(name='waldur_core.logging.process_event')
 def process_event(event_id):
     event = Event.objects.get(id=event_id)
-    for hook in BaseHook.get_active_hooks():
-        if check_event(event, hook):
-            hook.process(event)
+    feeds = list(Feed.objects.filter(event=event))
+
+    hooks = hook_index.get_hooks(event.event_type)
+    permitted_users = get_permitted_users(feeds, {hook.user_id for hook in hooks})
+    permitted_hooks = [hook for hook in hooks if hook.user_id in permitted_users]
+    for hook in permitted_hooks:
+        hook.process(event)
+
+    if any(isinstance(hook, WebHook) for hook in permitted_hooks):
+        dispatch_webhook_deliveries.delay()
+
+    process_system_notification(event, feeds)
+
+
+@shared_task(name='waldur_core.logging.dispatch_webhook_deliveries')
+def dispatch_webhook_deliveries():
+    webhooks.dispatcher.dispatch()
 
-    process_system_notification(event)
 
+@shared_task(name='waldur_core.logging.delete_old_webhook_deliveries')
+def delete_old_webhook_deliveries():
+    webhooks.delete_old_deliveries()
 
-def process_system_notification(event):
+
+@shared_task(name='waldur_core.logging.send_email_digests')
+def send_email_digests():
+    digests.send_digests()
+
+
+def process_system_notification(event, feeds):
     project_ct = ContentType.objects.get_for_model(structure_models.Project)
-    project_feed = Feed.objects.filter(event=event, content_type=project_ct).first()
+    project_feed = get_feed(feeds, project_ct)
     project = project_feed and project_feed.scope
 
     customer_ct = ContentType.objects.get_for_model(structure_models.Customer)
-    customer_feed = Feed.objects.filter(event=event, content_type=customer_ct).first()
+    customer_feed = get_feed(feeds, customer_ct)
     customer = customer_feed and customer_feed.scope
 
-    for hook in SystemNotification.get_hooks(
-        event.event_type, project=project, customer=customer
-    ):
-        if check_event(event, hook):
+    # System notification hooks are already filtered by event type
+    hooks = list(
+        SystemNotification.get_hooks(
+            event.event_type, project=project, customer=customer
+        )
+    )
+    permitted_users = get_permitted_users(feeds, {hook.user_id for hook in hooks})
+    for hook in hooks:
+        if hook.user_id in permitted_users:
             hook.process(event)
 
 
-def check_event(event, hook):
-    # Check that event matches with hook
-    if event.event_type not in hook.all_event_types:
-        return False
-
-    # Check permissions
-    for feed in Feed.objects.filter(event=event):
-        qs = feed.content_type.model_class().get_permitted_objects(hook.user)
-        if qs.filter(id=feed.object_id).exists():
-            return True
-
-    return False
+def get_feed(feeds, content_type):
+    for feed in feeds:
+        if feed.content_type_id == content_type.id:
+            return feed
+
+
+def get_permitted_users(feeds, user_ids):
+    """
+    Returns IDs of users who are permitted to see at least one of feed scopes.
+    Permissions are checked for all users at once per scope model.
+    """
+    if not feeds or not user_ids:
+        return set()
+
+    users = list(get_user_model().objects.filter(id__in=user_ids))
+    object_ids = defaultdict(set)
+    for feed in feeds:
+        object_ids[feed.content_type_id].add(feed.object_id)
+
+    permitted_users = set()
+    for content_type_id, ids in object_ids.items():
+        candidates = [user for user in users if user.id not in permitted_users]
+        if not candidates:
+            break
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if not model:
+            continue
+        permitted_users |= model.get_permitted_users(ids, candidates)
+
+    return permitted_users
 
 
 @shared_task(name='waldur_core.logging.create_report')
@@ -0,0 +1,106 @@
+import smtplib
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.utils import timezone
+from freezegun import freeze_time
+from rest_framework import test
+
+from waldur_core.core.tests.helpers import override_waldur_core_settings
+from waldur_core.logging import models, tasks
+from waldur_core.structure.tests import factories as structure_factories
+
+from . import factories
+
+
+@override_waldur_core_settings(EMAIL_DIGEST_PERIOD=timedelta(minutes=10))
+class EmailDigestTest(test.APITransactionTestCase):
+    def setUp(self):
+        self.user = structure_factories.UserFactory()
+        self.hook = models.EmailHook.objects.create(
+            user=self.user, email=self.user.email, event_types=[]
+        )
+        self.events = factories.EventFactory.create_batch(3)
+
+    def process_events(self):
+        for event in self.events:
+            self.hook.process(event)
+
+    def test_events_are_accumulated_until_digest_period_passes(self):
+        self.process_events()
+        tasks.send_email_digests()
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(models.EmailDigestItem.objects.count(), 3)
+
+    def test_single_email_with_all_events_is_sent_after_digest_period(self):
+        self.process_events()
+
+        with freeze_time(timezone.now() + timedelta(minutes=11)):
+            tasks.send_email_digests()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        for event in self.events:
+            self.assertIn(event.message, mail.outbox[0].body)
+        self.assertFalse(models.EmailDigestItem.objects.exists())
+
+    def test_event_is_included_once_if_it_matches_several_hooks(self):
+        other_hook = models.EmailHook.objects.create(
+            user=structure_factories.UserFactory(),
+            email=self.user.email,
+            event_types=[],
+        )
+        self.process_events()
+        for event in self.events:
+            other_hook.process(event)
+
+        with freeze_time(timezone.now() + timedelta(minutes=11)):
+            tasks.send_email_digests()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body.count(self.events[0].message), 1)
+
+    def test_separate_digest_is_sent_to_each_recipient(self):
+        other_user = structure_factories.UserFactory()
+        other_hook = models.EmailHook.objects.create(
+            user=other_user, email=other_user.email, event_types=[]
+        )
+        self.process_events()
+        other_hook.process(self.events[0])
+
+        with freeze_time(timezone.now() + timedelta(minutes=11)):
+            tasks.send_email_digests()
+
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted([self.user.email, other_user.email]),
+        )
+
+    @mock.patch.object(
+        locmem.EmailBackend, 'send_messages', side_effect=smtplib.SMTPException()
+    )
+    def test_events_are_restored_if_email_is_not_sent(self, send_messages):
+        self.process_events()
+
+        with freeze_time(timezone.now() + timedelta(minutes=11)):
+            tasks.send_email_digests()
+
+        send_messages.assert_called_once()
+        self.assertEqual(models.EmailDigestItem.objects.count(), 3)
+
+    @mock.patch.object(locmem.EmailBackend, 'open', side_effect=OSError())
+    def test_events_are_restored_if_connection_is_not_opened(self, open_connection):
+        self.process_events()
+
+        with freeze_time(timezone.now() + timedelta(minutes=11)):
+            tasks.send_email_digests()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(models.EmailDigestItem.objects.count(), 3)
+
+        open_connection.side_effect = None
+        with freeze_time(timezone.now() + timedelta(minutes=12)):
+            tasks.send_email_digests()
+        self.assertEqual(len(mail.outbox), 1)
@@ -5,6 +5,7 @@ from django.core import mail
 from rest_framework import test
 
 from waldur_core.logging import models as logging_models
+from waldur_core.logging import webhooks
 from waldur_core.logging.tasks import process_event
 from waldur_core.logging.tests.factories import EventFactory
 from waldur_core.structure import models as structure_models
@@ -50,8 +51,11 @@ class TestHookService(test.APITransactionTestCase):
         # Verify that destination address of message is correct
         self.assertEqual(mail.outbox[0].to, [email_hook.email])
 
-    @mock.patch('requests.post')
-    def test_webhook_makes_post_request_against_destination_url(self, requests_post):
+    @mock.patch('waldur_core.logging.tasks.dispatch_webhook_deliveries')
+    @mock.patch('requests.Session.post')
+    def test_webhook_makes_post_request_against_destination_url(
+        self, requests_post, dispatch_task
+    ):
 
         # Create web hook for customer owner
         self.web_hook = logging_models.WebHook.objects.create(
@@ -62,12 +66,15 @@ class TestHookService(test.APITransactionTestCase):
 
         # Trigger processing
         process_event(self.event.id)
+        dispatch_task.delay.assert_called_once_with()
+        webhooks.dispatcher.dispatch()
 
         # Event is captured and POST request is triggered because event_type and user_uuid match
         requests_post.assert_called_once_with(
             self.web_hook.destination_url,
             json=self.payload,
             verify=settings.VERIFY_WEBHOOK_REQUESTS,
+            timeout=settings.WALDUR_CORE['WEBHOOK_TIMEOUT'],
         )
 
     def test_email_hook_processor_can_be_called_twice(self):
@@ -79,3 +86,37 @@ class TestHookService(test.APITransactionTestCase):
         # If event is not mutated, exception is not raised, see also SENTRY-1396
         email_hook.process(self.event)
         email_hook.process(self.event)
+
+    def test_inactive_hook_is_removed_from_index(self):
+        email_hook = logging_models.EmailHook.objects.create(
+            user=self.owner, email=self.owner.email, event_types=[self.event_type]
+        )
+        self.assertIn(email_hook, logging_models.hook_index.get_hooks(self.event_type))
+
+        email_hook.is_active = False
+        email_hook.save()
+
+        self.assertNotIn(
+            email_hook, logging_models.hook_index.get_hooks(self.event_type)
+        )
+
+    def test_email_hook_is_processed_for_project_member(self):
+        project = structure_factories.ProjectFactory(customer=self.customer)
+        admin = structure_factories.UserFactory()
+        project.add_user(admin, structure_models.ProjectRole.ADMINISTRATOR)
+        event = EventFactory(event_type='project_update_succeeded')
+        logging_models.Feed.objects.create(scope=project, event=event)
+
+        logging_models.EmailHook.objects.create(
+            user=admin, email=admin.email, event_types=[event.event_type]
+        )
+        logging_models.EmailHook.objects.create(
+            user=self.other_user,
+            email=self.other_user.email,
+            event_types=[event.event_type],
+        )
+
+        process_event(event.id)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [admin.email])
@@ -0,0 +1,124 @@
+from unittest import mock
+
+import requests
+from django.urls import reverse
+from django.utils import timezone
+from freezegun import freeze_time
+from rest_framework import status, test
+
+from waldur_core.core.tests.helpers import override_waldur_core_settings
+from waldur_core.logging import models, webhooks
+from waldur_core.structure.tests import factories as structure_factories
+
+from . import factories
+
+
+@mock.patch('requests.Session.post')
+class WebHookDeliveryTest(test.APITransactionTestCase):
+    def setUp(self):
+        self.hook = factories.WebHookFactory(user=structure_factories.UserFactory())
+        self.events = factories.EventFactory.create_batch(3)
+        for event in self.events:
+            self.hook.process(event)
+
+    def get_states(self):
+        return set(models.WebHookDelivery.objects.values_list('state', flat=True))
+
+    def test_deliveries_are_marked_as_done(self, requests_post):
+        webhooks.dispatcher.dispatch()
+
+        self.assertEqual(requests_post.call_count, 3)
+        self.assertEqual(self.get_states(), {models.WebHookDelivery.States.DONE})
+        stats = webhooks.get_delivery_stats()
+        self.assertEqual(stats[models.WebHookDelivery.States.DONE], 3)
+
+    @override_waldur_core_settings(WEBHOOK_BATCH_SIZE=10)
+    def test_events_are_sent_in_batch(self, requests_post):
+        webhooks.dispatcher.dispatch()
+
+        requests_post.assert_called_once()
+        self.assertEqual(len(requests_post.call_args[1]['json']), 3)
+
+    def test_failed_delivery_is_retried_with_backoff(self, requests_post):
+        requests_post.side_effect = requests.ConnectionError('Connection refused')
+        webhooks.dispatcher.dispatch()
+
+        delivery = models.WebHookDelivery.objects.first()
+        self.assertEqual(delivery.state, models.WebHookDelivery.States.PENDING)
+        self.assertEqual(delivery.attempts, 1)
+        self.assertGreater(delivery.next_attempt, timezone.now())
+
+        # Delivery is not retried until backoff delay is passed
+        webhooks.dispatcher.dispatch()
+        self.assertEqual(requests_post.call_count, 3)
+
+    @override_waldur_core_settings(WEBHOOK_MAX_ATTEMPTS=2)
+    def test_delivery_is_marked_as_erred_after_last_attempt(self, requests_post):
+        requests_post.side_effect = requests.ConnectionError('Connection refused')
+        webhooks.dispatcher.dispatch()
+
+        with freeze_time(timezone.now() + timezone.timedelta(hours=1)):
+            webhooks.dispatcher.dispatch()
+
+        self.assertEqual(requests_post.call_count, 6)
+        self.assertEqual(self.get_states(), {models.WebHookDelivery.States.ERRED})
+
+    @override_waldur_core_settings(WEBHOOK_BATCH_SIZE=10)
+    def test_single_event_is_sent_as_object_in_batch_mode(self, requests_post):
+        models.WebHookDelivery.objects.exclude(event=self.events[0]).delete()
+        webhooks.dispatcher.dispatch()
+
+        requests_post.assert_called_once()
+        self.assertIsInstance(requests_post.call_args[1]['json'], dict)
+
+    @override_waldur_core_settings(WEBHOOK_BATCH_SIZE=10, WEBHOOK_MAX_ATTEMPTS=3)
+    def test_backoff_is_computed_for_each_delivery_in_batch(self, requests_post):
+        requests_post.side_effect = requests.ConnectionError('Connection refused')
+        models.WebHookDelivery.objects.filter(event=self.events[0]).update(attempts=2)
+        webhooks.dispatcher.dispatch()
+
+        deliveries = models.WebHookDelivery.objects.all()
+        erred = deliveries.get(event=self.events[0])
+        self.assertEqual(erred.state, models.WebHookDelivery.States.ERRED)
+        self.assertEqual(erred.attempts, 3)
+        for delivery in deliveries.exclude(event=self.events[0]):
+            self.assertEqual(delivery.state, models.WebHookDelivery.States.PENDING)
+            self.assertEqual(delivery.attempts, 1)
+
+    def test_old_completed_deliveries_are_deleted(self, requests_post):
+        webhooks.dispatcher.dispatch()
+        pending = factories.EventFactory()
+        self.hook.process(pending)
+
+        with freeze_time(timezone.now() + timezone.timedelta(days=30)):
+            webhooks.delete_old_deliveries()
+
+        self.assertEqual(
+            list(models.WebHookDelivery.objects.values_list('event', flat=True)),
+            [pending.id],
+        )
+
+
+class WebHookDeliveryStatsTest(test.APITransactionTestCase):
+    def setUp(self):
+        self.hook = factories.WebHookFactory(user=structure_factories.UserFactory())
+        self.hook.process(factories.EventFactory())
+        self.url = reverse('webhook-delivery-stats')
+
+    def test_staff_can_get_delivery_stats(self):
+        self.client.force_authenticate(structure_factories.UserFactory(is_staff=True))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[models.WebHookDelivery.States.PENDING], 1)
+
+    def test_deliveries_created_before_since_are_skipped(self):
+        self.client.force_authenticate(structure_factories.UserFactory(is_staff=True))
+        since = timezone.now() + timezone.timedelta(hours=1)
+        response = self.client.get(self.url, {'since': since.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[models.WebHookDelivery.States.PENDING], 0)
+
+    def test_other_users_can_not_get_delivery_stats(self):
+        self.client.force_authenticate(self.hook.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
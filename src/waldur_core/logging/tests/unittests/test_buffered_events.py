@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from waldur_core.logging import loggers, models
+from waldur_core.structure.log import event_logger
+from waldur_core.structure.tests import factories as structure_factories
+
+
+class BufferedEventsTest(TransactionTestCase):
+    def setUp(self):
+        self.project = structure_factories.ProjectFactory()
+
+    def emit_event(self):
+        event_logger.project.info(
+            'Project {project_name} has been updated.',
+            event_type='project_update_succeeded',
+            event_context={'project': self.project},
+        )
+
+    def get_feeds(self):
+        return models.Feed.objects.filter(event__event_type='project_update_succeeded')
+
+    def test_events_are_written_when_block_is_closed(self):
+        with loggers.buffered_events():
+            self.emit_event()
+            self.emit_event()
+            self.assertEqual(self.get_feeds().count(), 0)
+
+        self.assertEqual(self.get_feeds().count(), 4)
+        self.assertEqual(self.get_feeds().filter(object_id=self.project.id).count(), 2)
+
+    def test_events_are_written_when_buffer_is_full(self):
+        with loggers.buffered_events(flush_size=2) as buffer:
+            self.emit_event()
+            self.emit_event()
+            self.emit_event()
+            self.assertEqual(self.get_feeds().count(), 4)
+            self.assertEqual(len(buffer.events), 1)
+
+        self.assertEqual(self.get_feeds().count(), 6)
+
+    def test_events_are_written_on_commit_if_block_is_closed_within_transaction(self):
+        with transaction.atomic():
+            with loggers.buffered_events():
+                self.emit_event()
+            self.assertEqual(self.get_feeds().count(), 0)
+
+        self.assertEqual(self.get_feeds().count(), 2)
+
+    @mock.patch('waldur_core.logging.handlers.tasks')
+    def test_hooks_are_processed_for_buffered_events(self, mock_tasks):
+        with loggers.buffered_events():
+            self.emit_event()
+
+        event = models.Event.objects.get(event_type='project_update_succeeded')
+        mock_tasks.process_event.delay.assert_called_once_with(event.pk)
@@ -5,7 +5,7 @@ from rest_framework import decorators, mixins, permissions, response, status, vi
 from waldur_core.core import filters as core_filters
 from waldur_core.core import permissions as core_permissions
 from waldur_core.core.managers import SummaryQuerySet
-from waldur_core.logging import filters, models, serializers, utils
+from waldur_core.logging import filters, models, serializers, utils, webhooks
 from waldur_core.logging.loggers import get_event_groups
 
 
@@ -113,6 +113,21 @@ class WebHookViewSet(BaseHookViewSet):
         """
         return super(WebHookViewSet, self).create(request, *args, **kwargs)
 
+    @decorators.action(detail=False, permission_classes=[permissions.IsAdminUser])
+    def delivery_stats(self, request, *args, **kwargs):
+        """
+        Returns number of web hook deliveries per state, average and maximum latency
+        of delivered events and average duration of HTTP requests.
+        Deliveries created before optional `since` timestamp are skipped.
+        It is available only for staff.
+        """
+        serializer = serializers.WebHookDeliveryStatsSerializer(
+            data=request.query_params
+        )
+        serializer.is_valid(raise_exception=True)
+        stats = webhooks.get_delivery_stats(serializer.validated_data.get('since'))
+        return response.Response(stats, status=status.HTTP_200_OK)
+
 
 class EmailHookViewSet(BaseHookViewSet):
     queryset = models.EmailHook.objects.all()
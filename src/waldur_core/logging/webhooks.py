@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from waldur_core.core.utils import chunks
+from waldur_core.logging import models
+
+logger = logging.getLogger(__name__)
+
+# Claimed deliveries are not picked up by other workers until lease expires.
+LEASE_DURATION = timedelta(minutes=10)
+
+
+class WebHookDispatcher:
+    """
+    Sends pending web hook deliveries from the outbox.
+    HTTP sessions are kept per destination host so that connections are reused
+    between deliveries, and number of concurrent requests per host is bounded.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def get_session(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.sessions:
+                concurrency = settings.WALDUR_CORE['WEBHOOK_MAX_CONCURRENCY_PER_HOST']
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[host] = session
+                self.semaphores[host] = threading.BoundedSemaphore(concurrency)
+            return self.sessions[host], self.semaphores[host]
+
+    def claim(self, limit):
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                models.WebHookDelivery.objects.select_for_update(skip_locked=True)
+                .filter(
+                    state=models.WebHookDelivery.States.PENDING, next_attempt__lte=now
+                )
+                .order_by('next_attempt')
+                .values_list('id', flat=True)[:limit]
+            )
+            models.WebHookDelivery.objects.filter(id__in=ids).update(
+                next_attempt=now + LEASE_DURATION
+            )
+        return (
+            models.WebHookDelivery.objects.filter(id__in=ids)
+            .select_related('hook', 'event')
+            .order_by('id')
+        )
+
+    def get_batches(self, deliveries):
+        batch_size = settings.WALDUR_CORE['WEBHOOK_BATCH_SIZE']
+        hooks = OrderedDict()
+        for delivery in deliveries:
+            hooks.setdefault(delivery.hook_id, []).append(delivery)
+
+        for hook_deliveries in hooks.values():
+            hook = hook_deliveries[0].hook
+            if hook.content_type == models.WebHook.ContentTypeChoices.JSON:
+                yield from chunks(hook_deliveries, batch_size)
+            else:
+                yield from chunks(hook_deliveries, 1)
+
+    def send(self, hook, payloads):
+        """
+        Sends batch of payloads to hook destination and returns
+        duration of request in seconds and error message if request failed.
+        """
+        session, semaphore = self.get_session(hook.destination_url)
+        options = dict(
+            verify=settings.VERIFY_WEBHOOK_REQUESTS,
+            timeout=settings.WALDUR_CORE['WEBHOOK_TIMEOUT'],
+        )
+
+        # encode event as JSON
+        if hook.content_type == models.WebHook.ContentTypeChoices.JSON:
+            if len(payloads) > 1:
+                options['json'] = payloads
+            else:
+                options['json'] = payloads[0]
+
+        # encode event as form
+        elif hook.content_type == models.WebHook.ContentTypeChoices.FORM:
+            options['data'] = payloads[0]
+
+        with semaphore:
+            started = time.monotonic()
+            try:
+                response = session.post(hook.destination_url, **options)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                return time.monotonic() - started, str(e) or e.__class__.__name__
+            return time.monotonic() - started, None
+
+    def dispatch(self, limit=None):
+        limit = limit or settings.WALDUR_CORE['WEBHOOK_DISPATCH_LIMIT']
+        batches = list(self.get_batches(self.claim(limit)))
+        if not batches:
+            return
+
+        tasks = [
+            (batch[0].hook, [batch[0].hook.get_payload(d.event) for d in batch])
+            for batch in batches
+        ]
+        max_workers = min(
+            len(tasks), settings.WALDUR_CORE['WEBHOOK_MAX_CONCURRENCY_PER_HOST'] * 4
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(lambda args: self.send(*args), tasks))
+
+        for batch, (duration, error_message) in zip(batches, results):
+            if error_message:
+                self.set_failed(batch, error_message)
+            else:
+                self.set_done(batch, duration)
+
+    def set_done(self, deliveries, duration):
+        models.WebHookDelivery.objects.filter(
+            id__in=[delivery.id for delivery in deliveries]
+        ).update(
+            state=models.WebHookDelivery.States.DONE,
+            attempts=F('attempts') + 1,
+            delivered=timezone.now(),
+            duration=duration,
+            error_message='',
+        )
+
+    def set_failed(self, deliveries, error_message):
+        hook = deliveries[0].hook
+        logger.warning(
+            'Unable to deliver %s events to web hook URL %s. Error: %s',
+            len(deliveries),
+            hook.destination_url,
+            error_message,
+        )
+        # Deliveries of the same batch may have different number of attempts
+        # so that backoff is computed for each group of deliveries separately.
+        groups = OrderedDict()
+        for delivery in deliveries:
+            groups.setdefault(delivery.attempts + 1, []).append(delivery.id)
+
+        for attempts, ids in groups.items():
+            queryset = models.WebHookDelivery.objects.filter(id__in=ids)
+            if attempts >= settings.WALDUR_CORE['WEBHOOK_MAX_ATTEMPTS']:
+                queryset.update(
+                    state=models.WebHookDelivery.States.ERRED,
+                    attempts=F('attempts') + 1,
+                    error_message=error_message,
+                )
+            else:
+                delay = settings.WALDUR_CORE['WEBHOOK_RETRY_DELAY'] * 2 ** (
+                    attempts - 1
+                )
+                queryset.update(
+                    attempts=F('attempts') + 1,
+                    next_attempt=timezone.now() + delay,
+                    error_message=error_message,
+                )
+
+
+def delete_old_deliveries():
+    """
+    Delete completed and erred deliveries older than WEBHOOK_DELIVERY_LIFETIME.
+    """
+    lifetime = settings.WALDUR_CORE['WEBHOOK_DELIVERY_LIFETIME']
+    models.WebHookDelivery.objects.filter(
+        state__in=[
+            models.WebHookDelivery.States.DONE,
+            models.WebHookDelivery.States.ERRED,
+        ],
+        created__lt=timezone.now() - lifetime,
+    ).delete()
+
+
+def get_delivery_stats(since=None):
+    """
+    Returns number of deliveries per state, average and maximum latency
+    of delivered events and average duration of HTTP requests.
+    """
+    deliveries = models.WebHookDelivery.objects.all()
+    if since:
+        deliveries = deliveries.filter(created__gte=since)
+
+    stats = {state: 0 for (state, _) in models.WebHookDelivery.States.CHOICES}
+    for row in deliveries.values('state').annotate(count=Count('id')):
+        stats[row['state']] = row['count']
+
+    latency = ExpressionWrapper(
+        F('delivered') - F('event__created'), output_field=DurationField()
+    )
+    stats.update(
+        deliveries.filter(state=models.WebHookDelivery.States.DONE).aggregate(
+            average_latency=Avg(latency),
+            max_latency=Max(latency),
+            average_duration=Avg('duration'),
+        )
+    )
+    return stats
+
+
+dispatcher = WebHookDispatcher()
@@ -1,8 +1,9 @@
+from collections import defaultdict
 from functools import reduce
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
-from django.db.models import F, Sum
+from django.db.models import Count, F, Sum
 
 from . import exceptions
 
@@ -226,6 +227,34 @@ class CounterQuotaField(QuotaField):
         current_usage = self.get_current_usage(self.target_models, scope)
         scope.set_quota_usage(self.name, current_usage)
 
+    @property
+    def supports_bulk_recalculation(self):
+        # Custom usage function could not be expressed as single GROUP BY query
+        return self._raw_get_current_usage is None
+
+    def get_usage_aggregate(self):
+        return Count('pk')
+
+    def get_current_usages(self, scope_ids=None):
+        """ Compute usage for all scopes with one GROUP BY query per target model.
+            Returns dictionary where key is scope ID and value is current usage.
+            Scopes without target instances are not included.
+        """
+        filter_path_to_scope = self.path_to_scope.replace('.', '__')
+        usages = defaultdict(int)
+        for model in self.target_models:
+            queryset = model.objects.all()
+            if scope_ids is not None:
+                queryset = queryset.filter(**{filter_path_to_scope + '__in': scope_ids})
+            rows = (
+                queryset.values(filter_path_to_scope)
+                .annotate(usage=self.get_usage_aggregate())
+                .order_by()
+            )
+            for row in rows:
+                usages[row[filter_path_to_scope]] += row['usage'] or 0
+        return usages
+
     def add_usage(self, target_instance, delta):
         try:
             scope = self._get_scope(target_instance)
@@ -271,6 +300,9 @@ class TotalQuotaField(CounterQuotaField):
                 total_usage += subtotal
         return total_usage
 
+    def get_usage_aggregate(self):
+        return Sum(self.target_field)
+
     def get_delta(self, target_instance):
         return getattr(target_instance, self.target_field)
 
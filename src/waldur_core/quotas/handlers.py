@@ -56,6 +56,9 @@ def count_quota_handler_factory(count_quota_field):
 def handle_aggregated_quotas(sender, instance, **kwargs):
     """ Call aggregated quotas fields update methods """
     quota = instance
+    # aggregator quotas are already updated by add_quota_usages.
+    if kwargs.get('aggregated'):
+        return
     # aggregation is not supported for global quotas.
     if quota.scope is None:
         return
@@ -1,20 +1,116 @@
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import prettytable
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
 
 from waldur_core.quotas import exceptions, fields, models, signals
 from waldur_core.quotas.utils import get_models_with_quotas
 
+BULK_UPDATE_BATCH_SIZE = 1000
+
+
+def recalculate_counter_quotas(model_label, field_name, scope_ids=None, dry_run=False):
+    """
+    Recalculate counter quota for all scopes of the model using one GROUP BY query
+    per target model. Only quotas which usage has changed are updated,
+    their versions are stored so that changes are present in quota history.
+    Returns list of tuples with scope ID, old and new usage of changed quotas.
+    """
+    model = apps.get_model(model_label)
+    field = getattr(model.Quotas, field_name)
+    usages = field.get_current_usages(scope_ids)
+
+    quotas = models.Quota.objects.filter(
+        content_type=ContentType.objects.get_for_model(model), name=field.name
+    ).only('id', 'object_id', 'usage', 'limit')
+    if scope_ids is not None:
+        quotas = quotas.filter(object_id__in=scope_ids)
+
+    changes = []
+    changed_quotas = []
+    for quota in quotas.iterator():
+        usage = usages.get(quota.object_id, 0)
+        if quota.usage != usage:
+            changes.append((quota.object_id, quota.usage, usage))
+            quota.usage = usage
+            changed_quotas.append(quota)
+
+    if changed_quotas and not dry_run:
+        with transaction.atomic():
+            models.Quota.objects.bulk_update(
+                changed_quotas, ['usage'], batch_size=BULK_UPDATE_BATCH_SIZE
+            )
+            models.create_quota_versions(changed_quotas)
+    return changes
+
+
+def recalculate_scope_quotas(model_label, field_name, scope_ids=None):
+    """
+    Recalculate quota one scope at a time, so that quota signals are sent.
+    """
+    model = apps.get_model(model_label)
+    field = getattr(model.Quotas, field_name)
+    scopes = model.objects.all()
+    if scope_ids is not None:
+        scopes = scopes.filter(pk__in=scope_ids)
+    for scope in scopes.iterator():
+        field.recalculate(scope=scope)
+    return []
+
 
 class Command(BaseCommand):
     help = """Recalculate all quotas"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Calculate usage of counter quotas with one GROUP BY query per field '
+            'and update only changed quotas. Quota signals are not sent for '
+            'changed counter quotas.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report counter quotas which would be changed in incremental mode '
+            'without updating them.',
+        )
+        parser.add_argument(
+            '-w',
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes used to recalculate quotas. '
+            'Scopes of each model are split evenly between processes.',
+        )
+
     def handle(self, *args, **options):
-        # TODO: implement other quotas recalculation
-        # TODO: implement global stale quotas deletion
-        self.delete_stale_quotas()
-        self.init_missing_quotas()
-        self.recalculate_global_quotas()
-        self.recalculate_counter_quotas()
+        self.workers = options['workers']
+        if self.workers < 1:
+            raise CommandError('Number of workers should be positive.')
+
+        if options['dry_run']:
+            changes = self.recalculate_counter_quotas_in_bulk(dry_run=True)
+            self.report_changes(changes)
+            return
+
+        if options['incremental']:
+            self.delete_stale_quotas_in_bulk()
+            self.init_missing_quotas_in_bulk()
+            self.recalculate_global_quotas()
+            changes = self.recalculate_counter_quotas_in_bulk()
+            self.stdout.write('%s counter quotas have been updated.' % len(changes))
+        else:
+            # TODO: implement other quotas recalculation
+            # TODO: implement global stale quotas deletion
+            self.delete_stale_quotas()
+            self.init_missing_quotas()
+            self.recalculate_global_quotas()
+            self.recalculate_counter_quotas()
         self.recalculate_aggregator_quotas()
         self.stdout.write(
             'XXX: Second time to make sure that aggregators of aggregators where calculated properly.'
@@ -30,6 +126,15 @@ class Command(BaseCommand):
                 obj.quotas.exclude(name__in=quotas_names).delete()
         self.stdout.write('...done')
 
+    def delete_stale_quotas_in_bulk(self):
+        self.stdout.write('Deleting stale quotas')
+        for model in get_models_with_quotas():
+            models.Quota.objects.filter(
+                content_type=ContentType.objects.get_for_model(model),
+                object_id__in=model.objects.values('pk'),
+            ).exclude(name__in=model.get_quotas_names()).delete()
+        self.stdout.write('...done')
+
     def init_missing_quotas(self):
         self.stdout.write('Initializing missing quotas')
         for model in get_models_with_quotas():
@@ -41,6 +146,26 @@ class Command(BaseCommand):
                         pass
         self.stdout.write('...done')
 
+    def init_missing_quotas_in_bulk(self):
+        self.stdout.write('Initializing missing quotas')
+        for model in get_models_with_quotas():
+            quota_fields = model.get_quotas_fields()
+            existing_names = defaultdict(set)
+            for object_id, name in models.Quota.objects.filter(
+                content_type=ContentType.objects.get_for_model(model)
+            ).values_list('object_id', 'name'):
+                existing_names[object_id].add(name)
+
+            for obj in model.objects.all().iterator():
+                for field in quota_fields:
+                    if field.name in existing_names[obj.pk]:
+                        continue
+                    try:
+                        field.get_or_create_quota(scope=obj)
+                    except exceptions.CreationConditionFailedQuotaError:
+                        pass
+        self.stdout.write('...done')
+
     def recalculate_global_quotas(self):
         self.stdout.write('Recalculating global quotas')
         for model in get_models_with_quotas():
@@ -59,10 +184,37 @@ class Command(BaseCommand):
             for counter_field in model.get_quotas_fields(
                 field_class=fields.CounterQuotaField
             ):
-                for instance in model.objects.all():
-                    counter_field.recalculate(scope=instance)
+                self.map_scopes(recalculate_scope_quotas, model, counter_field)
         self.stdout.write('...done')
 
+    def recalculate_counter_quotas_in_bulk(self, dry_run=False):
+        self.stdout.write('Recalculating counter quotas')
+        changes = []
+        for model in get_models_with_quotas():
+            for counter_field in model.get_quotas_fields(
+                field_class=fields.CounterQuotaField
+            ):
+                if counter_field.supports_bulk_recalculation:
+                    field_changes = self.map_scopes(
+                        recalculate_counter_quotas, model, counter_field, dry_run
+                    )
+                elif dry_run:
+                    self.stdout.write(
+                        'Quota %s of %s could not be checked in bulk, skipping it.'
+                        % (counter_field, model._meta.label)
+                    )
+                    continue
+                else:
+                    field_changes = self.map_scopes(
+                        recalculate_scope_quotas, model, counter_field
+                    )
+                changes.extend(
+                    (model._meta.label, counter_field.name) + change
+                    for change in field_changes
+                )
+        self.stdout.write('...done')
+        return changes
+
     def recalculate_aggregator_quotas(self):
         # TODO: recalculate child quotas first
         self.stdout.write('Recalculating aggregator quotas')
@@ -70,11 +222,47 @@ class Command(BaseCommand):
             for aggregator_field in model.get_quotas_fields(
                 field_class=fields.AggregatorQuotaField
             ):
-                for instance in model.objects.all():
-                    aggregator_field.recalculate(scope=instance)
+                self.map_scopes(recalculate_scope_quotas, model, aggregator_field)
         self.stdout.write('...done')
 
     def recalculate_custom_quotas(self):
         self.stdout.write('Recalculating custom quotas')
         signals.recalculate_quotas.send(sender=self)
         self.stdout.write('...done')
+
+    def map_scopes(self, func, model, field, *args):
+        """
+        Call function for all scopes of the model. If several workers are used,
+        scopes are split into shards and each shard is processed in separate process.
+        """
+        if self.workers == 1:
+            return func(model._meta.label, field.name, None, *args)
+
+        scope_ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+        if not scope_ids:
+            return []
+        shard_size = -(-len(scope_ids) // self.workers)
+        shards = [
+            scope_ids[index : index + shard_size]
+            for index in range(0, len(scope_ids), shard_size)
+        ]
+        # Database connection should not be shared between forked processes
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [
+                executor.submit(func, model._meta.label, field.name, shard, *args)
+                for shard in shards
+            ]
+            return sum((future.result() for future in futures), [])
+
+    def report_changes(self, changes):
+        if not changes:
+            self.stdout.write('All counter quotas are up to date.')
+            return
+        table = prettytable.PrettyTable(
+            ['Model', 'Quota', 'Scope ID', 'Current usage', 'Calculated usage']
+        )
+        for change in changes:
+            table.add_row(change)
+        self.stdout.write(str(table))
+        self.stdout.write('%s counter quotas would be updated.' % len(changes))
@@ -1,11 +1,11 @@
 import inspect
 import logging
+from collections import defaultdict
 
 from django.contrib.contenttypes import fields as ct_fields
 from django.contrib.contenttypes import models as ct_models
-from django.core.exceptions import ObjectDoesNotExist
 from django.db import models, transaction
-from django.db.models import Sum
+from django.db.models import Case, F, Q, Sum, Value, When, signals
 from django.utils.translation import ugettext_lazy as _
 from model_utils import FieldTracker
 from reversion import revisions as reversion
@@ -159,42 +159,15 @@ class QuotaModelMixin(models.Model):
             quota.usage = usage
             quota.save(update_fields=['usage'])
 
-    @transaction.atomic
     def add_quota_usage(self, quota_name, usage_delta, validate=False):
-        if usage_delta < 0:
-            # Skip update if it would result in negative value.
-            # We need to use save so that pre_save/post_save signals are emitted.
-            for quota in self.quotas.filter(name=quota_name, usage__gte=-usage_delta):
-                quota.usage += usage_delta
-                quota.save(update_fields=['usage'])
-                return
-        quota = self.get_or_create_quota(quota_name)
-        if validate and quota.is_exceeded(usage_delta):
-            raise exceptions.QuotaValidationError(
-                _(
-                    '%(quota)s "%(name)s" quota is over limit. Required: %(usage)s, limit: %(limit)s.'
-                )
-                % dict(
-                    quota=self,
-                    name=quota_name,
-                    usage=quota.usage + usage_delta,
-                    limit=quota.limit,
-                )
-            )
-        quota.usage += usage_delta
-        if quota.usage < 0:
-            logger.error(
-                '%(quota)s "%(name)s" quota usage should not be negative. '
-                'Current usage: %(usage)s, delta: %(usage_delta)s',
-                dict(
-                    quota=self,
-                    name=quota_name,
-                    usage=quota.usage,
-                    usage_delta=usage_delta,
-                ),
-            )
-            quota.usage = 0
-        quota.save(update_fields=['usage'])
+        add_quota_usages([(self, {quota_name: usage_delta})], validate=validate)
+
+    def add_quota_usages(self, quota_deltas, validate=False):
+        """
+        Add usage deltas to several quotas of the object at once.
+        If validate is True, none of quotas is changed if at least one of them is over limit.
+        """
+        add_quota_usages([(self, quota_deltas)], validate=validate)
 
     def get_quota_ancestors(self):
         if isinstance(self, DescendantMixin):
@@ -221,10 +194,12 @@ class QuotaModelMixin(models.Model):
 
         """
         errors = []
+        quotas = self.quotas.filter(name__in=[str(name) for name in quota_deltas])
+        quotas = {quota.name: quota for quota in quotas}
         for name, delta in quota_deltas.items():
             try:
-                quota = self.quotas.get(name=name)
-            except ObjectDoesNotExist:
+                quota = quotas[str(name)]
+            except KeyError:
                 continue
             if quota.is_exceeded(delta):
                 errors.append(
@@ -323,6 +298,194 @@ class QuotaModelMixin(models.Model):
         return [f.name for f in cls.get_quotas_fields()]
 
 
+def get_quotas(scopes, names, lock=False):
+    """
+    Fetch quotas with given names for all scopes in one query.
+    Returns dictionary where key is tuple of scope content type ID, scope ID and quota name.
+    """
+    query = Q()
+    for scope in scopes:
+        content_type = ct_models.ContentType.objects.get_for_model(scope)
+        query |= Q(content_type=content_type, object_id=scope.id)
+    if not query:
+        return {}
+
+    quotas = Quota.objects.filter(query, name__in=names)
+    if lock:
+        quotas = quotas.select_for_update()
+    return {
+        (quota.content_type_id, quota.object_id, quota.name): quota for quota in quotas
+    }
+
+
+def get_quota_key(scope, name):
+    content_type = ct_models.ContentType.objects.get_for_model(scope)
+    return content_type.id, scope.id, name
+
+
+def get_usage_aggregators(scope, name):
+    """
+    Returns ancestors of scope and names of their usage aggregator quotas
+    which aggregate quota with given name.
+    """
+    quota_field = next((f for f in scope.get_quotas_fields() if f.name == name), None)
+    # usage aggregation should not count another usage aggregator field to avoid calls duplication.
+    if quota_field is None or isinstance(quota_field, fields.UsageAggregatorQuotaField):
+        return []
+
+    aggregators = []
+    for ancestor in scope.get_quota_ancestors():
+        for ancestor_field in ancestor.get_quotas_fields(
+            field_class=fields.UsageAggregatorQuotaField
+        ):
+            if ancestor_field.get_child_quota_name() == name:
+                aggregators.append((ancestor, ancestor_field.name))
+    return aggregators
+
+
+def update_quota_usages(scope, deltas):
+    """
+    Increase usage of several quotas of the scope in single UPDATE statement.
+    """
+    Quota.objects.filter(
+        content_type=ct_models.ContentType.objects.get_for_model(scope),
+        object_id=scope.id,
+        name__in=deltas.keys(),
+    ).update(
+        usage=Case(
+            *[
+                When(name=name, then=F('usage') + Value(delta))
+                for name, delta in deltas.items()
+            ],
+            default=F('usage'),
+            output_field=models.FloatField(),
+        )
+    )
+
+
+def create_quota_versions(quotas):
+    """
+    Store versions of quotas which have been updated without save method,
+    so that their changes are present in quota history.
+    """
+    quotas = [quota for quota in quotas if not quota._is_version_duplicate()]
+    if not quotas:
+        return
+    with reversion.create_revision():
+        for quota in quotas:
+            reversion.add_to_revision(quota)
+
+
+@transaction.atomic
+def add_quota_usages(scope_deltas, validate=False):
+    """
+    Add usage deltas to quotas of several scopes at once.
+
+    scope_deltas - list of tuples of scope and dictionary of quota deltas, for example:
+    [
+        (service_settings, {'ram': 1024, 'vcpu': 1}),
+        (tenant, {'ram': 1024, 'vcpu': 1}),
+    ]
+
+    Quotas of all scopes are fetched and locked in one query.
+    If validate is True, QuotaValidationError is raised before any quota is changed.
+    Usage is not decreased below zero. Deltas of usage aggregator quotas of scope ancestors
+    are accumulated and applied with single UPDATE per ancestor, so that quota
+    post_save signal is emitted only for changed quotas and aggregator quotas are not re-saved.
+    Versions of changed quotas are stored so that their changes are present in quota history.
+    """
+    scope_deltas = [
+        (scope, {str(name): delta for name, delta in deltas.items() if delta})
+        for scope, deltas in scope_deltas
+        if scope
+    ]
+    names = {name for _, deltas in scope_deltas for name in deltas}
+    if not names:
+        return
+
+    scopes = [scope for scope, _ in scope_deltas]
+    quotas = get_quotas(scopes, names, lock=True)
+    for scope, deltas in scope_deltas:
+        for name in deltas:
+            key = get_quota_key(scope, name)
+            if key not in quotas:
+                quotas[key] = scope.get_or_create_quota(name)
+
+    if validate:
+        for scope, deltas in scope_deltas:
+            for name, delta in deltas.items():
+                quota = quotas[get_quota_key(scope, name)]
+                if quota.is_exceeded(delta):
+                    raise exceptions.QuotaValidationError(
+                        _(
+                            '%(quota)s "%(name)s" quota is over limit. Required: %(usage)s, limit: %(limit)s.'
+                        )
+                        % dict(
+                            quota=scope,
+                            name=name,
+                            usage=quota.usage + delta,
+                            limit=quota.limit,
+                        )
+                    )
+
+    changed_quotas = []
+    aggregator_deltas = defaultdict(lambda: defaultdict(float))
+    for scope, deltas in scope_deltas:
+        usage_deltas = {}
+        for name, delta in deltas.items():
+            quota = quotas[get_quota_key(scope, name)]
+            usage = quota.usage + delta
+            if usage < 0:
+                logger.error(
+                    '%(quota)s "%(name)s" quota usage should not be negative. '
+                    'Current usage: %(usage)s, delta: %(usage_delta)s',
+                    dict(quota=scope, name=name, usage=usage, usage_delta=delta),
+                )
+                usage = 0
+            if usage == quota.usage:
+                continue
+            usage_deltas[name] = usage - quota.usage
+            quota.usage = usage
+            # Scope is cached so that post_save handlers do not fetch it again
+            quota.scope = scope
+            changed_quotas.append(quota)
+            for ancestor, aggregator_name in get_usage_aggregators(scope, name):
+                aggregator_deltas[ancestor][aggregator_name] += usage_deltas[name]
+
+        if usage_deltas:
+            update_quota_usages(scope, usage_deltas)
+
+    for ancestor, deltas in aggregator_deltas.items():
+        update_quota_usages(ancestor, deltas)
+        # Keep in sync aggregator quotas which are changed directly as well
+        for name, delta in deltas.items():
+            quota = quotas.get(get_quota_key(ancestor, name))
+            if quota:
+                quota.usage += delta
+
+    aggregator_quotas = get_quotas(
+        aggregator_deltas.keys(),
+        {name for deltas in aggregator_deltas.values() for name in deltas},
+    )
+    changed_ids = {quota.id for quota in changed_quotas}
+    create_quota_versions(
+        changed_quotas
+        + [quota for quota in aggregator_quotas.values() if quota.id not in changed_ids]
+    )
+
+    for quota in changed_quotas:
+        signals.post_save.send(
+            sender=Quota,
+            instance=quota,
+            created=False,
+            update_fields=frozenset(['usage']),
+            raw=False,
+            using=quota._state.db,
+            aggregated=True,
+        )
+        quota.tracker.set_saved_fields()
+
+
 class ExtendableQuotaModelMixin(QuotaModelMixin):
     """ Allows to add quotas to model in runtime.
 
@@ -380,12 +543,10 @@ class SharedQuotaMixin:
         raise NotImplementedError()
 
     def apply_quota_changes(self, validate=False, mult=1):
-        scopes = self.get_quota_scopes()
-        deltas = self.get_quota_deltas()
-        for name, delta in deltas.items():
-            for scope in scopes:
-                if scope:
-                    scope.add_quota_usage(name, delta * mult, validate=validate)
+        deltas = {name: delta * mult for name, delta in self.get_quota_deltas().items()}
+        add_quota_usages(
+            [(scope, deltas) for scope in self.get_quota_scopes()], validate=validate
+        )
 
     def increase_backend_quotas_usage(self, validate=True):
         self.apply_quota_changes(validate=validate)
@@ -1,5 +1,8 @@
+from io import StringIO
+
 from django.core.management import call_command
 from django.test import TestCase
+from reversion.models import Version
 
 from waldur_core.structure.tests import factories as structure_factories
 
@@ -22,3 +25,57 @@ class RecalculateCommandTest(TestCase):
 
         call_command('recalculatequotas')
         self.assertEqual(customer.quotas.get(name='nc_resource_count').usage, 0)
+
+
+class IncrementalRecalculateCommandTest(TestCase):
+    def setUp(self):
+        self.customer = structure_factories.CustomerFactory()
+        structure_factories.ProjectFactory.create_batch(2, customer=self.customer)
+        self.other_customer = structure_factories.CustomerFactory()
+        structure_factories.ProjectFactory(customer=self.other_customer)
+
+    def get_usage(self, customer):
+        return customer.quotas.get(name='nc_project_count').usage
+
+    def test_counter_quotas_are_recalculated_for_all_scopes(self):
+        self.customer.quotas.filter(name='nc_project_count').update(usage=10)
+        self.other_customer.quotas.filter(name='nc_project_count').update(usage=0)
+
+        call_command('recalculatequotas', incremental=True, stdout=StringIO())
+
+        self.assertEqual(self.get_usage(self.customer), 2)
+        self.assertEqual(self.get_usage(self.other_customer), 1)
+
+    def test_only_changed_quotas_are_updated(self):
+        self.customer.quotas.filter(name='nc_project_count').update(usage=10)
+        stdout = StringIO()
+
+        call_command('recalculatequotas', incremental=True, stdout=stdout)
+
+        self.assertIn('1 counter quotas have been updated.', stdout.getvalue())
+
+    def test_versions_of_recalculated_quotas_are_created(self):
+        self.customer.quotas.filter(name='nc_project_count').update(usage=10)
+
+        call_command('recalculatequotas', incremental=True, stdout=StringIO())
+
+        quota = self.customer.quotas.get(name='nc_project_count')
+        version = Version.objects.get_for_object(quota).latest('revision__date_created')
+        self.assertEqual(version.field_dict['usage'], 2)
+
+    def test_dry_run_reports_changes_without_updating_quotas(self):
+        self.customer.quotas.filter(name='nc_project_count').update(usage=10)
+        stdout = StringIO()
+
+        call_command('recalculatequotas', dry_run=True, stdout=stdout)
+
+        self.assertEqual(self.get_usage(self.customer), 10)
+        self.assertIn('nc_project_count', stdout.getvalue())
+        self.assertIn('1 counter quotas would be updated.', stdout.getvalue())
+
+    def test_missing_quotas_are_initialized(self):
+        self.customer.quotas.filter(name='nc_project_count').delete()
+
+        call_command('recalculatequotas', incremental=True, stdout=StringIO())
+
+        self.assertEqual(self.get_usage(self.customer), 2)
@@ -1,9 +1,12 @@
 import random
+from unittest import mock
 
+from django.db.models import signals
 from django.test import TestCase
+from reversion.models import Version
 
-from waldur_core.quotas import exceptions
-from waldur_core.quotas.tests.models import GrandparentModel
+from waldur_core.quotas import exceptions, models
+from waldur_core.quotas.tests.models import ChildModel, GrandparentModel, ParentModel
 
 
 class QuotaModelMixinTest(TestCase):
@@ -89,3 +92,108 @@ class QuotaModelMixinTest(TestCase):
             instances, quota_names=['regular_quota'], fields=['limit']
         )
         self.assertEqual({'regular_quota': -1}, sum_of_quotas)
+
+
+class AddQuotaUsagesTest(TestCase):
+    def setUp(self):
+        self.grandparent = GrandparentModel.objects.create()
+        self.parent = ParentModel.objects.create(parent=self.grandparent)
+        self.child = ChildModel.objects.create(parent=self.parent)
+        self.other_child = ChildModel.objects.create(parent=self.parent)
+
+    def get_usage(self, scope, name):
+        return scope.quotas.get(name=name).usage
+
+    def test_usages_of_several_scopes_are_updated(self):
+        models.add_quota_usages(
+            [
+                (self.child, {'regular_quota': 1, 'usage_aggregator_quota': 2}),
+                (self.other_child, {'regular_quota': 3}),
+            ]
+        )
+        self.assertEqual(self.get_usage(self.child, 'regular_quota'), 1)
+        self.assertEqual(self.get_usage(self.child, 'usage_aggregator_quota'), 2)
+        self.assertEqual(self.get_usage(self.other_child, 'regular_quota'), 3)
+
+    def test_aggregator_quotas_of_ancestors_are_updated(self):
+        models.add_quota_usages(
+            [
+                (self.child, {'usage_aggregator_quota': 2}),
+                (self.other_child, {'usage_aggregator_quota': 3}),
+            ]
+        )
+        for scope in (self.parent, self.grandparent):
+            self.assertEqual(self.get_usage(scope, 'usage_aggregator_quota'), 5)
+        self.assertEqual(
+            self.get_usage(self.parent, 'second_usage_aggregator_quota'), 5
+        )
+
+    def test_quotas_are_not_changed_if_one_of_them_is_over_limit(self):
+        with self.assertRaises(exceptions.QuotaValidationError):
+            models.add_quota_usages(
+                [
+                    (self.grandparent, {'regular_quota': 10}),
+                    (self.grandparent, {'quota_with_default_limit': 200}),
+                ],
+                validate=True,
+            )
+        self.assertEqual(self.get_usage(self.grandparent, 'regular_quota'), 0)
+
+    def test_usage_is_not_decreased_below_zero(self):
+        self.child.add_quota_usages({'usage_aggregator_quota': 2})
+        self.child.add_quota_usages({'usage_aggregator_quota': -5})
+
+        self.assertEqual(self.get_usage(self.child, 'usage_aggregator_quota'), 0)
+        self.assertEqual(self.get_usage(self.parent, 'usage_aggregator_quota'), 0)
+
+    def test_post_save_signal_is_sent_for_changed_quotas_only(self):
+        changes = []
+
+        def handler(sender, instance, **kwargs):
+            changes.append(
+                (instance.name, instance.tracker.previous('usage'), instance.usage)
+            )
+
+        signals.post_save.connect(handler, sender=models.Quota)
+        try:
+            self.child.add_quota_usages(
+                {'regular_quota': 1, 'usage_aggregator_quota': 0}
+            )
+        finally:
+            signals.post_save.disconnect(handler, sender=models.Quota)
+
+        self.assertEqual(changes, [('regular_quota', 0, 1)])
+
+    def test_quotas_of_several_scopes_are_fetched_in_one_query(self):
+        models.add_quota_usages([(self.child, {'regular_quota': 1})])
+
+        # savepoint, lock quotas, update quotas of two scopes,
+        # update aggregator quotas of two ancestors,
+        # fetch aggregator quotas for history, release savepoint
+        with mock.patch.object(models, 'create_quota_versions'):
+            with self.assertNumQueries(8):
+                models.add_quota_usages(
+                    [
+                        (
+                            self.child,
+                            {'regular_quota': 1, 'usage_aggregator_quota': 1},
+                        ),
+                        (self.other_child, {'regular_quota': 1}),
+                    ]
+                )
+
+    def get_versioned_usage(self, scope, name):
+        quota = scope.quotas.get(name=name)
+        version = Version.objects.get_for_object(quota).latest('revision__date_created')
+        return version.field_dict['usage']
+
+    def test_versions_of_changed_quotas_are_created(self):
+        self.child.add_quota_usage('regular_quota', 1)
+        self.assertEqual(self.get_versioned_usage(self.child, 'regular_quota'), 1)
+
+    def test_versions_of_aggregator_quotas_are_created(self):
+        self.child.add_quota_usage('usage_aggregator_quota', 2)
+        for scope in (self.child, self.parent, self.grandparent):
+            self.assertEqual(
+                self.get_versioned_usage(scope, 'usage_aggregator_quota'), 2
+            )
@@ -38,3 +38,15 @@ class CounterQuotaFieldTest(TestCase):
         project.delete()
 
         self.assertEqual(customer.quotas.get(name='nc_project_count').usage, 0)
+
+    def test_current_usages_are_computed_for_all_scopes(self):
+        customer = structure_factories.CustomerFactory()
+        other_customer = structure_factories.CustomerFactory()
+        structure_factories.ProjectFactory.create_batch(2, customer=customer)
+        field = structure_models.Customer.Quotas.nc_project_count
+
+        usages = field.get_current_usages()
+
+        self.assertEqual(usages[customer.id], 2)
+        self.assertNotIn(other_customer.id, usages)
+        self.assertEqual(field.get_current_usages([other_customer.id]), {})
@@ -218,17 +218,17 @@ CACHES = {
 CELERY_BEAT_SCHEDULE = {
     'pull-service-properties': {
         'task': 'waldur_core.structure.ServicePropertiesListPullTask',
-        'schedule': timedelta(hours=24),
+        'schedule': timedelta(minutes=10),
         'args': (),
     },
     'pull-service-resources': {
         'task': 'waldur_core.structure.ServiceResourcesListPullTask',
-        'schedule': timedelta(hours=1),
+        'schedule': timedelta(minutes=10),
         'args': (),
     },
     'pull-service-subresources': {
         'task': 'waldur_core.structure.ServiceSubResourcesListPullTask',
-        'schedule': timedelta(hours=2),
+        'schedule': timedelta(minutes=10),
         'args': (),
     },
     'check-expired-permissions': {
@@ -246,6 +246,26 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': timedelta(hours=1),
         'args': (),
     },
+    'dispatch-provisioning-queues': {
+        'task': 'waldur_core.structure.dispatch_provisioning_queues',
+        'schedule': timedelta(minutes=10),
+        'args': (),
+    },
+    'dispatch-webhook-deliveries': {
+        'task': 'waldur_core.logging.dispatch_webhook_deliveries',
+        'schedule': timedelta(minutes=1),
+        'args': (),
+    },
+    'delete-old-webhook-deliveries': {
+        'task': 'waldur_core.logging.delete_old_webhook_deliveries',
+        'schedule': timedelta(hours=24),
+        'args': (),
+    },
+    'send-email-digests': {
+        'task': 'waldur_core.logging.send_email_digests',
+        'schedule': timedelta(minutes=1),
+        'args': (),
+    },
     'create_customer_permission_reviews': {
         'task': 'waldur_core.structure.create_customer_permission_reviews',
         'schedule': timedelta(hours=24),
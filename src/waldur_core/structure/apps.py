@@ -78,6 +78,20 @@ class StructureConfig(AppConfig):
                 dispatch_uid='waldur_core.structure.handlers.%s' % name,
             )
 
+        for model in structure_models_with_roles:
+            structure_signals.structure_role_granted.connect(
+                handlers.invalidate_visible_ids,
+                sender=model,
+                dispatch_uid='waldur_core.structure.handlers.invalidate_visible_ids_on_%s_role_granted'
+                % model.__name__,
+            )
+            structure_signals.structure_role_revoked.connect(
+                handlers.invalidate_visible_ids,
+                sender=model,
+                dispatch_uid='waldur_core.structure.handlers.invalidate_visible_ids_on_%s_role_revoked'
+                % model.__name__,
+            )
+
         structure_signals.structure_role_granted.connect(
             handlers.log_customer_role_granted,
             sender=Customer,
@@ -164,6 +178,47 @@ class StructureConfig(AppConfig):
                 ),
             )
 
+        for index, model in enumerate(BaseResource.get_all_models()):
+            fsm_signals.post_transition.connect(
+                handlers.mark_provisioning_slot_released,
+                sender=model,
+                dispatch_uid='waldur_core.structure.handlers.mark_provisioning_slot_released_{}_{}'.format(
+                    model.__name__, index
+                ),
+            )
+
+            signals.post_save.connect(
+                handlers.dispatch_provisioning_queue_on_slot_release,
+                sender=model,
+                dispatch_uid='waldur_core.structure.handlers.dispatch_provisioning_queue_on_slot_release_{}_{}'.format(
+                    model.__name__, index
+                ),
+            )
+
+            signals.post_delete.connect(
+                handlers.dispatch_provisioning_queue_on_resource_delete,
+                sender=model,
+                dispatch_uid='waldur_core.structure.handlers.dispatch_provisioning_queue_on_resource_delete_{}_{}'.format(
+                    model.__name__, index
+                ),
+            )
+
+            signals.post_save.connect(
+                handlers.mark_service_settings_activity_on_resource_creation,
+                sender=model,
+                dispatch_uid='waldur_core.structure.handlers.mark_service_settings_activity_on_resource_creation_{}_{}'.format(
+                    model.__name__, index
+                ),
+            )
+
+            fsm_signals.post_transition.connect(
+                handlers.mark_service_settings_activity_on_resource_action,
+                sender=model,
+                dispatch_uid='waldur_core.structure.handlers.mark_service_settings_activity_on_resource_action_{}_{}'.format(
+                    model.__name__, index
+                ),
+            )
+
         for index, model in enumerate(VirtualMachine.get_all_models()):
             signals.post_save.connect(
                 handlers.update_resource_start_time,
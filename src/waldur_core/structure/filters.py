@@ -18,7 +18,7 @@ from waldur_core.core import models as core_models
 from waldur_core.core.filters import ExternalFilterBackend
 from waldur_core.core.utils import get_ordering, is_uuid_like, order_with_nulls
 from waldur_core.structure import models
-from waldur_core.structure.managers import filter_queryset_for_user
+from waldur_core.structure.managers import FilterStrategy, filter_queryset_for_user
 from waldur_core.structure.registry import SupportedServices
 
 User = auth.get_user_model()
@@ -78,8 +78,15 @@ class ScopeTypeFilterBackend(BaseFilterBackend):
 
 
 class GenericRoleFilter(BaseFilterBackend):
+    """
+    Filters objects visible to current user.
+    View may define permission_filter_strategy attribute to choose
+    how permissions are checked, see also FilterStrategy.
+    """
+
     def filter_queryset(self, request, queryset, view):
-        return filter_queryset_for_user(queryset, request.user)
+        strategy = getattr(view, 'permission_filter_strategy', FilterStrategy.JOIN)
+        return filter_queryset_for_user(queryset, request.user, strategy)
 
 
 class GenericUserFilter(BaseFilterBackend):
@@ -2,13 +2,14 @@ import logging
 import re
 
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils import timezone
 
 from waldur_core.core import utils as core_utils
 from waldur_core.core.models import StateMixin
-from waldur_core.structure import signals
+from waldur_core.structure import managers, signals
 from waldur_core.structure.log import event_logger
 from waldur_core.structure.models import (
     Customer,
@@ -16,10 +17,11 @@ from waldur_core.structure.models import (
     CustomerRole,
     Project,
     ProjectPermission,
+    ProvisioningQueueItem,
     ServiceSettings,
 )
 
-from . import tasks
+from . import tasks, utils
 
 logger = logging.getLogger(__name__)
 
@@ -233,6 +235,13 @@ def change_customer_nc_users_quota(sender, structure, user, role, signal, **kwar
     customer.set_quota_usage(Customer.Quotas.nc_user_count, customer_users.count())
 
 
+def invalidate_visible_ids(sender, structure, user, **kwargs):
+    """ Drop cached IDs of customers and projects visible to user on role grant or revoke """
+    managers.invalidate_visible_ids(user.id)
+    # Cache may be filled by concurrent request before transaction is committed
+    transaction.on_commit(lambda: managers.invalidate_visible_ids(user.id))
+
+
 def log_resource_deleted(sender, instance, **kwargs):
     event_logger.resource.info(
         '{resource_full_name} has been deleted.',
@@ -304,6 +313,61 @@ def log_resource_action(sender, instance, name, source, target, **kwargs):
         )
 
 
+def mark_provisioning_slot_released(sender, instance, name, source, target, **kwargs):
+    if source == StateMixin.States.CREATING and target != source:
+        instance._provisioning_slot_released = True
+
+
+def dispatch_provisioning_queue_on_slot_release(sender, instance, **kwargs):
+    if not getattr(instance, '_provisioning_slot_released', False):
+        return
+    instance._provisioning_slot_released = False
+    _dispatch_provisioning_queue(instance)
+
+
+def dispatch_provisioning_queue_on_resource_delete(sender, instance, **kwargs):
+    content_type = ContentType.objects.get_for_model(instance)
+    items = ProvisioningQueueItem.objects.filter(
+        content_type=content_type, object_id=instance.pk
+    )
+    if items.exists():
+        items.delete()
+        _dispatch_provisioning_queue(instance)
+    elif instance.state == StateMixin.States.CREATING:
+        _dispatch_provisioning_queue(instance)
+
+
+def _dispatch_provisioning_queue(resource):
+    content_type = ContentType.objects.get_for_model(resource)
+    if not ProvisioningQueueItem.objects.filter(
+        service_settings_id=resource.service_settings_id, content_type=content_type
+    ).exists():
+        return
+
+    transaction.on_commit(
+        lambda: tasks.dispatch_provisioning_queue.delay(
+            resource.service_settings_id, content_type.id
+        )
+    )
+
+
+def mark_service_settings_activity_on_resource_creation(
+    sender, instance, created=False, **kwargs
+):
+    if created:
+        utils.mark_service_settings_activity(instance.service_settings_id)
+
+
+def mark_service_settings_activity_on_resource_action(
+    sender, instance, name, source, target, **kwargs
+):
+    if target in (
+        StateMixin.States.UPDATE_SCHEDULED,
+        StateMixin.States.DELETION_SCHEDULED,
+    ):
+        utils.mark_service_settings_activity(instance.service_settings_id)
+
+
 def update_resource_start_time(sender, instance, created=False, **kwargs):
     if created:
         return
@@ -0,0 +1,110 @@
+import time
+
+import prettytable
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from waldur_core.structure.managers import (
+    FilterStrategy,
+    filter_queryset_for_user,
+    invalidate_visible_ids,
+)
+
+User = get_user_model()
+
+
+def get_permissioned_models():
+    return [
+        model
+        for model in apps.get_models()
+        if hasattr(model, 'Permissions')
+        and (
+            getattr(model.Permissions, 'customer_path', None)
+            or getattr(model.Permissions, 'project_path', None)
+        )
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares time needed to list objects visible to user "
+        "using JOIN and IDS permission filter strategies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Username of user to check.')
+        parser.add_argument(
+            '-r',
+            '--repeat',
+            type=int,
+            default=10,
+            help='Number of times each query is evaluated.',
+        )
+        parser.add_argument(
+            '-m',
+            '--models',
+            nargs='+',
+            help='Models to check in app_label.ModelName format. '
+            'By default all models with permissions are checked.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('User %s does not exist.' % options['username'])
+
+        if options['models']:
+            try:
+                models = [apps.get_model(label) for label in options['models']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+        else:
+            models = get_permissioned_models()
+
+        # Cached IDs are filled during warm up, so that steady state is measured
+        invalidate_visible_ids(user.id)
+
+        table = prettytable.PrettyTable(
+            ['Model', 'Objects', 'JOIN, ms', 'IDS, ms', 'Speedup']
+        )
+        for model in models:
+            counts = {}
+            timings = {}
+            for strategy in (FilterStrategy.JOIN, FilterStrategy.IDS):
+                counts[strategy] = self.evaluate(model, user, strategy)
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    self.evaluate(model, user, strategy)
+                timings[strategy] = (
+                    (time.perf_counter() - started) * 1000 / options['repeat']
+                )
+
+            if counts[FilterStrategy.JOIN] != counts[FilterStrategy.IDS]:
+                self.stderr.write(
+                    'Strategies return different number of %s objects: %s != %s'
+                    % (
+                        model._meta.label,
+                        counts[FilterStrategy.JOIN],
+                        counts[FilterStrategy.IDS],
+                    )
+                )
+
+            join_time = timings[FilterStrategy.JOIN]
+            ids_time = timings[FilterStrategy.IDS]
+            table.add_row(
+                [
+                    model._meta.label,
+                    counts[FilterStrategy.JOIN],
+                    '%.2f' % join_time,
+                    '%.2f' % ids_time,
+                    '%.2fx' % (join_time / ids_time) if ids_time else '-',
+                ]
+            )
+
+        self.stdout.write(str(table))
+
+    def evaluate(self, model, user, strategy):
+        queryset = filter_queryset_for_user(model.objects.all(), user, strategy)
+        return len(list(queryset.values_list('pk', flat=True)))
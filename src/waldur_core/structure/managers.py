@@ -1,7 +1,21 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 
 from waldur_core.core.managers import GenericKeyMixin
 
+VISIBLE_IDS_CACHE_KEY = 'waldur_core.structure.visible_ids.%s'
+
+
+class FilterStrategy:
+    """
+    JOIN strategy filters objects by joining permission tables and applies DISTINCT.
+    IDS strategy filters objects by cached IDs of customers and projects visible to user.
+    """
+
+    JOIN = 'join'
+    IDS = 'ids'
+
 
 def get_permission_subquery(permissions, user):
     subquery = models.Q()
@@ -26,7 +40,71 @@ def get_permission_subquery(permissions, user):
     return subquery
 
 
-def filter_queryset_for_user(queryset, user):
+def get_visible_ids(user):
+    """
+    Returns IDs of customers and projects where user has active role.
+    Result is cached until role of user is granted or revoked.
+    """
+    from waldur_core.structure.models import CustomerPermission, ProjectPermission
+
+    key = VISIBLE_IDS_CACHE_KEY % user.id
+    visible_ids = cache.get(key)
+    if visible_ids is None:
+        visible_ids = {
+            'customer': set(
+                CustomerPermission.objects.filter(
+                    user=user, is_active=True
+                ).values_list('customer_id', flat=True)
+            ),
+            'project': set(
+                ProjectPermission.objects.filter(user=user, is_active=True).values_list(
+                    'project_id', flat=True
+                )
+            ),
+        }
+        timeout = settings.WALDUR_CORE['PERMISSION_CACHE_TIMEOUT']
+        cache.set(key, visible_ids, timeout.total_seconds())
+    return visible_ids
+
+
+def invalidate_visible_ids(user_id):
+    cache.delete(VISIBLE_IDS_CACHE_KEY % user_id)
+
+
+def is_to_many_path(model, path):
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.many_to_many or field.one_to_many:
+            return True
+        model = field.related_model
+    return False
+
+
+def get_visible_ids_subquery(model, permissions, user):
+    """
+    Same as get_permission_subquery, but uses cached IDs of visible customers and projects.
+    Query does not join permission tables, therefore DISTINCT is not needed.
+    """
+    visible_ids = get_visible_ids(user)
+    subquery = models.Q()
+    for entity in ('customer', 'project'):
+        path = getattr(permissions, '%s_path' % entity, None)
+        if not path:
+            continue
+
+        ids = visible_ids[entity]
+        if path == 'self':
+            subquery |= models.Q(pk__in=ids)
+        elif is_to_many_path(model, path):
+            objects = model._base_manager.filter(**{path + '__in': ids})
+            subquery |= models.Q(pk__in=objects.values('pk'))
+        else:
+            subquery |= models.Q(**{path + '__in': ids})
+
+    return subquery
+
+
+def filter_queryset_for_user(queryset, user, strategy=FilterStrategy.JOIN):
     if user is None or user.is_staff or user.is_support:
         return queryset
 
@@ -35,6 +113,13 @@ def filter_queryset_for_user(queryset, user):
     except AttributeError:
         return queryset
 
+    # Custom query can not be expressed via visible IDs
+    if strategy == FilterStrategy.IDS and not getattr(permissions, 'build_query', None):
+        subquery = get_visible_ids_subquery(queryset.model, permissions, user)
+        if not subquery:
+            return queryset
+        return queryset.filter(subquery)
+
     subquery = get_permission_subquery(permissions, user)
     if not subquery:
         return queryset
@@ -0,0 +1,58 @@
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+import waldur_core.core.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('structure', '0024_project_oecd_fos_2007_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProvisioningQueueItem',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('limit', models.PositiveIntegerField()),
+                ('task_id', models.CharField(max_length=255, unique=True)),
+                ('signature', waldur_core.core.fields.JSONField()),
+                (
+                    'created',
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ('dispatched', models.DateTimeField(blank=True, null=True)),
+                (
+                    'content_type',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='contenttypes.ContentType',
+                    ),
+                ),
+                (
+                    'service_settings',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='structure.ServiceSettings',
+                    ),
+                ),
+            ],
+            options={'ordering': ('created', 'id')},
+        ),
+    ]
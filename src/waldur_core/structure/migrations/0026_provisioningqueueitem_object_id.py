@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('structure', '0025_provisioningqueueitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provisioningqueueitem',
+            name='object_id',
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
@@ -89,6 +89,48 @@ class StructureLoggableMixin(LoggableMixin):
     def get_permitted_objects(cls, user):
         return filter_queryset_for_user(cls.objects.all(), user)
 
+    @classmethod
+    def get_permitted_users(cls, object_ids, users):
+        permissions = getattr(cls, 'Permissions', None)
+        if getattr(permissions, 'build_query', None):
+            return super(StructureLoggableMixin, cls).get_permitted_users(
+                object_ids, users
+            )
+
+        objects = cls.objects.filter(id__in=object_ids)
+        if not objects.exists():
+            return set()
+
+        paths = {
+            entity: getattr(permissions, '%s_path' % entity, None)
+            for entity in ('customer', 'project')
+        }
+        if not any(paths.values()):
+            return {user.id for user in users}
+
+        permitted_users = {
+            user.id for user in users if user.is_staff or user.is_support
+        }
+        other_users = [user.id for user in users if user.id not in permitted_users]
+        if not other_users:
+            return permitted_users
+
+        for entity, permission_model in (
+            ('customer', CustomerPermission),
+            ('project', ProjectPermission),
+        ):
+            path = paths[entity]
+            if not path:
+                continue
+            scopes = objects.values_list(path == 'self' and 'id' or path, flat=True)
+            permitted_users |= set(
+                permission_model.objects.filter(
+                    user_id__in=other_users, is_active=True, **{entity + '__in': scopes}
+                ).values_list('user_id', flat=True)
+            )
+
+        return permitted_users
+
 
 class TagMixin(models.Model):
     """
@@ -199,10 +241,33 @@ class BasePermission(models.Model):
     def get_url_name(cls):
         raise NotImplementedError
 
+    # Name of the field referring to customer, project or offering
+    scope_field = NotImplemented
+
     @classmethod
     def get_expired(cls):
         return cls.objects.filter(expiration_time__lt=timezone.now(), is_active=True)
 
+    @classmethod
+    @transaction.atomic()
+    def revoke_expired(cls):
+        """
+        Revoke all expired permissions using single UPDATE query.
+        Signal structure_role_revoked is sent for each revoked permission
+        because its handlers process users one by one.
+        """
+        permissions = list(
+            cls.get_expired()
+            .select_for_update(of=('self',))
+            .select_related('user', cls.scope_field)
+        )
+        cls.objects.filter(
+            pk__in=[permission.pk for permission in permissions], is_active=True
+        ).update(is_active=None, expiration_time=timezone.now())
+        for permission in permissions:
+            scope = getattr(permission, cls.scope_field)
+            scope.log_role_revoked(permission)
+
     @classmethod
     @lru_cache(maxsize=1)
     def get_all_models(cls):
@@ -344,6 +409,7 @@ class CustomerPermission(BasePermission):
     )
     role = CustomerRole(db_index=True)
     tracker = FieldTracker(fields=['expiration_time'])
+    scope_field = 'customer'
 
     @classmethod
     def get_url_name(cls):
@@ -576,6 +642,24 @@ class Customer(
                 permissions__is_active=True,
             )
 
+    @classmethod
+    def get_permitted_users(cls, object_ids, users):
+        if not cls.objects.filter(id__in=object_ids).exists():
+            return set()
+
+        permitted_users = {
+            user.id for user in users if user.is_staff or user.is_support
+        }
+        permitted_users |= set(
+            CustomerPermission.objects.filter(
+                customer_id__in=object_ids,
+                user_id__in=[user.id for user in users],
+                role=CustomerRole.OWNER,
+                is_active=True,
+            ).values_list('user_id', flat=True)
+        )
+        return permitted_users
+
     def get_display_name(self):
         if self.abbreviation:
             return self.abbreviation
@@ -631,6 +715,7 @@ class ProjectPermission(core_models.UuidMixin, BasePermission):
     )
     role = ProjectRole(db_index=True)
     tracker = FieldTracker(fields=['expiration_time'])
+    scope_field = 'project'
 
     @classmethod
     def get_url_name(cls):
@@ -976,6 +1061,35 @@ class PrivateServiceSettings(ServiceSettings):
         verbose_name_plural = _('Private provider settings')
 
 
+class ProvisioningQueueItem(models.Model):
+    """
+    Provisioning task waiting for a free slot of service settings.
+    Slots are counted per service settings and resource type,
+    waiting tasks are dispatched in FIFO order when a slot is released.
+    Item is removed when its resource is deleted or its task has failed.
+    """
+
+    class Meta:
+        ordering = ('created', 'id')
+
+    service_settings = models.ForeignKey(
+        on_delete=models.CASCADE, to=ServiceSettings, related_name='+'
+    )
+    content_type = models.ForeignKey(
+        on_delete=models.CASCADE, to=ContentType, related_name='+'
+    )
+    object_id = models.PositiveIntegerField(null=True)
+    resource = GenericForeignKey('content_type', 'object_id')
+    limit = models.PositiveIntegerField()
+    task_id = models.CharField(max_length=255, unique=True)
+    signature = JSONField()
+    created = AutoCreatedField()
+    dispatched = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '%s | %s | %s' % (self.service_settings, self.content_type, self.task_id)
+
+
 class BaseServiceProperty(
     core_models.BackendModelMixin,
     core_models.UuidMixin,
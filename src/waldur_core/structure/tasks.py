@@ -2,19 +2,26 @@ import functools
 import logging
 from datetime import timedelta
 
-from celery import shared_task
-from django.db.models import Q
+from celery import shared_task, signature
+from celery.exceptions import Ignore
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 from django.db.utils import DatabaseError
 from django.utils import timezone
 
 from waldur_core.core import models as core_models
 from waldur_core.core import tasks as core_tasks
 from waldur_core.core import utils as core_utils
+from waldur_core.logging import loggers
 from waldur_core.structure import models as structure_models
+from waldur_core.structure import utils as structure_utils
 from waldur_core.structure.exceptions import ServiceBackendError
 
 logger = logging.getLogger(__name__)
 
+PROVISIONING_DISPATCH_TIMEOUT = timedelta(minutes=10)
+
 
 def reraise_exceptions(func):
     @functools.wraps(func)
@@ -33,8 +40,7 @@ def reraise_exceptions(func):
 @shared_task(name='waldur_core.structure.check_expired_permissions')
 def check_expired_permissions():
     for cls in structure_models.BasePermission.get_all_models():
-        for permission in cls.get_expired():
-            permission.revoke()
+        cls.revoke_expired()
 
 
 class BackgroundPullTask(core_tasks.BackgroundTask):
@@ -46,17 +52,13 @@ class BackgroundPullTask(core_tasks.BackgroundTask):
     def run(self, serialized_instance):
         instance = core_utils.deserialize_instance(serialized_instance)
         try:
-            self.pull(instance)
+            with loggers.buffered_events():
+                self.pull(instance)
         except ServiceBackendError as e:
             self.on_pull_fail(instance, e)
         else:
             self.on_pull_success(instance)
 
-    def is_equal(self, other_task, serialized_instance):
-        return self.name == other_task.get(
-            'name'
-        ) and serialized_instance in other_task.get('args', [])
-
     def pull(self, instance):
         """ Pull instance from backend.
 
@@ -105,9 +107,6 @@ class BackgroundListPullTask(core_tasks.BackgroundTask):
     model = NotImplemented
     pull_task = NotImplemented
 
-    def is_equal(self, other_task):
-        return self.name == other_task.get('name')
-
     def get_pulled_objects(self):
         States = self.model.States
         return self.model.objects.filter(state__in=[States.ERRED, States.OK]).exclude(
@@ -120,8 +119,55 @@ class BackgroundListPullTask(core_tasks.BackgroundTask):
             self.pull_task().apply_async(args=(serialized,), kwargs={})
 
 
+class ServicePullTask(BackgroundPullTask):
+    """
+    Pull service settings and record result in adaptive pull schedule.
+
+    Service settings are pulled approximately every pull_interval. If backend is
+    unreachable or has not changed recently, interval is increased up to max_pull_interval.
+    """
+
+    pull_interval = timedelta(hours=1)
+    max_pull_interval = timedelta(hours=8)
+
+    def get_schedule(self):
+        return structure_utils.PullSchedule(
+            self.name, self.pull_interval, self.max_pull_interval
+        )
+
+    def run(self, serialized_instance):
+        service_settings = core_utils.deserialize_instance(serialized_instance)
+        started = timezone.now().timestamp()
+        success = True
+        with structure_utils.count_changed_objects() as changes:
+            try:
+                with loggers.buffered_events():
+                    self.pull(service_settings)
+            except ServiceBackendError as e:
+                success = False
+                self.on_pull_fail(service_settings, e)
+            else:
+                self.on_pull_success(service_settings)
+        self.get_schedule().record(
+            service_settings.pk,
+            started,
+            timezone.now().timestamp() - started,
+            success,
+            changes[0],
+        )
+
+
 class ServiceListPullTask(BackgroundListPullTask):
+    """
+    Schedules pull task only for service settings which are due according to pull schedule.
+
+    List task is expected to be run by celerybeat much more often than pull interval.
+    At most max_pulls_per_run pull tasks are scheduled per run so that background queue
+    is not saturated by installations with many service settings.
+    """
+
     model = structure_models.ServiceSettings
+    max_pulls_per_run = 100
 
     def get_pulled_objects(self):
         States = self.model.States
@@ -129,21 +175,51 @@ class ServiceListPullTask(BackgroundListPullTask):
             state__in=[States.ERRED, States.OK], is_active=True
         )
 
+    def run(self):
+        pull_task = self.pull_task()
+        service_settings_ids = list(
+            self.get_pulled_objects().values_list('pk', flat=True)
+        )
+        due_ids = pull_task.get_schedule().get_due(
+            service_settings_ids, self.max_pulls_per_run
+        )
+        service_settings_map = self.model.objects.in_bulk(due_ids)
+        for service_settings_id in due_ids:
+            serialized = core_utils.serialize_instance(
+                service_settings_map[service_settings_id]
+            )
+            pull_task.apply_async(args=(serialized,), kwargs={})
+        logger.info(
+            '%s of %s service settings are scheduled for pull by %s.',
+            len(due_ids),
+            len(service_settings_ids),
+            self.name,
+        )
+
+
+class ServicePropertiesPullTask(ServicePullTask):
+    pull_interval = timedelta(hours=24)
+    max_pull_interval = timedelta(days=4)
 
-class ServicePropertiesPullTask(BackgroundPullTask):
     def pull(self, service_settings):
         backend = service_settings.get_backend()
         backend.pull_service_properties()
 
 
-class ServiceResourcesPullTask(BackgroundPullTask):
+class ServiceResourcesPullTask(ServicePullTask):
+    pull_interval = timedelta(hours=1)
+    max_pull_interval = timedelta(hours=8)
+
     @reraise_exceptions
     def pull(self, service_settings):
         backend = service_settings.get_backend()
         backend.pull_resources()
 
 
-class ServiceSubResourcesPullTask(BackgroundPullTask):
+class ServiceSubResourcesPullTask(ServicePullTask):
+    pull_interval = timedelta(hours=2)
+    max_pull_interval = timedelta(hours=16)
+
     def pull(self, service_settings):
         backend = service_settings.get_backend()
         backend.pull_subresources()
@@ -177,31 +253,185 @@ class RetryUntilAvailableTask(core_tasks.Task):
         return True
 
 
-class BaseThrottleProvisionTask(RetryUntilAvailableTask):
+class BaseThrottleProvisionTask(core_tasks.Task):
     """
     Before starting resource provisioning, count how many resources
     are already in "creating" state and delay provisioning if there are too many of them.
+
+    Delayed task is not retried. Instead, its signature is stored in FIFO queue
+    of service settings and resource type and it is sent again when
+    one of provisioning resources leaves "creating" state.
     """
 
     DEFAULT_LIMIT = 4
 
-    def is_available(self, resource):
-        usage = self.get_usage(resource)
-        limit = self.get_limit(resource)
-        return usage <= limit
+    def pre_execute(self, resource):
+        content_type = ContentType.objects.get_for_model(resource)
+        with transaction.atomic():
+            # Serialize admission of resources of the same service settings
+            structure_models.ServiceSettings.objects.select_for_update().get(
+                pk=resource.service_settings_id
+            )
+            queue = structure_models.ProvisioningQueueItem.objects.filter(
+                service_settings_id=resource.service_settings_id,
+                content_type=content_type,
+            )
+            item = queue.filter(task_id=self.request.id).first()
+            limit = self.get_limit(resource)
+            usage = self.get_usage(resource) + get_reserved_slots(queue, item)
+
+            if usage < limit:
+                if item:
+                    item.delete()
+                super(BaseThrottleProvisionTask, self).pre_execute(resource)
+                return
+
+            if item:
+                item.dispatched = None
+                item.save(update_fields=['dispatched'])
+            else:
+                structure_models.ProvisioningQueueItem.objects.create(
+                    service_settings_id=resource.service_settings_id,
+                    content_type=content_type,
+                    object_id=resource.pk,
+                    limit=limit,
+                    task_id=self.request.id,
+                    signature=dict(self.signature_from_request()),
+                )
+
+            # Slot could be released while queue has been locked
+            transaction.on_commit(
+                lambda: dispatch_provisioning_queue.delay(
+                    resource.service_settings_id, content_type.id
+                )
+            )
+
+        logger.info(
+            'Provisioning of resource %s is delayed, because limit %s is reached.',
+            core_utils.serialize_instance(resource),
+            limit,
+        )
+        raise Ignore()
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        # Task could fail before admission, for example, if resource has been deleted
+        drop_provisioning_queue_items(
+            structure_models.ProvisioningQueueItem.objects.filter(task_id=task_id)
+        )
+        super(BaseThrottleProvisionTask, self).on_failure(
+            exc, task_id, args, kwargs, einfo
+        )
 
     def get_usage(self, resource):
-        service_settings = resource.service_settings
-        model_class = resource._meta.model
-        return model_class.objects.filter(
-            state=core_models.StateMixin.States.CREATING,
-            service_settings=service_settings,
-        ).count()
+        return get_provisioning_usage(
+            resource.service_settings_id, resource._meta.model
+        )
 
     def get_limit(self, resource):
         return self.DEFAULT_LIMIT
 
 
+def get_provisioning_usage(service_settings_id, model_class):
+    return model_class.objects.filter(
+        state=core_models.StateMixin.States.CREATING,
+        service_settings_id=service_settings_id,
+    ).count()
+
+
+def get_reserved_slots(queue, item=None):
+    """
+    Count slots reserved by dispatched tasks and tasks waiting ahead of the item.
+    Dispatched task which has not been started for a long time releases its slot.
+    """
+    cutoff = timezone.now() - PROVISIONING_DISPATCH_TIMEOUT
+    dispatched = queue.filter(dispatched__gte=cutoff)
+    waiting = queue.exclude(dispatched__gte=cutoff)
+    if item:
+        dispatched = dispatched.exclude(pk=item.pk)
+        if item.dispatched and item.dispatched >= cutoff:
+            waiting = waiting.none()
+        else:
+            waiting = waiting.filter(
+                Q(created__lt=item.created) | Q(created=item.created, id__lt=item.id)
+            )
+    return dispatched.count() + waiting.count()
+
+
+def drop_provisioning_queue_items(items):
+    """
+    Remove queue items and send tasks waiting behind them.
+    """
+    queues = set(items.values_list('service_settings_id', 'content_type_id'))
+    if not queues:
+        return
+    items.delete()
+    for service_settings_id, content_type_id in queues:
+        transaction.on_commit(
+            functools.partial(
+                dispatch_provisioning_queue.delay, service_settings_id, content_type_id
+            )
+        )
+
+
+@shared_task(name='waldur_core.structure.dispatch_provisioning_queue')
+def dispatch_provisioning_queue(service_settings_id, content_type_id):
+    """
+    Send as many waiting provisioning tasks as there are free slots.
+    """
+    with transaction.atomic():
+        structure_models.ServiceSettings.objects.select_for_update().get(
+            pk=service_settings_id
+        )
+        queue = structure_models.ProvisioningQueueItem.objects.filter(
+            service_settings_id=service_settings_id, content_type_id=content_type_id
+        )
+        model_class = ContentType.objects.get_for_id(content_type_id).model_class()
+        # Drop items of resources which have been deleted without signals
+        queue.filter(object_id__isnull=False).annotate(
+            resource_exists=Exists(model_class.objects.filter(pk=OuterRef('object_id')))
+        ).filter(resource_exists=False).delete()
+
+        head = queue.first()
+        if not head:
+            return
+
+        cutoff = timezone.now() - PROVISIONING_DISPATCH_TIMEOUT
+        free_slots = (
+            head.limit
+            - get_provisioning_usage(service_settings_id, model_class)
+            - queue.filter(dispatched__gte=cutoff).count()
+        )
+        if free_slots <= 0:
+            return
+
+        items = list(queue.exclude(dispatched__gte=cutoff)[:free_slots])
+        queue.filter(pk__in=[item.pk for item in items]).update(
+            dispatched=timezone.now()
+        )
+        signatures = [item.signature for item in items]
+
+        def send():
+            for item_signature in signatures:
+                signature(item_signature).apply_async()
+
+        transaction.on_commit(send)
+
+
+@shared_task(name='waldur_core.structure.dispatch_provisioning_queues')
+def dispatch_provisioning_queues():
+    """
+    Send waiting provisioning tasks which have not been dispatched on slot release,
+    for example, because resource state has been changed without saving it.
+    """
+    pairs = (
+        structure_models.ProvisioningQueueItem.objects.order_by()
+        .values_list('service_settings_id', 'content_type_id')
+        .distinct()
+    )
+    for service_settings_id, content_type_id in pairs:
+        dispatch_provisioning_queue.delay(service_settings_id, content_type_id)
+
+
 class ThrottleProvisionTask(BaseThrottleProvisionTask, core_tasks.BackendMethodTask):
     pass
 
@@ -219,9 +449,6 @@ class SetErredStuckResources(core_tasks.BackgroundTask):
 
     name = 'waldur_core.structure.SetErredStuckResources'
 
-    def is_equal(self, other_task):
-        return self.name == other_task.get('name')
-
     def run(self):
         cutoff = timezone.now() - timedelta(hours=3)
         states = (
@@ -233,14 +460,22 @@ class SetErredStuckResources(core_tasks.BackgroundTask):
             + structure_models.SubResource.get_all_models()
         )
         for model in resource_models:
-            for resource in model.objects.filter(modified__lt=cutoff, state__in=states):
-                resource.set_erred()
-                resource.error_message = 'Provisioning has timed out.'
-                resource.save(update_fields=['state', 'error_message'])
+            stuck_resources = list(
+                model.objects.filter(modified__lt=cutoff, state__in=states)
+            )
+            erred_resources = core_utils.bulk_transition(
+                stuck_resources,
+                'set_erred',
+                error_message='Provisioning has timed out.',
+            )
+            if erred_resources:
                 logger.warning(
-                    'Switching resource %s to erred state, '
+                    'Switching resources %s to erred state, '
                     'because provisioning has timed out.',
-                    core_utils.serialize_instance(resource),
+                    ', '.join(
+                        core_utils.serialize_instance(resource)
+                        for resource in erred_resources
+                    ),
                 )
 
 
@@ -578,6 +578,20 @@ class CustomerPermissionExpirationTest(test.APITransactionTestCase):
             )
         )
 
+    @mock.patch('waldur_core.structure.signals.structure_role_revoked.send')
+    def test_expired_permissions_are_revoked_without_query_per_permission(
+        self, send_signal
+    ):
+        factories.CustomerPermissionFactory.create_batch(
+            3, expiration_time=timezone.now() - datetime.timedelta(days=100)
+        )
+
+        # lock expired permissions, revoke them
+        with self.assertNumQueries(2):
+            CustomerPermission.revoke_expired()
+
+        self.assertEqual(send_signal.call_count, 3)
+
     def test_when_expiration_time_is_updated_event_is_emitted(self):
         staff_user = factories.UserFactory(is_staff=True)
         self.client.force_authenticate(user=staff_user)
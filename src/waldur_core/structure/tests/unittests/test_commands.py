@@ -4,7 +4,7 @@ from io import StringIO
 from django.core.management import call_command
 from django.test import TestCase
 
-from waldur_core.structure.tests import factories
+from waldur_core.structure.tests import factories, fixtures
 
 
 class DumpUsersCommandTest(TestCase):
@@ -19,3 +19,20 @@ class DumpUsersCommandTest(TestCase):
         if not isinstance(value, str):
             value = value.decode('utf-8')
         self.assertIn(user.full_name, value)
+
+
+class BenchmarkPermissionFiltersCommandTest(TestCase):
+    def test_timings_are_reported_for_both_strategies(self):
+        fixture = fixtures.ProjectFixture()
+        output = StringIO()
+        errors = StringIO()
+        call_command(
+            'benchmark_permission_filters',
+            fixture.admin.username,
+            models=['structure.Customer', 'structure.Project'],
+            repeat=1,
+            stdout=output,
+            stderr=errors,
+        )
+        self.assertIn('structure.Project', output.getvalue())
+        self.assertEqual(errors.getvalue(), '')
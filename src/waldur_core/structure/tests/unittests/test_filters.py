@@ -1,9 +1,15 @@
+import itertools
 from datetime import datetime, timedelta
 
+from ddt import data, ddt, unpack
+from django.test import TestCase
 from rest_framework.test import APITransactionTestCase
 
 from waldur_core.core.tests.helpers import override_waldur_core_settings
-from waldur_core.structure.tests import factories
+from waldur_core.structure import models
+from waldur_core.structure.managers import FilterStrategy, filter_queryset_for_user
+from waldur_core.structure.tests import factories, fixtures
+from waldur_core.structure.tests import models as test_models
 from waldur_core.structure.tests.factories import ProjectFactory, UserFactory
 
 
@@ -37,3 +43,71 @@ class CustomerAccountingStartDateFilterTest(APITransactionTestCase):
             ProjectFactory.get_list_url(), {"accounting_is_running": "false",}
         )
         self.assertEqual(len(response.data), 1)
+
+
+@ddt
+class PermissionFilterStrategyTest(TestCase):
+    def setUp(self):
+        self.fixture = fixtures.ServiceFixture()
+        self.fixture.resource
+        other_fixture = fixtures.ServiceFixture()
+        other_fixture.resource
+        # Second project of the same customer is visible only to customer owner
+        factories.TestNewInstanceFactory(
+            service_settings=self.fixture.service_settings,
+            project=factories.ProjectFactory(customer=self.fixture.customer),
+        )
+
+    def filter(self, model, user, strategy):
+        return filter_queryset_for_user(model.objects.all(), user, strategy)
+
+    @data(
+        *itertools.product(
+            ('owner', 'customer_support', 'admin', 'manager', 'member', 'user'),
+            (
+                models.Customer,
+                models.Project,
+                models.CustomerPermission,
+                models.ProjectPermission,
+                test_models.TestNewInstance,
+            ),
+        )
+    )
+    @unpack
+    def test_strategies_return_the_same_objects(self, user, model):
+        user = getattr(self.fixture, user)
+        join_ids = list(
+            self.filter(model, user, FilterStrategy.JOIN).values_list('pk', flat=True)
+        )
+        visible_ids = list(
+            self.filter(model, user, FilterStrategy.IDS).values_list('pk', flat=True)
+        )
+        self.assertEqual(sorted(join_ids), sorted(visible_ids))
+
+    def test_ids_strategy_does_not_use_distinct(self):
+        queryset = self.filter(models.Customer, self.fixture.admin, FilterStrategy.IDS)
+        self.assertFalse(queryset.query.distinct)
+
+    def test_visible_ids_are_cached(self):
+        user = self.fixture.owner
+        self.filter(models.Project, user, FilterStrategy.IDS).count()
+
+        with self.assertNumQueries(1):
+            self.filter(models.Project, user, FilterStrategy.IDS).count()
+
+    def test_cache_is_invalidated_when_role_is_granted_and_revoked(self):
+        user = self.fixture.user
+        self.assertEqual(
+            self.filter(models.Project, user, FilterStrategy.IDS).count(), 0
+        )
+
+        self.fixture.project.add_user(user, models.ProjectRole.ADMINISTRATOR)
+        self.assertEqual(
+            list(self.filter(models.Project, user, FilterStrategy.IDS)),
+            [self.fixture.project],
+        )
+
+        self.fixture.project.remove_user(user)
+        self.assertEqual(
+            self.filter(models.Project, user, FilterStrategy.IDS).count(), 0
+        )
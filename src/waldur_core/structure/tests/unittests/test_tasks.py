@@ -2,42 +2,131 @@ from datetime import timedelta
 from unittest import mock
 
 from ddt import data, ddt
-from django.test import TestCase
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from freezegun import freeze_time
 
 from waldur_core.core import utils
+from waldur_core.structure import models as structure_models
 from waldur_core.structure import tasks
+from waldur_core.structure import utils as structure_utils
 from waldur_core.structure.tests import factories, models
 
 
 @ddt
 class ThrottleProvisionTaskTest(TestCase):
+    def setUp(self):
+        self.service_settings = factories.ServiceSettingsFactory()
+        self.project = factories.ProjectFactory()
+
+    def create_resources(self, size, state=models.TestNewInstance.States.CREATING):
+        return factories.TestNewInstanceFactory.create_batch(
+            size=size,
+            state=state,
+            service_settings=self.service_settings,
+            project=self.project,
+        )
+
+    def provision(self, vm, task_id=None):
+        tasks.ThrottleProvisionTask().si(
+            utils.serialize_instance(vm), 'create', state_transition='begin_creating'
+        ).apply(task_id=task_id)
+
+    def queue_provisioning(self):
+        self.create_resources(tasks.ThrottleProvisionTask.DEFAULT_LIMIT)
+        [vm] = self.create_resources(
+            1, state=models.TestNewInstance.States.CREATION_SCHEDULED
+        )
+        self.provision(vm, task_id='waiting-task')
+        self.assertTrue(structure_models.ProvisioningQueueItem.objects.exists())
+        return vm
+
+    def delete_without_signals(self, vm):
+        models.TestNewInstance.objects.filter(pk=vm.pk)._raw_delete('default')
+
     @data(
-        dict(size=tasks.ThrottleProvisionTask.DEFAULT_LIMIT + 1, retried=True),
-        dict(size=tasks.ThrottleProvisionTask.DEFAULT_LIMIT - 1, retried=False),
+        dict(size=tasks.ThrottleProvisionTask.DEFAULT_LIMIT + 1, queued=True),
+        dict(size=tasks.ThrottleProvisionTask.DEFAULT_LIMIT, queued=True),
+        dict(size=tasks.ThrottleProvisionTask.DEFAULT_LIMIT - 1, queued=False),
     )
     def test_if_limit_is_reached_provisioning_is_delayed(self, params):
-        service_settings = factories.ServiceSettingsFactory()
-        project = factories.ProjectFactory()
-        factories.TestNewInstanceFactory.create_batch(
-            size=params['size'],
-            state=models.TestNewInstance.States.CREATING,
-            service_settings=service_settings,
-            project=project,
+        self.create_resources(params['size'])
+        [vm] = self.create_resources(
+            1, state=models.TestNewInstance.States.CREATION_SCHEDULED
         )
-        vm = factories.TestNewInstanceFactory(
-            state=models.TestNewInstance.States.CREATION_SCHEDULED,
-            service_settings=service_settings,
-            project=project,
+
+        self.provision(vm)
+
+        vm.refresh_from_db()
+        queued = structure_models.ProvisioningQueueItem.objects.exists()
+        self.assertEqual(queued, params['queued'])
+        self.assertEqual(
+            vm.state == models.TestNewInstance.States.CREATION_SCHEDULED,
+            params['queued'],
         )
-        serialized_vm = utils.serialize_instance(vm)
-        mocked_retry = mock.Mock()
-        tasks.ThrottleProvisionTask.retry = mocked_retry
-        tasks.ThrottleProvisionTask().si(
-            serialized_vm, 'create', state_transition='begin_starting'
-        ).apply()
-        self.assertEqual(mocked_retry.called, params['retried'])
+
+    def test_waiting_tasks_are_dispatched_in_fifo_order_when_slot_is_released(self):
+        resources = self.create_resources(tasks.ThrottleProvisionTask.DEFAULT_LIMIT)
+        first_vm, second_vm = self.create_resources(
+            2, state=models.TestNewInstance.States.CREATION_SCHEDULED
+        )
+        self.provision(first_vm)
+        self.provision(second_vm)
+        self.assertEqual(structure_models.ProvisioningQueueItem.objects.count(), 2)
+
+        resources[0].set_ok()
+        resources[0].save()
+        content_type = ContentType.objects.get_for_model(first_vm)
+        tasks.dispatch_provisioning_queue(self.service_settings.id, content_type.id)
+
+        first_item, second_item = structure_models.ProvisioningQueueItem.objects.all()
+        self.assertIsNotNone(first_item.dispatched)
+        self.assertIsNone(second_item.dispatched)
+
+    def test_task_waiting_in_queue_does_not_overtake_dispatched_task(self):
+        resources = self.create_resources(tasks.ThrottleProvisionTask.DEFAULT_LIMIT)
+        first_vm, second_vm = self.create_resources(
+            2, state=models.TestNewInstance.States.CREATION_SCHEDULED
+        )
+        self.provision(first_vm)
+        resources[0].set_ok()
+        resources[0].save()
+        content_type = ContentType.objects.get_for_model(first_vm)
+        tasks.dispatch_provisioning_queue(self.service_settings.id, content_type.id)
+
+        self.provision(second_vm)
+
+        second_vm.refresh_from_db()
+        self.assertEqual(
+            second_vm.state, models.TestNewInstance.States.CREATION_SCHEDULED
+        )
+        self.assertEqual(structure_models.ProvisioningQueueItem.objects.count(), 2)
+
+    def test_queue_item_is_removed_when_waiting_resource_is_deleted(self):
+        vm = self.queue_provisioning()
+
+        vm.delete()
+
+        self.assertFalse(structure_models.ProvisioningQueueItem.objects.exists())
+
+    def test_queue_item_is_removed_when_task_fails(self):
+        vm = self.queue_provisioning()
+        self.delete_without_signals(vm)
+
+        self.provision(vm, task_id='waiting-task')
+
+        self.assertFalse(structure_models.ProvisioningQueueItem.objects.exists())
+
+    def test_queue_items_of_missing_resources_are_dropped_on_dispatch(self):
+        vm = self.queue_provisioning()
+        self.delete_without_signals(vm)
+
+        content_type = ContentType.objects.get_for_model(vm)
+        tasks.dispatch_provisioning_queue(self.service_settings.id, content_type.id)
+
+        self.assertFalse(structure_models.ProvisioningQueueItem.objects.exists())
 
 
 class SetErredProvisioningResourcesTaskTest(TestCase):
@@ -92,3 +181,122 @@ class ExceptionTest(TestCase):
             service_settings.type,
         )
         self.assertRaisesRegex(KeyError, error_message, task.pull, service_settings)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+)
+class ServiceListPullTaskTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.service_settings = factories.ServiceSettingsFactory()
+        self.pull_task = tasks.ServiceResourcesPullTask()
+        self.schedule = self.pull_task.get_schedule()
+
+    def get_scheduled_ids(self):
+        with mock.patch.object(
+            tasks.ServiceResourcesPullTask, 'apply_async'
+        ) as mocked_apply:
+            tasks.ServiceResourcesListPullTask().run()
+        return [
+            utils.deserialize_instance(call[1]['args'][0]).pk
+            for call in mocked_apply.call_args_list
+        ]
+
+    def record(self, success=True, changes=0):
+        return self.schedule.record(
+            self.service_settings.pk, timezone.now().timestamp(), 1, success, changes,
+        )
+
+    def test_service_settings_without_schedule_are_pulled(self):
+        self.assertEqual(self.get_scheduled_ids(), [self.service_settings.pk])
+
+    def test_recently_pulled_service_settings_are_skipped(self):
+        self.record()
+        self.assertEqual(self.get_scheduled_ids(), [])
+
+    def test_service_settings_are_pulled_when_interval_passes(self):
+        self.record()
+        with freeze_time(timezone.now() + timedelta(days=1)):
+            self.assertEqual(self.get_scheduled_ids(), [self.service_settings.pk])
+
+    def test_interval_is_increased_exponentially_on_failure(self):
+        first = self.record(success=False)
+        second = self.record(success=False)
+        self.assertEqual(second['failures'], 2)
+        self.assertGreater(second['interval'], first['interval'] * 1.5)
+        self.assertLessEqual(
+            second['interval'], self.pull_task.max_pull_interval.total_seconds() * 1.1,
+        )
+
+    def test_interval_is_increased_if_backend_does_not_change(self):
+        changed = self.record(changes=10)
+        unchanged = self.record(changes=0)
+        unchanged = self.record(changes=0)
+        self.assertGreater(unchanged['interval'], changed['interval'] * 1.5)
+
+    def test_interval_is_not_shorter_than_pull_duration(self):
+        state = self.schedule.record(
+            self.service_settings.pk, timezone.now().timestamp(), 3600, True, 10
+        )
+        self.assertGreaterEqual(
+            state['interval'], 3600 * self.schedule.duration_factor * 0.9
+        )
+
+    def test_service_settings_with_user_activity_go_first(self):
+        other_settings = factories.ServiceSettingsFactory()
+        with freeze_time(timezone.now() - timedelta(days=1)):
+            self.record(changes=0)
+            self.schedule.record(
+                other_settings.pk, timezone.now().timestamp(), 1, True, 0
+            )
+        structure_utils.mark_service_settings_activity(self.service_settings.pk)
+        self.assertEqual(self.get_scheduled_ids()[0], self.service_settings.pk)
+
+    def test_number_of_pulls_per_run_is_limited(self):
+        factories.ServiceSettingsFactory.create_batch(3)
+        with mock.patch.object(
+            tasks.ServiceResourcesListPullTask, 'max_pulls_per_run', 2
+        ):
+            self.assertEqual(len(self.get_scheduled_ids()), 2)
+
+    def pull(self, pull_resources):
+        backend = mock.Mock()
+        backend.pull_resources.side_effect = pull_resources
+        self.service_settings.get_backend = mock.Mock(return_value=backend)
+        with mock.patch(
+            'waldur_core.core.utils.deserialize_instance',
+            return_value=self.service_settings,
+        ):
+            self.pull_task.run(utils.serialize_instance(self.service_settings))
+        return self.schedule.get_states([self.service_settings.pk])[
+            self.service_settings.pk
+        ]
+
+    def test_interval_is_increased_if_pull_saves_unchanged_resources(self):
+        vm = factories.TestNewInstanceFactory(service_settings=self.service_settings)
+
+        def rename_vm():
+            vm.name = 'Renamed VM'
+            vm.save()
+
+        changed = self.pull(rename_vm)
+        unchanged = self.pull(vm.save)
+        unchanged = self.pull(vm.save)
+
+        self.assertGreater(changed['changes'], 0)
+        self.assertEqual(unchanged['changes'], 0)
+        self.assertGreater(unchanged['interval'], changed['interval'] * 1.5)
+
+    def test_pull_result_is_recorded(self):
+        self.service_settings.get_backend = mock.Mock()
+        with mock.patch(
+            'waldur_core.core.utils.deserialize_instance',
+            return_value=self.service_settings,
+        ):
+            self.pull_task.run(utils.serialize_instance(self.service_settings))
+        state = self.schedule.get_states([self.service_settings.pk])[
+            self.service_settings.pk
+        ]
+        self.assertTrue(state['success'])
+        self.assertEqual(state['failures'], 0)
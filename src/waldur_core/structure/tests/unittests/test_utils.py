@@ -1,6 +1,11 @@
 import unittest
 from unittest import mock
 
+from django.db.models import signals
+from django.test import TestCase
+
+from waldur_core.structure import utils
+from waldur_core.structure.tests import factories, models
 from waldur_core.structure.utils import update_pulled_fields
 
 
@@ -23,7 +28,7 @@ class UpdatePulledFieldsTest(unittest.TestCase):
         vm1 = InstanceMock()
         vm2 = InstanceMock(runtime_state='ERRED')
         update_pulled_fields(vm1, vm2, ('name', 'runtime_state'))
-        self.assertEqual(vm1.save.call_count, 1)
+        vm1.save.assert_called_once_with(update_fields={'runtime_state'})
 
     def test_model_is_not_saved_if_changed_fields_are_ignored(self):
         vm1 = InstanceMock()
@@ -36,3 +41,47 @@ class UpdatePulledFieldsTest(unittest.TestCase):
         vm2 = InstanceMock(error_message='Server does not respond.')
         update_pulled_fields(vm1, vm2, ('name',))
         self.assertEqual(vm1.save.call_count, 1)
+
+
+class ReconciliationTest(TestCase):
+    def setUp(self):
+        self.vm = factories.TestNewInstanceFactory(
+            name='Old name',
+            state=models.TestNewInstance.States.ERRED,
+            error_message='Error',
+        )
+
+    def test_changes_are_saved_when_context_is_closed(self):
+        imported_vm = models.TestNewInstance(name='New name')
+        with utils.reconciliation():
+            update_pulled_fields(self.vm, imported_vm, ('name',))
+            utils.handle_resource_update_success(self.vm)
+            self.assertEqual(
+                models.TestNewInstance.objects.get(pk=self.vm.pk).name, 'Old name'
+            )
+
+        self.vm.refresh_from_db()
+        self.assertEqual(self.vm.name, 'New name')
+        self.assertEqual(self.vm.state, models.TestNewInstance.States.OK)
+
+    def test_instance_is_saved_once_with_changed_fields(self):
+        imported_vm = models.TestNewInstance(name='New name')
+        handler = mock.Mock()
+        signals.post_save.connect(handler, sender=models.TestNewInstance)
+        try:
+            with utils.reconciliation():
+                update_pulled_fields(self.vm, imported_vm, ('name',))
+                utils.handle_resource_update_success(self.vm)
+        finally:
+            signals.post_save.disconnect(handler, sender=models.TestNewInstance)
+
+        self.assertEqual(handler.call_count, 1)
+        self.assertEqual(
+            handler.call_args[1]['update_fields'],
+            {'name', 'state', 'error_message', 'modified'},
+        )
+
+    def test_only_changed_fields_are_saved_without_context(self):
+        utils.handle_resource_not_found(self.vm)
+        self.vm.refresh_from_db()
+        self.assertIn('Does not exist at backend.', self.vm.error_message)
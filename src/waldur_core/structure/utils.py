@@ -1,6 +1,15 @@
+import collections
 import logging
+import random
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
 
-from django.db import transaction
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DatabaseError, transaction
+from django.db.models import signals
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from rest_framework.exceptions import ValidationError
 
@@ -10,17 +19,30 @@ from waldur_core.structure.signals import project_moved
 logger = logging.getLogger(__name__)
 
 
-def update_pulled_fields(instance, imported_instance, fields):
+BULK_UPDATE_BATCH_SIZE = 500
+
+
+def get_field_attname(instance, imported_instance, field_name):
+    try:
+        attname = instance._meta.get_field(field_name).attname
+    except (FieldDoesNotExist, AttributeError):
+        return field_name
+    return attname if hasattr(imported_instance, attname) else field_name
+
+
+def set_pulled_fields(instance, imported_instance, fields):
     """
-    Update instance fields based on imported from backend data.
-    Save changes to DB only one or more fields were changed.
+    Update instance fields based on imported from backend data without saving them.
+    Returns set of names of changed fields.
     """
-    modified = False
+    changed_fields = set()
     for field in fields:
-        pulled_value = getattr(imported_instance, field)
-        current_value = getattr(instance, field)
+        # Compare foreign keys by ID so that related objects are not fetched
+        attname = get_field_attname(instance, imported_instance, field)
+        current_value = getattr(instance, attname)
+        pulled_value = getattr(imported_instance, attname)
         if current_value != pulled_value:
-            setattr(instance, field, pulled_value)
+            setattr(instance, field, getattr(imported_instance, field))
             logger.info(
                 "%s's with PK %s %s field updated from value '%s' to value '%s'",
                 instance.__class__.__name__,
@@ -29,62 +51,289 @@ def update_pulled_fields(instance, imported_instance, fields):
                 current_value,
                 pulled_value,
             )
-            modified = True
+            changed_fields.add(field)
     error_message = getattr(imported_instance, 'error_message', '') or getattr(
         instance, 'error_message', ''
     )
     if error_message and instance.error_message != error_message:
         instance.error_message = imported_instance.error_message
-        modified = True
-    if modified:
-        instance.save()
-    return modified
+        changed_fields.add('error_message')
+    return changed_fields
 
 
-def handle_resource_not_found(resource):
+def update_pulled_fields(instance, imported_instance, fields):
     """
-    Set resource state to ERRED and append/create "not found" error message.
+    Update instance fields based on imported from backend data.
+    Save changes to DB only one or more fields were changed.
+    """
+    changed_fields = set_pulled_fields(instance, imported_instance, fields)
+    save_pulled_fields(instance, changed_fields)
+    return bool(changed_fields)
+
+
+def get_update_fields(instance, changed_fields):
+    """
+    Return names of fields which should be passed to save method.
+    If some of changed fields are not concrete fields of the model, for example,
+    they are properties, None is returned so that whole instance is saved.
+    """
+    try:
+        concrete_fields = instance._meta.concrete_fields
+    except AttributeError:
+        return set(changed_fields)
+    field_names = {field.name for field in concrete_fields} | {
+        field.attname for field in concrete_fields
+    }
+    if not set(changed_fields) <= field_names:
+        return None
+    update_fields = set(changed_fields)
+    if 'modified' in field_names:
+        update_fields.add('modified')
+    return update_fields
+
+
+class PulledChanges:
+    """
+    Changes of pulled instances collected within reconciliation context.
+    Changed fields of the same instance are merged, so that it is saved only once.
+    """
+
+    def __init__(self):
+        self.changes = collections.OrderedDict()
+
+    def add(self, instance, changed_fields):
+        key = (instance.__class__, id(instance))
+        if key in self.changes:
+            self.changes[key][1].update(changed_fields)
+        else:
+            self.changes[key] = (instance, set(changed_fields))
+
+    def flush(self):
+        changes = list(self.changes.values())
+        self.changes.clear()
+        bulk_changes = []
+        for instance, changed_fields in changes:
+            # Instance has been deleted during pull
+            if instance.pk is None:
+                continue
+            if get_update_fields(instance, changed_fields) is None:
+                instance.save()
+            else:
+                bulk_changes.append((instance, changed_fields))
+        with transaction.atomic():
+            bulk_save_changed_fields(bulk_changes)
+
+
+_reconciliation_state = threading.local()
+
+
+def get_current_pulled_changes():
+    stack = getattr(_reconciliation_state, 'stack', None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def reconciliation():
     """
+    Defer saving of instances changed by pull helpers until the end of context.
+
+    Within context update_pulled_fields, handle_resource_not_found and
+    handle_resource_update_success do not save instances immediately.
+    Instead, exact changed fields are collected and saved with bulk_update
+    when context is closed. Therefore code within context should not expect
+    that these changes are already stored in the database.
+
+    Changes are discarded if context is closed by database error,
+    because transaction could not be used anymore.
+    """
+    if not hasattr(_reconciliation_state, 'stack'):
+        _reconciliation_state.stack = []
+    pulled_changes = PulledChanges()
+    _reconciliation_state.stack.append(pulled_changes)
+    try:
+        yield pulled_changes
+    except DatabaseError:
+        _reconciliation_state.stack.pop()
+        raise
+    except Exception:
+        _reconciliation_state.stack.pop()
+        pulled_changes.flush()
+        raise
+    else:
+        _reconciliation_state.stack.pop()
+        pulled_changes.flush()
+
+
+def save_pulled_fields(instance, changed_fields):
+    """
+    Save changed fields of pulled instance.
+
+    If reconciliation context is active, changes are collected and saved later,
+    otherwise only changed fields are saved immediately.
+    """
+    if not changed_fields:
+        return
+    pulled_changes = get_current_pulled_changes()
+    if pulled_changes is not None:
+        pulled_changes.add(instance, changed_fields)
+    else:
+        instance.save(update_fields=get_update_fields(instance, changed_fields))
+
+
+def set_resource_not_found(resource):
+    """
+    Set resource state to ERRED and append "not found" error message without saving it.
+    Returns set of names of changed fields.
+    """
+    changed_fields = set()
+    old_state = resource.state
     resource.set_erred()
-    resource.runtime_state = ''
+    if resource.state != old_state:
+        changed_fields.add('state')
+    if resource.runtime_state:
+        resource.runtime_state = ''
+        changed_fields.add('runtime_state')
     message = 'Does not exist at backend.'
     if message not in resource.error_message:
         if not resource.error_message:
             resource.error_message = message
         else:
             resource.error_message += ' (%s)' % message
-    resource.save()
+        changed_fields.add('error_message')
+    return changed_fields
+
+
+def handle_resource_not_found(resource):
+    """
+    Set resource state to ERRED and append/create "not found" error message.
+    """
+    save_pulled_fields(resource, set_resource_not_found(resource))
     logger.warning(
         '%s %s (PK: %s) does not exist at backend.'
         % (resource.__class__.__name__, resource, resource.pk)
     )
 
 
-def handle_resource_update_success(resource):
+def set_resource_update_success(resource):
     """
-    Recover resource if its state is ERRED and clear error message.
+    Recover resource if its state is ERRED and clear error message without saving it.
+    Returns set of names of changed fields.
     """
-    update_fields = []
+    changed_fields = set()
     if resource.state == resource.States.ERRED:
         resource.recover()
-        update_fields.append('state')
+        changed_fields.add('state')
 
     if resource.state in (resource.States.UPDATING, resource.States.CREATING):
         resource.set_ok()
-        update_fields.append('state')
+        changed_fields.add('state')
 
     if resource.error_message:
         resource.error_message = ''
-        update_fields.append('error_message')
+        changed_fields.add('error_message')
+    return changed_fields
 
-    if update_fields:
-        resource.save(update_fields=update_fields)
+
+def handle_resource_update_success(resource):
+    """
+    Recover resource if its state is ERRED and clear error message.
+    """
+    save_pulled_fields(resource, set_resource_update_success(resource))
     logger.info(
         '%s %s (PK: %s) was successfully updated.'
         % (resource.__class__.__name__, resource, resource.pk)
     )
 
 
+def bulk_save_changed_fields(changes):
+    """
+    Save instances with bulk_update grouped by set of changed fields.
+
+    changes - list of tuples of instance and set of names of its changed fields.
+
+    Instances of the same model which have the same changed fields are saved with
+    single UPDATE per batch. Because bulk_update does not emit signals, post_save signal
+    is sent for every saved instance with update_fields so that handlers still track changes.
+    """
+    groups = collections.defaultdict(list)
+    for instance, changed_fields in changes:
+        if not changed_fields:
+            continue
+        model = instance.__class__
+        update_fields = set(changed_fields)
+        if any(field.name == 'modified' for field in model._meta.concrete_fields):
+            instance.modified = timezone.now()
+            update_fields.add('modified')
+        groups[(model, frozenset(update_fields))].append(instance)
+
+    for (model, update_fields), instances in groups.items():
+        model.objects.bulk_update(
+            instances, update_fields, batch_size=BULK_UPDATE_BATCH_SIZE
+        )
+        for instance in instances:
+            signals.post_save.send(
+                sender=model,
+                instance=instance,
+                created=False,
+                update_fields=update_fields,
+                raw=False,
+                using=instance._state.db,
+            )
+            tracker = getattr(instance, 'tracker', None)
+            if tracker:
+                tracker.set_saved_fields()
+
+
+def reconcile_pulled_resources(resources, backend_resources, get_fields):
+    """
+    Diff local resources against backend resources by backend_id and apply changes in bulk.
+
+    resources - local resources which should be synchronized.
+    backend_resources - resources imported from backend, but not saved.
+    get_fields - function which accepts local and backend resource
+    and returns names of fields which should be pulled.
+
+    Resources missing at backend are marked as erred, other resources
+    are updated and recovered. Changes are saved with bulk_save_changed_fields.
+    Returns list of tuples of local and backend resources which exist at backend.
+    """
+    backend_resources_map = {
+        backend_resource.backend_id: backend_resource
+        for backend_resource in backend_resources
+    }
+    changes = []
+    pulled_resources = []
+    missing_resources = []
+    for resource in resources:
+        try:
+            backend_resource = backend_resources_map[resource.backend_id]
+        except KeyError:
+            changes.append((resource, set_resource_not_found(resource)))
+            missing_resources.append(resource)
+        else:
+            changed_fields = set_pulled_fields(
+                resource, backend_resource, get_fields(resource, backend_resource)
+            )
+            changed_fields |= set_resource_update_success(resource)
+            changes.append((resource, changed_fields))
+            pulled_resources.append((resource, backend_resource))
+
+    with transaction.atomic():
+        bulk_save_changed_fields(changes)
+
+    for resource in missing_resources:
+        logger.warning(
+            '%s %s (PK: %s) does not exist at backend.'
+            % (resource.__class__.__name__, resource, resource.pk)
+        )
+    logger.info(
+        '%s resources have been pulled, %s of them have been changed.',
+        len(changes),
+        len([change for change in changes if change[1]]),
+    )
+    return pulled_resources
+
+
 def check_customer_blocked(obj):
     from waldur_core.structure import permissions
 
@@ -141,3 +390,198 @@ def move_project(project, customer):
         old_customer=old_customer,
         new_customer=customer,
     )
+
+
+SERVICE_SETTINGS_ACTIVITY_TIMEOUT = timedelta(days=1)
+
+
+def get_service_settings_activity_key(service_settings_id):
+    return 'waldur_core.structure.service_settings_activity:%s' % service_settings_id
+
+
+def mark_service_settings_activity(service_settings_id):
+    """ Remember that user has acted on resources of service settings so that they are pulled sooner """
+    cache.set(
+        get_service_settings_activity_key(service_settings_id),
+        timezone.now().timestamp(),
+        SERVICE_SETTINGS_ACTIVITY_TIMEOUT.total_seconds(),
+    )
+
+
+def is_changed_on_save(instance, created=False, update_fields=None):
+    """
+    Check if saved instance has been actually changed.
+    Some pull code saves whole instance unconditionally, therefore field tracker
+    is consulted if it tracks all fields. Otherwise, saving of specific fields
+    is considered as change, because pull saves only fields which have been changed.
+    """
+    if created:
+        return True
+    tracker = getattr(instance, 'tracker', None)
+    if tracker is not None:
+        changed_fields = set(tracker.changed()) - {'modified'}
+        if changed_fields:
+            return True
+        concrete_fields = {field.attname for field in instance._meta.concrete_fields}
+        if concrete_fields <= set(tracker.fields):
+            return False
+    if update_fields is not None:
+        return bool(set(update_fields) - {'modified'})
+    return True
+
+
+@contextmanager
+def count_changed_objects():
+    """
+    Count objects created, changed or deleted within context.
+
+    Yields a list which contains single counter. It is used in order to estimate
+    change rate of the backend, so saves which have not changed anything are skipped.
+    """
+    counter = [0]
+
+    def save_receiver(instance, created=False, update_fields=None, **kwargs):
+        if is_changed_on_save(instance, created, update_fields):
+            counter[0] += 1
+
+    def delete_receiver(**kwargs):
+        counter[0] += 1
+
+    dispatch_uid = 'waldur_core.structure.utils.count_changed_objects_%s' % id(counter)
+    signals.post_save.connect(save_receiver, weak=False, dispatch_uid=dispatch_uid)
+    signals.post_delete.connect(delete_receiver, weak=False, dispatch_uid=dispatch_uid)
+    try:
+        yield counter
+    finally:
+        signals.post_save.disconnect(dispatch_uid=dispatch_uid)
+        signals.post_delete.disconnect(dispatch_uid=dispatch_uid)
+
+
+class PullSchedule:
+    """
+    Adaptive schedule of pull of service settings.
+
+    State of the schedule is stored in cache so that it is shared by all workers.
+    For each service settings it tracks duration and result of the last pull,
+    number of consecutive failures and change rate of the backend.
+
+    Interval between pulls is computed as follows:
+     - it is stretched from pull_interval up to max_pull_interval
+       if recent pulls have not changed anything;
+     - it is doubled after each consecutive failure up to max_pull_interval;
+     - it is never shorter than duration of the last pull multiplied by duration_factor;
+     - it is randomized by jitter so that pulls of different settings are spread.
+
+    Service settings with user activity after the last pull are pulled
+    in pull_interval regardless of change rate unless backend is unreachable.
+    """
+
+    jitter = 0.1
+    duration_factor = 4
+    # Weight of the last pull in exponential moving average of change rate.
+    change_rate_weight = 0.5
+
+    def __init__(self, name, pull_interval, max_pull_interval):
+        self.name = name
+        self.pull_interval = pull_interval.total_seconds()
+        self.max_pull_interval = max_pull_interval.total_seconds()
+
+    def get_state_key(self, service_settings_id):
+        return 'waldur_core.structure.pull_schedule:%s:%s' % (
+            self.name,
+            service_settings_id,
+        )
+
+    def get_states(self, service_settings_ids):
+        keys = {
+            self.get_state_key(service_settings_id): service_settings_id
+            for service_settings_id in service_settings_ids
+        }
+        states = cache.get_many(keys.keys())
+        return {keys[key]: state for key, state in states.items()}
+
+    def get_activities(self, service_settings_ids):
+        keys = {
+            get_service_settings_activity_key(service_settings_id): service_settings_id
+            for service_settings_id in service_settings_ids
+        }
+        activities = cache.get_many(keys.keys())
+        return {keys[key]: activity for key, activity in activities.items()}
+
+    def get_due(self, service_settings_ids, limit=None):
+        """
+        Return IDs of service settings which should be pulled now ordered by priority.
+
+        Settings with recent user activity go first, then settings which have never
+        been pulled, then the rest ordered by how much pull is overdue relative to interval.
+        """
+        now = timezone.now().timestamp()
+        service_settings_ids = list(service_settings_ids)
+        states = self.get_states(service_settings_ids)
+        activities = self.get_activities(service_settings_ids)
+
+        due = []
+        for service_settings_id in service_settings_ids:
+            state = states.get(service_settings_id)
+            if not state:
+                due.append(((1, float('inf')), service_settings_id))
+                continue
+
+            next_pull = state['next_pull']
+            activity = activities.get(service_settings_id)
+            is_active = bool(
+                activity and activity > state['started'] and not state['failures']
+            )
+            if is_active:
+                next_pull = min(next_pull, state['started'] + self.pull_interval)
+
+            if next_pull > now:
+                continue
+
+            overdue = (now - next_pull) / max(state['interval'], 1)
+            due.append(((2 if is_active else 0, overdue), service_settings_id))
+
+        due.sort(key=lambda item: item[0], reverse=True)
+        return [service_settings_id for _, service_settings_id in due[:limit]]
+
+    def get_interval(self, state, duration, success, changes):
+        if success:
+            failures = 0
+            change_rate = (1 - self.change_rate_weight) * state.get(
+                'change_rate', 1
+            ) + self.change_rate_weight * (1 if changes else 0)
+            interval = self.pull_interval + (
+                self.max_pull_interval - self.pull_interval
+            ) * (1 - change_rate)
+        else:
+            failures = state.get('failures', 0) + 1
+            change_rate = state.get('change_rate', 1)
+            interval = min(self.pull_interval * 2 ** failures, self.max_pull_interval)
+        interval = max(interval, duration * self.duration_factor)
+        return interval, failures, change_rate
+
+    def record(self, service_settings_id, started, duration, success, changes=0):
+        """ Store result of pull and compute when service settings should be pulled next time """
+        state = self.get_states([service_settings_id]).get(service_settings_id, {})
+        interval, failures, change_rate = self.get_interval(
+            state, duration, success, changes
+        )
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        finished = started + duration
+        state = dict(
+            started=started,
+            duration=duration,
+            success=success,
+            changes=changes,
+            failures=failures,
+            change_rate=change_rate,
+            interval=interval,
+            next_pull=finished + interval,
+        )
+        cache.set(
+            self.get_state_key(service_settings_id),
+            state,
+            # Drop state of removed service settings eventually.
+            2 * self.max_pull_interval,
+        )
+        return state
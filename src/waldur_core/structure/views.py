@@ -30,7 +30,7 @@ from waldur_core.core.utils import is_uuid_like
 from waldur_core.logging import models as logging_models
 from waldur_core.structure import filters, models, permissions, serializers, utils
 from waldur_core.structure.executors import ServiceSettingsCreateExecutor
-from waldur_core.structure.managers import filter_queryset_for_user
+from waldur_core.structure.managers import FilterStrategy, filter_queryset_for_user
 from waldur_core.structure.signals import structure_role_updated
 
 logger = logging.getLogger(__name__)
@@ -51,6 +51,7 @@ class CustomerViewSet(core_mixins.EagerLoadMixin, viewsets.ModelViewSet):
         filters.AccountingStartDateFilter,
         filters.ExternalCustomerFilterBackend,
     )
+    permission_filter_strategy = FilterStrategy.IDS
     ordering_fields = (
         'abbreviation',
         'accounting_start_date',
@@ -234,6 +235,7 @@ class ProjectViewSet(core_mixins.EagerLoadMixin, core_views.ActionsViewSet):
         DjangoFilterBackend,
         filters.CustomerAccountingStartDateFilter,
     )
+    permission_filter_strategy = FilterStrategy.IDS
     filterset_class = filters.ProjectFilter
     partial_update_validators = [utils.check_customer_blocked]
     destroy_validators = [utils.check_customer_blocked, utils.project_is_empty]
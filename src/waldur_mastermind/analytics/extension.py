@@ -8,6 +8,7 @@ class AnalyticsExtension(WaldurExtension):
         WALDUR_ANALYTICS = {
             'ENABLED': False,
             'DAILY_QUOTA_LIFETIME': timedelta(days=31),
+            'QUOTA_ROLLUP_LIFETIME': timedelta(days=3 * 365),
         }
 
     @staticmethod
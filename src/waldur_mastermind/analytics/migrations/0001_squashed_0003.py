@@ -6,7 +6,8 @@ from django.db import migrations, models
 def import_quotas(apps, schema_editor):
     from waldur_mastermind.analytics.utils import import_daily_usage
 
-    import_daily_usage()
+    # Rollups are created by later migration from imported history
+    import_daily_usage(update_rollups=False)
 
 
 class Migration(migrations.Migration):
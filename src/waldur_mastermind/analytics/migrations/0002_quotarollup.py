@@ -0,0 +1,81 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Fill rollups with maximum usage per period from dense daily history.
+BACKFILL_ROLLUPS_SQL = '''
+INSERT INTO analytics_quotarollup
+    (content_type_id, object_id, name, usage, period, date)
+SELECT content_type_id, object_id, name, MAX(usage), %(period)s,
+    CAST(date_trunc(%(period)s, date) AS date)
+FROM analytics_dailyquotahistory
+GROUP BY content_type_id, object_id, name, date_trunc(%(period)s, date)
+ON CONFLICT (content_type_id, object_id, name, period, date)
+DO UPDATE SET usage = GREATEST(analytics_quotarollup.usage, EXCLUDED.usage)
+'''
+
+# Keep only change points: drop rows which repeat usage of the previous row.
+COMPACT_HISTORY_SQL = '''
+DELETE FROM analytics_dailyquotahistory WHERE id IN (
+    SELECT id FROM (
+        SELECT id, usage, LAG(usage) OVER (
+            PARTITION BY content_type_id, object_id, name ORDER BY date
+        ) AS previous_usage
+        FROM analytics_dailyquotahistory
+    ) history WHERE usage = previous_usage
+)
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('analytics', '0001_squashed_0003'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotaRollup',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('object_id', models.PositiveIntegerField()),
+                ('name', models.CharField(db_index=True, max_length=150)),
+                ('usage', models.BigIntegerField()),
+                (
+                    'period',
+                    models.CharField(
+                        choices=[('week', 'Week'), ('month', 'Month')], max_length=10
+                    ),
+                ),
+                ('date', models.DateField(help_text='First day of the period.')),
+                (
+                    'content_type',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='contenttypes.ContentType',
+                    ),
+                ),
+            ],
+            options={
+                'unique_together': {
+                    ('content_type', 'object_id', 'name', 'period', 'date')
+                },
+            },
+        ),
+        migrations.RunSQL(
+            [
+                (BACKFILL_ROLLUPS_SQL, {'period': 'week'}),
+                (BACKFILL_ROLLUPS_SQL, {'period': 'month'}),
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(COMPACT_HISTORY_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -1,13 +1,64 @@
+from datetime import timedelta
+
 from django.contrib.contenttypes import fields as ct_fields
 from django.contrib.contenttypes import models as ct_models
-from django.db import models
+from django.db import connection, models
 
 from waldur_core.core.managers import GenericKeyMixin
+from waldur_core.quotas import models as quota_models
+
+
+def get_quotas_query(model):
+    """
+    Return SQL and params selecting usage of all quotas of the given scope model.
+    Quotas of removed scopes are skipped via join with scope table.
+    """
+    content_type = ct_models.ContentType.objects.get_for_model(model)
+    quotas = (
+        quota_models.Quota.objects.filter(content_type=content_type)
+        .annotate(
+            scope_exists=models.Exists(
+                model._base_manager.filter(pk=models.OuterRef('object_id'))
+            )
+        )
+        .filter(scope_exists=True)
+        .values_list('content_type_id', 'object_id', 'name', 'usage')
+    )
+    return quotas.query.sql_with_params()
+
+
+class HistoryManager(GenericKeyMixin, models.Manager):
+    def prune(self, expiration_date, chunk_size=10000):
+        """
+        Delete history older than expiration date in chunks
+        so that a single large delete does not lock the table.
+        """
+        expired = self.get_expired(expiration_date)
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            self.filter(id__in=ids).delete()
+
+    def get_expired(self, expiration_date):
+        return self.filter(date__lt=expiration_date)
 
 
-class QuotaManager(GenericKeyMixin, models.Manager):
+class QuotaManager(HistoryManager):
     def update_or_create_quota(self, scope, name, date, usage):
+        """
+        Store usage only if it differs from the usage of the previous
+        change point, so that history consists of change points only.
+        """
         content_type = ct_models.ContentType.objects.get_for_model(scope)
+        series = self.filter(content_type=content_type, object_id=scope.pk, name=name)
+        previous = series.filter(date__lt=date).order_by('-date').first()
+        if previous and previous.usage == usage:
+            series.filter(date=date).delete()
+            return previous, False
+        following = series.filter(date__gt=date).order_by('date').first()
+        if following and following.usage == usage:
+            following.delete()
         return self.update_or_create(
             content_type=content_type,
             object_id=scope.pk,
@@ -16,10 +67,103 @@ class QuotaManager(GenericKeyMixin, models.Manager):
             defaults=dict(usage=usage),
         )
 
+    def snapshot_quotas(self, model, date):
+        """
+        Copy usage of all quotas of the given scope model into the history
+        for the given date using a single upsert query.
+        Afterwards drop snapshots which do not change the previous usage.
+        """
+        quotas_sql, quotas_params = get_quotas_query(model)
+        table = self.model._meta.db_table
+        # Table name comes from model meta and subquery is generated by ORM,
+        # all values are passed as query parameters.
+        upsert = (
+            'INSERT INTO {table} (content_type_id, object_id, name, usage, date) '  # noqa: S608
+            'SELECT q.content_type_id, q.object_id, q.name, '
+            'CAST(q.usage AS bigint), %s FROM ({quotas}) q '
+            'ON CONFLICT (content_type_id, object_id, name, date) '
+            'DO UPDATE SET usage = EXCLUDED.usage'
+        ).format(table=table, quotas=quotas_sql)
+        compact = (
+            'DELETE FROM {table} h WHERE h.date = %s '  # noqa: S608
+            'AND h.content_type_id = %s AND h.usage = ('
+            'SELECT p.usage FROM {table} p '
+            'WHERE p.content_type_id = h.content_type_id '
+            'AND p.object_id = h.object_id AND p.name = h.name '
+            'AND p.date < h.date ORDER BY p.date DESC LIMIT 1)'
+        ).format(table=table)
+        content_type = ct_models.ContentType.objects.get_for_model(model)
+        with connection.cursor() as cursor:
+            cursor.execute(upsert, (date,) + tuple(quotas_params))
+            cursor.execute(compact, (date, content_type.id))
+
+    def get_expired(self, expiration_date):
+        """
+        Keep the latest expired change point of each series
+        because it defines usage at the beginning of retained history.
+        """
+        newer = self.filter(
+            content_type_id=models.OuterRef('content_type_id'),
+            object_id=models.OuterRef('object_id'),
+            name=models.OuterRef('name'),
+            date__gt=models.OuterRef('date'),
+            date__lte=expiration_date,
+        )
+        return (
+            super(QuotaManager, self)
+            .get_expired(expiration_date)
+            .annotate(is_superseded=models.Exists(newer))
+            .filter(is_superseded=True)
+        )
+
+
+class QuotaRollupManager(HistoryManager):
+    def update_quota(self, scope, name, date, usage):
+        """
+        Update maximum usage of the quota for the week and month
+        containing the given date.
+        """
+        content_type = ct_models.ContentType.objects.get_for_model(scope)
+        for period in (QuotaRollup.Periods.WEEK, QuotaRollup.Periods.MONTH):
+            rollup, created = self.get_or_create(
+                content_type=content_type,
+                object_id=scope.pk,
+                name=name,
+                period=period,
+                date=QuotaRollup.get_period_start(date, period),
+                defaults=dict(usage=usage),
+            )
+            if not created and rollup.usage < usage:
+                rollup.usage = usage
+                rollup.save(update_fields=['usage'])
+
+    def snapshot_quotas(self, model, date):
+        """
+        Update maximum usage of all quotas of the given scope model
+        for the week and month containing the given date.
+        """
+        quotas_sql, quotas_params = get_quotas_query(model)
+        # Table name comes from model meta and subquery is generated by ORM.
+        query = (
+            'INSERT INTO {table} '  # noqa: S608
+            '(content_type_id, object_id, name, usage, period, date) '
+            'SELECT q.content_type_id, q.object_id, q.name, '
+            'CAST(q.usage AS bigint), %s, %s FROM ({quotas}) q '
+            'ON CONFLICT (content_type_id, object_id, name, period, date) '
+            'DO UPDATE SET usage = GREATEST({table}.usage, EXCLUDED.usage)'
+        ).format(table=self.model._meta.db_table, quotas=quotas_sql)
+        with connection.cursor() as cursor:
+            for period in (QuotaRollup.Periods.WEEK, QuotaRollup.Periods.MONTH):
+                period_start = QuotaRollup.get_period_start(date, period)
+                cursor.execute(query, (period, period_start) + tuple(quotas_params))
+
 
 class DailyQuotaHistory(models.Model):
     """
     This model stores quota usage history per day.
+    Only change points are stored: a row exists for a date only if usage
+    differs from the previous row, so that usage for other dates is
+    the usage of the latest preceding row.
     It is designed to store derived data optimized for dashboard charts.
     See also related design pattern:
     https://martinfowler.com/bliki/ReportingDatabase.html
@@ -35,3 +179,46 @@ class DailyQuotaHistory(models.Model):
 
     class Meta:
         unique_together = ('content_type', 'object_id', 'name', 'date')
+
+
+class QuotaRollup(models.Model):
+    """
+    This model stores maximum daily quota usage per week or month.
+    It allows to render long-range dashboard charts
+    without reading daily history.
+    """
+
+    class Periods:
+        DAY = 'day'
+        WEEK = 'week'
+        MONTH = 'month'
+
+        CHOICES = ((WEEK, 'Week'), (MONTH, 'Month'))
+
+    content_type = models.ForeignKey(on_delete=models.CASCADE, to=ct_models.ContentType)
+    object_id = models.PositiveIntegerField()
+    scope = ct_fields.GenericForeignKey('content_type', 'object_id')
+    objects = QuotaRollupManager()
+    name = models.CharField(max_length=150, db_index=True)
+    usage = models.BigIntegerField()
+    period = models.CharField(max_length=10, choices=Periods.CHOICES)
+    date = models.DateField(help_text='First day of the period.')
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'name', 'period', 'date')
+
+    @classmethod
+    def get_period_start(cls, date, period):
+        if period == cls.Periods.WEEK:
+            return date - timedelta(days=date.weekday())
+        if period == cls.Periods.MONTH:
+            return date.replace(day=1)
+        return date
+
+    @classmethod
+    def get_next_period_start(cls, date, period):
+        if period == cls.Periods.WEEK:
+            return date + timedelta(days=7)
+        if period == cls.Periods.MONTH:
+            return (date + timedelta(days=32)).replace(day=1)
+        return date + timedelta(days=1)
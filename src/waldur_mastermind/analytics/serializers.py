@@ -7,16 +7,38 @@ from rest_framework import serializers
 from waldur_core.core.serializers import GenericRelatedField
 from waldur_core.structure.models import Customer, Project
 
+from . import models
+
 
 class DailyHistoryQuotaSerializer(serializers.Serializer):
-    scope = GenericRelatedField(related_models=(Project, Customer))
+    scope = GenericRelatedField(related_models=(Project, Customer), required=False)
+    scopes = serializers.ListField(
+        child=GenericRelatedField(related_models=(Project, Customer)), required=False
+    )
     quota_names = serializers.ListField(child=serializers.CharField(), required=False)
     start = serializers.DateField(format='%Y-%m-%d', required=False)
     end = serializers.DateField(format='%Y-%m-%d', required=False)
+    period = serializers.ChoiceField(
+        choices=(
+            models.QuotaRollup.Periods.DAY,
+            models.QuotaRollup.Periods.WEEK,
+            models.QuotaRollup.Periods.MONTH,
+        ),
+        default=models.QuotaRollup.Periods.DAY,
+    )
 
     def validate(self, attrs):
+        if 'scope' not in attrs and not attrs.get('scopes'):
+            raise serializers.ValidationError(
+                _('Either `scope` or `scopes` should be specified.')
+            )
+        scopes = attrs.get('scopes') or [attrs['scope']]
         if 'quota_names' not in attrs:
-            attrs['quota_names'] = attrs['scope'].get_quotas_names()
+            attrs['quota_names'] = []
+            for scope in scopes:
+                for name in scope.get_quotas_names():
+                    if name not in attrs['quota_names']:
+                        attrs['quota_names'].append(name)
         if 'end' not in attrs:
             attrs['end'] = timezone.now().date()
         if 'start' not in attrs:
@@ -1,9 +1,14 @@
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
 from django.test import testcases
 from django.utils import timezone
 from freezegun import freeze_time
 from rest_framework import status, test
 from rest_framework.reverse import reverse
 
+from waldur_core.quotas.models import Quota
+from waldur_core.structure import models as structure_models
 from waldur_core.structure.tests import factories as structure_factories
 from waldur_core.structure.tests import fixtures as structure_fixtures
 from waldur_mastermind.analytics import models, tasks, utils
@@ -54,6 +59,58 @@ class TestDailyQuotasEndpoint(test.APITransactionTestCase):
         }
         self.assertDictEqual(response.data, expected)
 
+    def test_daily_quotas_of_multiple_scopes_are_serialized(self):
+        other_project = structure_factories.ProjectFactory(
+            customer=self.fixture.customer
+        )
+        models.DailyQuotaHistory.objects.create(
+            scope=other_project,
+            name='nc_user_count',
+            date=parse_date('2018-10-02'),
+            usage=5,
+        )
+        self.client.force_login(self.fixture.staff)
+        url = reverse('daily-quotas-list')
+        request = {
+            'start': '2018-10-01',
+            'end': '2018-10-03',
+            'scopes': [
+                structure_factories.ProjectFactory.get_url(self.project),
+                structure_factories.ProjectFactory.get_url(other_project),
+            ],
+            'quota_names': ['nc_user_count'],
+        }
+        response = self.client.get(url, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        expected = {
+            self.project.uuid.hex: {'nc_user_count': [10, 11, 12]},
+            other_project.uuid.hex: {'nc_user_count': [0, 5, 5]},
+        }
+        self.assertDictEqual(response.data, expected)
+
+    def test_weekly_quotas_are_serialized_from_rollups(self):
+        for date, usage in (('2018-09-24', 10), ('2018-10-08', 20)):
+            models.QuotaRollup.objects.create(
+                scope=self.project,
+                name='nc_user_count',
+                period=models.QuotaRollup.Periods.WEEK,
+                date=parse_date(date),
+                usage=usage,
+            )
+        self.client.force_login(self.fixture.owner)
+        url = reverse('daily-quotas-list')
+        request = {
+            'start': '2018-10-03',
+            'end': '2018-10-20',
+            'scope': structure_factories.ProjectFactory.get_url(self.project),
+            'quota_names': ['nc_user_count'],
+            'period': 'week',
+        }
+        response = self.client.get(url, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(response.data, {'nc_user_count': [10, 20, 20]})
+
 
 class TestDailyQuotasImport(test.APITransactionTestCase):
     def setUp(self):
@@ -81,11 +138,23 @@ class TestDailyQuotasImport(test.APITransactionTestCase):
         )
         expected = [
             {'date': parse_date('2018-10-01'), 'usage': 0,},
-            {'date': parse_date('2018-10-02'), 'usage': 0,},
             {'date': parse_date('2018-10-03'), 'usage': 10,},
-            {'date': parse_date('2018-10-04'), 'usage': 10,},
             {'date': parse_date('2018-10-05'), 'usage': 30,},
-            {'date': parse_date('2018-10-06'), 'usage': 30,},
+        ]
+        self.assertEqual(expected, actual)
+
+    def test_rollups_of_imported_dates_are_updated(self):
+        with freeze_time('2018-10-06'):
+            utils.import_daily_usage()
+
+        actual = list(
+            models.QuotaRollup.objects.filter(scope=self.project, name='nc_user_count')
+            .order_by('period')
+            .values_list('period', 'date', 'usage')
+        )
+        expected = [
+            (models.QuotaRollup.Periods.MONTH, parse_date('2018-10-01'), 30),
+            (models.QuotaRollup.Periods.WEEK, parse_date('2018-10-01'), 30),
         ]
         self.assertEqual(expected, actual)
 
@@ -104,6 +173,69 @@ class TestDailyQuotasTask(test.APITransactionTestCase):
         ).usage
         self.assertEqual(30, actual)
 
+    def test_existing_snapshot_is_updated(self):
+        tasks.sync_daily_quotas()
+        self.project.quotas.filter(name='nc_user_count').update(usage=40)
+        tasks.sync_daily_quotas()
+        actual = models.DailyQuotaHistory.objects.get(
+            scope=self.project, name='nc_user_count', date=timezone.now().date()
+        ).usage
+        self.assertEqual(40, actual)
+
+    def test_quotas_of_removed_scopes_are_skipped(self):
+        Quota.objects.create(
+            content_type=ContentType.objects.get_for_model(structure_models.Project),
+            object_id=self.project.id + 1000,
+            name='nc_user_count',
+            usage=10,
+        )
+        tasks.sync_daily_quotas()
+        self.assertFalse(
+            models.DailyQuotaHistory.objects.filter(
+                object_id=self.project.id + 1000
+            ).exists()
+        )
+
+    def test_unchanged_usage_is_not_stored(self):
+        self.project.set_quota_usage('nc_user_count', 30)
+        yesterday = timezone.now().date() - timedelta(days=1)
+        models.DailyQuotaHistory.objects.filter(scope=self.project).update(
+            date=yesterday
+        )
+        tasks.sync_daily_quotas()
+        self.assertFalse(
+            models.DailyQuotaHistory.objects.filter(
+                scope=self.project, name='nc_user_count', date=timezone.now().date()
+            ).exists()
+        )
+
+    def test_expired_history_is_pruned_except_latest_change_point(self):
+        today = timezone.now().date()
+        for days, usage in ((60, 10), (50, 20)):
+            models.DailyQuotaHistory.objects.create(
+                scope=self.project,
+                name='nc_user_count',
+                usage=usage,
+                date=today - timedelta(days=days),
+            )
+        tasks.sync_daily_quotas()
+        actual = models.DailyQuotaHistory.objects.filter(
+            scope=self.project, name='nc_user_count', date__lt=today
+        ).values_list('usage', flat=True)
+        self.assertEqual([20], list(actual))
+
+    def test_rollups_store_maximum_usage(self):
+        self.project.set_quota_usage('nc_user_count', 30)
+        tasks.sync_daily_quotas()
+        self.project.quotas.filter(name='nc_user_count').update(usage=20)
+        tasks.sync_daily_quotas()
+        rollups = models.QuotaRollup.objects.filter(
+            scope=self.project, name='nc_user_count'
+        )
+        self.assertEqual(
+            {('week', 30), ('month', 30)}, set(rollups.values_list('period', 'usage'))
+        )
+
 
 class TestDailyQuotasSignalHandler(testcases.TestCase):
     def setUp(self):
@@ -0,0 +1,68 @@
+from rest_framework import status, test
+from rest_framework.reverse import reverse
+
+from waldur_core.structure.tests import factories as structure_factories
+from waldur_mastermind.common.mixins import UnitPriceMixin
+from waldur_mastermind.invoices.tests import factories as invoice_factories
+
+
+class ProjectQuotasTest(test.APITransactionTestCase):
+    def setUp(self):
+        self.staff = structure_factories.UserFactory(is_staff=True)
+        self.small_project = structure_factories.ProjectFactory(name='Small')
+        self.large_project = structure_factories.ProjectFactory(name='Large')
+        self.url = reverse('project-quotas-list')
+
+    def get_projects(self, **params):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['project_name'], row['value']) for row in response.data]
+
+    def test_projects_are_ranked_by_quota_usage(self):
+        self.small_project.set_quota_usage('nc_resource_count', 1)
+        self.large_project.set_quota_usage('nc_resource_count', 10)
+        self.assertEqual(
+            [('Large', 10), ('Small', 1)],
+            self.get_projects(quota_name='nc_resource_count'),
+        )
+
+    def test_projects_are_ranked_by_current_price(self):
+        invoice = invoice_factories.InvoiceFactory()
+        invoice_factories.InvoiceItemFactory(
+            invoice=invoice,
+            project=self.large_project,
+            unit=UnitPriceMixin.Units.QUANTITY,
+            unit_price=10,
+            quantity=2,
+        )
+        self.assertEqual(
+            [('Large', 20), ('Small', 0)],
+            self.get_projects(quota_name='current_price', o='-value'),
+        )
+
+    def test_ranking_is_paginated(self):
+        self.small_project.set_quota_usage('nc_resource_count', 1)
+        self.large_project.set_quota_usage('nc_resource_count', 10)
+        self.assertEqual(
+            [('Large', 10)],
+            self.get_projects(quota_name='nc_resource_count', page_size=1),
+        )
+
+    def test_projects_are_sorted_by_name(self):
+        self.assertEqual(
+            ['Large', 'Small'],
+            [
+                name
+                for name, _ in self.get_projects(
+                    quota_name='nc_resource_count', o='project_name'
+                )
+            ],
+        )
+
+    def test_invalid_ordering_is_rejected(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(
+            self.url, {'quota_name': 'nc_resource_count', 'o': 'unknown'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
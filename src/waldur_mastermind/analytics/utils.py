@@ -1,6 +1,10 @@
+import collections
+import itertools
 import logging
 from datetime import timedelta
 
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
 from django.utils import timezone
 from reversion.models import Version
 
@@ -11,7 +15,12 @@ from . import models
 logger = logging.getLogger(__name__)
 
 
-def import_daily_usage():
+def import_daily_usage(update_rollups=True):
+    """
+    Import daily quota usage from quota versions of the last 90 days.
+    Rollups of imported dates are updated unless update_rollups is False,
+    for example, in the initial migration where rollups do not exist yet.
+    """
     quotas = {}
     cutoff = timezone.now() - timedelta(days=90)
     versions = Version.objects.filter(revision__date_created__gte=cutoff).order_by(
@@ -32,16 +41,75 @@ def import_daily_usage():
         quotas[scope].setdefault(name, {})
         quotas[scope][name][date] = usage
 
-    end = timezone.now().date()
     for scope in quotas.keys():
         for name in quotas[scope].keys():
             records = quotas[scope][name]
-            start = min(records.keys())
-            days = (end - start).days
-            usage = 0
-            for i in range(days + 1):
-                date = start + timedelta(days=i)
-                usage = records.get(date, usage)
+            for date in sorted(records.keys()):
                 models.DailyQuotaHistory.objects.update_or_create_quota(
-                    scope, name, date, usage
+                    scope, name, date, records[date]
                 )
+                if update_rollups:
+                    models.QuotaRollup.objects.update_quota(
+                        scope, name, date, records[date]
+                    )
+
+
+def get_quota_series(scopes, quota_names, start, end, period):
+    """
+    Return dense usage arrays for each scope and quota name.
+    Daily series are restored from change points, weekly and monthly series
+    are read from rollups. Missing values are forward-filled.
+    """
+    Periods = models.QuotaRollup.Periods
+    dates = []
+    date = models.QuotaRollup.get_period_start(start, period)
+    while date <= end:
+        dates.append(date)
+        date = models.QuotaRollup.get_next_period_start(date, period)
+    index = {date: position for position, date in enumerate(dates)}
+
+    if period == Periods.DAY:
+        queryset = models.DailyQuotaHistory.objects.all()
+    else:
+        queryset = models.QuotaRollup.objects.filter(period=period)
+
+    scopes_query = Q()
+    for scope in scopes:
+        content_type = ContentType.objects.get_for_model(scope)
+        scopes_query |= Q(content_type=content_type, object_id=scope.pk)
+    queryset = queryset.filter(scopes_query, name__in=quota_names)
+
+    fields = ('content_type_id', 'object_id', 'name', 'date', 'usage')
+    initial = (
+        queryset.filter(date__lt=dates[0])
+        .order_by('content_type_id', 'object_id', 'name', '-date')
+        .distinct('content_type_id', 'object_id', 'name')
+        .values_list(*fields)
+    )
+    changes = (
+        queryset.filter(date__gte=dates[0], date__lte=end)
+        .order_by('date')
+        .values_list(*fields)
+    )
+    points = collections.defaultdict(list)
+    for content_type_id, object_id, name, date, usage in itertools.chain(
+        initial, changes
+    ):
+        points[(content_type_id, object_id, name)].append((date, usage))
+
+    result = {}
+    for scope in scopes:
+        content_type = ContentType.objects.get_for_model(scope)
+        result[scope] = {}
+        for name in quota_names:
+            values = [0] * len(dates)
+            series = points[(content_type.id, scope.pk, name)]
+            for position, (date, usage) in enumerate(series):
+                begin = index.get(date, 0)
+                if position + 1 < len(series):
+                    stop = index[series[position + 1][0]]
+                else:
+                    stop = len(dates)
+                values[begin:stop] = [usage] * (stop - begin)
+            result[scope][name] = values
+    return result
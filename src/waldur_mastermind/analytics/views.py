@@ -1,18 +1,18 @@
-import collections
-from datetime import timedelta
-
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import DecimalField, F, Sum, Value
 from django.db.models.expressions import OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import status, viewsets
 from rest_framework.response import Response
 
+from waldur_core.core.utils import get_ordering
 from waldur_core.quotas.models import Quota
 from waldur_core.structure.models import Project
 from waldur_mastermind.billing.models import PriceEstimate
 from waldur_mastermind.invoices.models import InvoiceItem
 from waldur_mastermind.invoices.utils import get_current_month, get_current_year
 
-from . import models, serializers
+from . import serializers, utils
 
 
 class DailyQuotaHistoryViewSet(viewsets.GenericViewSet):
@@ -28,48 +28,50 @@ class DailyQuotaHistoryViewSet(viewsets.GenericViewSet):
         return Response(result)
 
     def get_result(self, query):
-        scope = query['scope']
-        quota_names = query['quota_names']
-        start = query['start']
-        end = query['end']
-
-        quotas = models.DailyQuotaHistory.objects.filter(
-            scope=scope, name__in=quota_names, date__gte=start, date__lte=end,
-        ).only('name', 'date', 'usage',)
-        charts = collections.defaultdict(dict)
-        for quota in quotas:
-            charts[quota.name][quota.date] = quota.usage
-
-        values = collections.defaultdict(list)
-        day = timedelta(days=1)
-        days = (end - start).days
-        for name in quota_names:
-            usage = 0
-            for i in range(days + 1):
-                date = start + i * day
-                usage = charts[name].get(date, usage)
-                values[name].append(usage)
-        return values
+        scopes = query.get('scopes') or [query['scope']]
+        result = utils.get_quota_series(
+            scopes, query['quota_names'], query['start'], query['end'], query['period']
+        )
+        if not query.get('scopes'):
+            return result[query['scope']]
+        return {scope.uuid.hex: values for scope, values in result.items()}
 
 
 class ProjectQuotasViewSet(viewsets.GenericViewSet):
+    """
+    Ranking of projects by quota usage, estimated price or current price.
+    Values are computed in the database so that only the requested page
+    of projects is fetched.
+    """
+
     # Fix for schema generation
     queryset = []
+    ordering_fields = {
+        'value': 'value',
+        'project_name': 'name',
+        'customer_name': 'customer__name',
+    }
 
     def list(self, request):
         quota_name = request.query_params.get('quota_name')
         if not quota_name:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
+        ordering = get_ordering(request) or '-value'
+        if ordering.lstrip('-') not in self.ordering_fields:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
         content_type = ContentType.objects.get_for_model(Project)
         if quota_name == 'estimated_price':
             projects = self.annotate_estimated_price(content_type)
         elif quota_name == 'current_price':
-            projects = self.annotate_current_price(content_type)
+            projects = self.annotate_current_price()
         else:
             projects = self.annotate_quotas(quota_name, content_type)
 
-        return Response(
+        projects = self.apply_ordering(projects.select_related('customer'), ordering)
+        page = self.paginate_queryset(projects)
+        return self.get_paginated_response(
             [
                 {
                     'project_name': project.name,
@@ -77,10 +79,18 @@ class ProjectQuotasViewSet(viewsets.GenericViewSet):
                     'customer_abbreviation': project.customer.abbreviation,
                     'value': project.value,
                 }
-                for project in projects
+                for project in page
             ]
         )
 
+    def apply_ordering(self, projects, ordering):
+        field = F(self.ordering_fields[ordering.lstrip('-')])
+        if ordering.startswith('-'):
+            field = field.desc(nulls_last=True)
+        else:
+            field = field.asc(nulls_first=True)
+        return projects.order_by(field, 'pk')
+
     def annotate_quotas(self, quota_name, content_type):
         quotas = Quota.objects.filter(
             object_id=OuterRef('pk'), content_type=content_type, name=quota_name,
@@ -95,12 +105,17 @@ class ProjectQuotasViewSet(viewsets.GenericViewSet):
         subquery = Subquery(estimates.values('total')[:1])
         return Project.objects.annotate(value=subquery)
 
-    def annotate_current_price(self, content_type):
-        projects = Project.objects.all()
-        year, month = get_current_year(), get_current_month()
-        for project in projects:
-            items = InvoiceItem.objects.filter(
-                invoice__year=year, invoice__month=month, project_id=project.id
+    def annotate_current_price(self):
+        items = (
+            InvoiceItem.objects.filter(
+                invoice__year=get_current_year(),
+                invoice__month=get_current_month(),
+                project_id=OuterRef('pk'),
             )
-            project.value = sum(item.price_current for item in items)
-        return projects
+            .annotate_price(current=True)
+            .order_by()
+            .values('project_id')
+            .annotate(price=Sum('computed_price'))
+        )
+        subquery = Subquery(items.values('price'), output_field=DecimalField())
+        return Project.objects.annotate(value=Coalesce(subquery, Value(0)))
@@ -48,6 +48,12 @@ class BillingConfig(AppConfig):
             dispatch_uid='waldur_mastermind.billing.process_invoice_item',
         )
 
+        signals.post_delete.connect(
+            handlers.process_deleted_invoice_item,
+            sender=invoices_models.InvoiceItem,
+            dispatch_uid='waldur_mastermind.billing.process_deleted_invoice_item',
+        )
+
         core_signals.pre_serializer_fields.connect(
             sender=structure_serializers.ProjectSerializer, receiver=add_price_estimate,
         )
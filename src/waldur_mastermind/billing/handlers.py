@@ -1,8 +1,10 @@
 import logging
 
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
 
 from waldur_core.structure import models as structure_models
+from waldur_mastermind.invoices import utils as invoices_utils
 
 from . import models
 
@@ -26,28 +28,44 @@ def update_estimate_when_invoice_is_created(sender, instance, created=False, **k
 
 
 def update_estimates_for_customer(customer):
-    scopes = [customer] + list(customer.projects.all())
-    for scope in scopes:
-        estimate, _ = models.PriceEstimate.objects.get_or_create(scope=scope)
-        estimate.update_total()
-        estimate.save(update_fields=['total'])
+    models.PriceEstimate.rebuild(customer=customer)
 
 
 def process_invoice_item(sender, instance, created=False, **kwargs):
-    if (
-        not created
-        and not instance.tracker.has_changed('unit_price')
-        and not instance.tracker.has_changed('start')
-        and not instance.tracker.has_changed('end')
-    ):
+    if created:
+        price = instance.price
+    elif instance.has_price_changed():
+        price = instance.price - instance.get_previous().price
+    else:
         return
+    update_estimates_for_invoice_item(instance, price)
+
+
+def process_deleted_invoice_item(sender, instance, **kwargs):
+    update_estimates_for_invoice_item(instance, -instance.price)
 
-    if not instance.project_id:
+
+def update_estimates_for_invoice_item(invoice_item, price):
+    if not price or not invoice_item.project_id:
         return
-    with transaction.atomic():
-        project = structure_models.Project.all_objects.get(pk=instance.project_id)
 
-        for scope in [project, project.customer]:
-            estimate, _ = models.PriceEstimate.objects.get_or_create(scope=scope)
-            estimate.update_total()
-            estimate.save(update_fields=['total'])
+    try:
+        invoice = invoice_item.invoice
+    except ObjectDoesNotExist:
+        # Invoice is being deleted
+        return
+
+    if (invoice.year, invoice.month) != (
+        invoices_utils.get_current_year(),
+        invoices_utils.get_current_month(),
+    ):
+        # Estimate is computed only for current month
+        return
+
+    with transaction.atomic():
+        models.PriceEstimate.add_total(
+            structure_models.Project, invoice_item.project_id, price
+        )
+        models.PriceEstimate.add_total(
+            structure_models.Customer, invoice.customer_id, price
+        )
@@ -9,10 +9,4 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         with transaction.atomic():
-            for model in models.PriceEstimate.get_estimated_models():
-                for instance in model.objects.all():
-                    estimate, _ = models.PriceEstimate.objects.get_or_create(
-                        scope=instance
-                    )
-                    estimate.update_total()
-                    estimate.save()
+            models.PriceEstimate.rebuild()
@@ -1,6 +1,7 @@
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db.models import F, Sum
 from django.utils.translation import ugettext_lazy as _
 from model_utils import FieldTracker
 
@@ -52,3 +53,66 @@ class PriceEstimate(core_models.UuidMixin, models.Model):
         current_year = invoices_utils.get_current_year()
         current_month = invoices_utils.get_current_month()
         self.total = self.get_total(current_year, current_month)
+
+    @classmethod
+    def add_total(cls, scope_model, scope_id, price):
+        """
+        Adjust total of estimate by price of changed invoice item with single query.
+        Estimate is not created if it does not exist, because scope could be deleted.
+        Missing estimates are created by rebuild_billing command.
+        """
+        content_type = ContentType.objects.get_for_model(scope_model)
+        cls.objects.filter(content_type=content_type, object_id=scope_id).update(
+            total=F('total') + float(price)
+        )
+
+    @classmethod
+    def rebuild(cls, customer=None):
+        """
+        Recompute totals of estimates for current month with one grouped aggregate query
+        per estimated model. If customer is specified, only its estimates are rebuilt.
+        """
+        items = invoices_models.InvoiceItem.objects.filter(
+            invoice__year=invoices_utils.get_current_year(),
+            invoice__month=invoices_utils.get_current_month(),
+        )
+        projects = structure_models.Project.objects.all()
+        customers = structure_models.Customer.objects.all()
+        if customer:
+            items = items.filter(invoice__customer=customer)
+            projects = projects.filter(customer=customer)
+            customers = customers.filter(id=customer.id)
+
+        for scopes, field in (
+            (projects, 'project_id'),
+            (customers, 'invoice__customer_id'),
+        ):
+            rows = (
+                items.annotate_price()
+                .order_by()
+                .values(field)
+                .annotate(total=Sum('computed_price'))
+            )
+            totals = {row[field]: float(row['total']) for row in rows}
+            content_type = ContentType.objects.get_for_model(scopes.model)
+            estimates = {
+                estimate.object_id: estimate
+                for estimate in cls.objects.filter(
+                    content_type=content_type,
+                    object_id__in=scopes.values_list('id', flat=True),
+                )
+            }
+            changed_estimates = []
+            new_estimates = []
+            for scope_id in scopes.values_list('id', flat=True):
+                total = totals.get(scope_id, 0)
+                estimate = estimates.get(scope_id)
+                if estimate is None:
+                    new_estimates.append(
+                        cls(content_type=content_type, object_id=scope_id, total=total)
+                    )
+                elif estimate.total != total:
+                    estimate.total = total
+                    changed_estimates.append(estimate)
+            cls.objects.bulk_create(new_estimates)
+            cls.objects.bulk_update(changed_estimates, ['total'])
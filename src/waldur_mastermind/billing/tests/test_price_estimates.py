@@ -1,6 +1,7 @@
 import decimal
 
 from ddt import data, ddt
+from django.core.management import call_command
 from freezegun import freeze_time
 from rest_framework import status, test
 
@@ -142,3 +143,58 @@ class PriceEstimateInvoiceItemTest(test.APITransactionTestCase):
         self.assertAlmostEqual(
             decimal.Decimal(estimate.total), decimal.Decimal(11 * 31),
         )
+
+    @data('project', 'customer')
+    def test_when_invoice_item_is_deleted_total_is_updated_too(self, scope):
+        invoice = invoice_factories.InvoiceFactory(customer=self.fixture.customer)
+        invoice_factories.InvoiceItemFactory(
+            invoice=invoice, project=self.fixture.project, unit_price=10
+        )
+        invoice_item = invoice_factories.InvoiceItemFactory(
+            invoice=invoice, project=self.fixture.project, unit_price=11
+        )
+        invoice_item.delete()
+        estimate = models.PriceEstimate.objects.get(scope=getattr(self.fixture, scope))
+        self.assertAlmostEqual(
+            decimal.Decimal(estimate.total), decimal.Decimal(10 * 31),
+        )
+
+    def test_estimate_is_not_changed_if_price_is_not_changed(self):
+        invoice = invoice_factories.InvoiceFactory(customer=self.fixture.customer)
+        invoice_item = invoice_factories.InvoiceItemFactory(
+            invoice=invoice, project=self.fixture.project, unit_price=10
+        )
+        models.PriceEstimate.objects.filter(scope=self.fixture.project).update(
+            total=100
+        )
+        invoice_item.name = 'New name'
+        invoice_item.save()
+        estimate = models.PriceEstimate.objects.get(scope=self.fixture.project)
+        self.assertEqual(estimate.total, 100)
+
+
+@freeze_time('2017-01-01')
+class RebuildBillingTest(test.APITransactionTestCase):
+    def setUp(self):
+        self.fixture = structure_fixtures.ProjectFixture()
+        invoice = invoice_factories.InvoiceFactory(customer=self.fixture.customer)
+        invoice_factories.InvoiceItemFactory(
+            invoice=invoice, project=self.fixture.project, unit_price=10
+        )
+        models.PriceEstimate.objects.all().update(total=0)
+
+    def test_estimates_are_recomputed(self):
+        call_command('rebuild_billing')
+        for scope in (self.fixture.project, self.fixture.customer):
+            estimate = models.PriceEstimate.objects.get(scope=scope)
+            self.assertAlmostEqual(
+                decimal.Decimal(estimate.total), decimal.Decimal(10 * 31),
+            )
+
+    def test_missing_estimates_are_created(self):
+        models.PriceEstimate.objects.filter(scope=self.fixture.project).delete()
+        call_command('rebuild_billing')
+        estimate = models.PriceEstimate.objects.get(scope=self.fixture.project)
+        self.assertAlmostEqual(
+            decimal.Decimal(estimate.total), decimal.Decimal(10 * 31),
+        )
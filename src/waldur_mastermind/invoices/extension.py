@@ -66,7 +66,7 @@ class InvoicesExtension(WaldurExtension):
             },
             'update-invoices-current-cost': {
                 'task': 'invoices.update_invoices_current_cost',
-                'schedule': timedelta(hours=24),
+                'schedule': timedelta(hours=1),
                 'args': (),
             },
             'send-notifications-about-upcoming-ends': {
@@ -2,8 +2,6 @@ import datetime
 import logging
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
-from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
@@ -121,24 +119,17 @@ def update_current_cost_when_invoice_item_is_updated(
     sender, instance, created=False, **kwargs
 ):
     invoice_item = instance
-    if created or set(invoice_item.tracker.changed()) & {
-        'start',
-        'end',
-        'quantity',
-        'unit_price',
-    }:
-        transaction.on_commit(lambda: invoice_item.invoice.update_current_cost())
+    if created:
+        price = invoice_item.price_current
+    elif invoice_item.has_price_changed():
+        price = invoice_item.price_current - invoice_item.get_previous().price_current
+    else:
+        return
+    models.Invoice.add_current_cost(invoice_item.invoice_id, price)
 
 
 def update_current_cost_when_invoice_item_is_deleted(sender, instance, **kwargs):
-    def update_invoice():
-        try:
-            instance.invoice.update_current_cost()
-        except ObjectDoesNotExist:
-            # It is okay to skip cache invalidation if invoice has been already removed
-            pass
-
-    transaction.on_commit(update_invoice)
+    models.Invoice.add_current_cost(instance.invoice_id, -instance.price_current)
 
 
 def projects_customer_has_been_changed(
@@ -165,6 +156,8 @@ def projects_customer_has_been_changed(
         invoice.items.filter(project=project).delete()
     else:
         invoice.items.filter(project=project).update(invoice=new_invoice)
+        invoice.update_current_cost()
+        new_invoice.update_current_cost()
 
 
 def create_recurring_usage_if_invoice_has_been_created(
@@ -0,0 +1,179 @@
+import decimal
+
+from django.db import models as django_models
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Abs, Ceil, Coalesce, Least
+from django.utils import timezone
+
+from waldur_mastermind.common import mixins as common_mixins
+
+Units = common_mixins.UnitPriceMixin.Units
+
+SECONDS_IN_HOUR = 60 * 60
+
+SECONDS_IN_DAY = 24 * 60 * 60
+
+
+def _decimal_field():
+    return django_models.DecimalField(
+        max_digits=common_mixins.PRICE_MAX_DIGITS,
+        decimal_places=common_mixins.PRICE_DECIMAL_PLACES,
+    )
+
+
+class ElapsedUnits(django_models.Func):
+    """
+    Number of time units of given length in seconds between two timestamps.
+    CEIL mirrors invoices.utils.get_full_hours and get_full_days,
+    FLOOR mirrors timedelta.days.
+    """
+
+    template = (
+        '%(function)s(EXTRACT(EPOCH FROM (%(expressions)s)) / %(seconds)s)::numeric'
+    )
+    arg_joiner = ' - '
+    output_field = django_models.DecimalField()
+
+    def __init__(self, end, start, seconds, function='CEIL', **extra):
+        super(ElapsedUnits, self).__init__(
+            end, start, seconds=int(seconds), function=function, **extra
+        )
+
+
+class Sign(django_models.Func):
+    function = 'SIGN'
+
+
+class DayOfMonth(django_models.Func):
+    """
+    Day of month of timestamp in UTC, because timestamps are fetched
+    in UTC when InvoiceItem.get_factor is evaluated in Python.
+    """
+
+    template = 'EXTRACT(DAY FROM %(expressions)s AT TIME ZONE \'UTC\')::numeric'
+    output_field = django_models.DecimalField()
+
+
+class DaysInMonth(django_models.Func):
+    """
+    Number of days in the month of timestamp in UTC, ie SQL counterpart of calendar.monthrange.
+    """
+
+    template = (
+        'EXTRACT(DAY FROM DATE_TRUNC(\'month\', %(expressions)s AT TIME ZONE \'UTC\') '
+        '+ INTERVAL \'1 month\' - INTERVAL \'1 day\')::numeric'
+    )
+    output_field = django_models.DecimalField()
+
+
+def round_up(expression):
+    """
+    SQL counterpart of waldur_mastermind.common.utils.quantize_price.
+    Value is rounded away from zero to 2 places after the decimal point.
+    """
+    hundred = Value(100, output_field=django_models.DecimalField())
+    return django_models.ExpressionWrapper(
+        Sign(expression) * Ceil(Abs(expression) * hundred) / hundred,
+        output_field=_decimal_field(),
+    )
+
+
+def get_half_month_factor():
+    half_month = F('month_days') / Value(2, output_field=django_models.DecimalField())
+    one = Value(1, output_field=django_models.DecimalField())
+    return Case(
+        When(
+            Q(start_day=1, end_day=15) | Q(start_day=16, end_day=F('month_days')),
+            then=one,
+        ),
+        When(
+            start_day=1,
+            end_day=F('month_days'),
+            then=Value(2, output_field=django_models.DecimalField()),
+        ),
+        When(
+            start_day=1,
+            end_day__gt=15,
+            then=round_up(one + (F('end_day') - Value(15)) / half_month),
+        ),
+        When(
+            start_day__lt=16,
+            end_day=F('month_days'),
+            then=round_up(one + (Value(16) - F('start_day')) / half_month),
+        ),
+        default=round_up((F('end_day') - F('start_day') + one) / half_month),
+        output_field=django_models.DecimalField(),
+    )
+
+
+def get_month_factor():
+    one = Value(1, output_field=django_models.DecimalField())
+    use_days = ElapsedUnits(F('end'), F('start'), SECONDS_IN_DAY, function='FLOOR')
+    return Case(
+        When(start_day=1, end_day=F('month_days'), then=one),
+        default=round_up((use_days + one) / F('month_days')),
+        output_field=django_models.DecimalField(),
+    )
+
+
+class InvoiceItemQuerySet(django_models.QuerySet):
+    """
+    Set-based counterpart of InvoiceItem.get_factor and InvoiceItem.price
+    so that invoice totals are computed in the database instead of Python.
+    """
+
+    def annotate_factor(self, current=False):
+        end = F('end')
+        if current:
+            end = Least(
+                F('end'),
+                Value(timezone.now(), output_field=django_models.DateTimeField()),
+            )
+
+        return self.annotate(
+            start_day=DayOfMonth(F('start')),
+            end_day=DayOfMonth(F('end')),
+            month_days=DaysInMonth(F('start')),
+        ).annotate(
+            computed_factor=Case(
+                When(~Q(quantity=0), then=F('quantity')),
+                When(unit=Units.QUANTITY, then=F('quantity')),
+                When(
+                    unit=Units.PER_HOUR,
+                    then=ElapsedUnits(end, F('start'), SECONDS_IN_HOUR),
+                ),
+                When(
+                    unit=Units.PER_DAY,
+                    then=ElapsedUnits(end, F('start'), SECONDS_IN_DAY),
+                ),
+                When(unit=Units.PER_HALF_MONTH, then=get_half_month_factor()),
+                default=get_month_factor(),
+                output_field=django_models.DecimalField(),
+            )
+        )
+
+    def annotate_price(self, current=False):
+        return self.annotate_factor(current).annotate(
+            computed_price=round_up(F('unit_price') * F('computed_factor'))
+        )
+
+    def get_price(self, current=False):
+        price = self.annotate_price(current).aggregate(
+            price=Coalesce(Sum('computed_price'), Value(0))
+        )['price']
+        return decimal.Decimal(price)
+
+    def get_price_by_invoice(self, current=False):
+        """
+        Returns dictionary mapping invoice ID to sum of its items prices.
+        """
+        rows = (
+            self.annotate_price(current)
+            .order_by()
+            .values('invoice_id')
+            .annotate(price=Sum('computed_price'))
+        )
+        return {row['invoice_id']: decimal.Decimal(row['price']) for row in rows}
+
+
+InvoiceItemManager = django_models.Manager.from_queryset(InvoiceItemQuerySet)
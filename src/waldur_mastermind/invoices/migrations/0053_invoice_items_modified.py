@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0052_delete_servicedowntime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='items_modified',
+            field=models.DateTimeField(
+                editable=False,
+                help_text='Date and time when price of invoice items has been changed.',
+                null=True,
+            ),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import copy
 import datetime
 import decimal
 import logging
@@ -8,6 +9,7 @@ from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from model_utils import FieldTracker
@@ -20,7 +22,7 @@ from waldur_mastermind.common import mixins as common_mixins
 from waldur_mastermind.common.utils import quantize_price
 from waldur_mastermind.marketplace import models as marketplace_models
 
-from . import utils
+from . import managers, utils
 
 logger = logging.getLogger(__name__)
 
@@ -88,6 +90,12 @@ class Invoice(core_models.UuidMixin, models.Model):
         help_text=_('Date then invoice moved from state pending to created.'),
     )
 
+    items_modified = models.DateTimeField(
+        null=True,
+        editable=False,
+        help_text=_('Date and time when price of invoice items has been changed.'),
+    )
+
     tracker = FieldTracker()
 
     def update_current_cost(self):
@@ -97,6 +105,20 @@ class Invoice(core_models.UuidMixin, models.Model):
             self.current_cost = total_current
             self.save(update_fields=['current_cost'])
 
+    @classmethod
+    def add_current_cost(cls, invoice_id, price):
+        """
+        Adjust cached current cost of invoice by price of changed items including tax.
+        Rounding errors and accrual of hourly and daily items are fixed
+        by update_invoices_current_cost task.
+        """
+        if not price:
+            return
+        cls.objects.filter(id=invoice_id).update(
+            current_cost=F('current_cost') + price + price * F('tax_percent') / 100,
+            items_modified=timezone.now(),
+        )
+
     @property
     def tax(self):
         return self.price * self.tax_percent / 100
@@ -107,9 +129,10 @@ class Invoice(core_models.UuidMixin, models.Model):
 
     @property
     def price(self):
-        return quantize_price(
-            decimal.Decimal(sum((item.price for item in self.items.all())))
-        )
+        # Price could be computed for many invoices at once, for example, in reports
+        if hasattr(self, '_price'):
+            return self._price
+        return quantize_price(self.items.get_price())
 
     @property
     def tax_current(self):
@@ -121,7 +144,7 @@ class Invoice(core_models.UuidMixin, models.Model):
 
     @property
     def price_current(self):
-        return sum((item.price_current for item in self.items.all()))
+        return quantize_price(self.items.get_price(current=True))
 
     @property
     def due_date(self):
@@ -198,8 +221,12 @@ class InvoiceItem(common_mixins.ProductCodeMixin, common_mixins.UnitPriceMixin):
     project_name = models.CharField(max_length=150, blank=True)
     project_uuid = models.CharField(max_length=32, blank=True)
 
+    objects = managers.InvoiceItemManager()
     tracker = FieldTracker()
 
+    # Fields which values are used to compute price of the item
+    PRICE_FIELDS = ('start', 'end', 'quantity', 'unit_price', 'unit')
+
     @property
     def tax(self):
         return self.price * self.invoice.tax_percent / 100
@@ -314,6 +341,17 @@ class InvoiceItem(common_mixins.ProductCodeMixin, common_mixins.UnitPriceMixin):
     def price_current(self):
         return self._price(current=True)
 
+    def get_previous(self):
+        """ Return copy of item with values of price fields before change """
+        previous = copy.copy(self)
+        for field, value in self.tracker.changed().items():
+            if field in self.PRICE_FIELDS:
+                setattr(previous, field, value)
+        return previous
+
+    def has_price_changed(self):
+        return bool(set(self.tracker.changed()) & set(self.PRICE_FIELDS))
+
     @property
     def usage_days(self):
         """
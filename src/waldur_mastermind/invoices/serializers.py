@@ -295,9 +295,19 @@ class SAFReportSerializer(serializers.Serializer):
     def get_empty_field(self, invoice_item):
         return ''
 
+    def get_plans_count(self, offering):
+        # Many items of the report usually refer to the same offering
+        plans_count = self.context.setdefault('plans_count', {})
+        if offering.id not in plans_count:
+            plans_count[offering.id] = offering.plans.count()
+        return plans_count[offering.id]
+
     def get_artnimi_field(self, invoice_item):
         # If a single plan for an offering exists, skip it from display
-        if invoice_item.resource and invoice_item.resource.offering.plans.count() == 1:
+        if (
+            invoice_item.resource
+            and self.get_plans_count(invoice_item.resource.offering) == 1
+        ):
             return invoice_item.name
         if 'plan_name' in invoice_item.details.keys():
             return f'{invoice_item.name} / {invoice_item.details["plan_name"]}'
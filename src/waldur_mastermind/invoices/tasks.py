@@ -1,22 +1,28 @@
+import datetime
 import logging
 from csv import DictWriter
-from io import StringIO
 
 import pdfkit
 from celery import shared_task
 from django.conf import settings
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Q, QuerySet
 from django.template.loader import render_to_string
 from django.utils import timezone
 
 from waldur_core.core import utils as core_utils
 from waldur_core.structure import models as structure_models
+from waldur_mastermind.common.utils import quantize_price
 from waldur_mastermind.invoices.utils import get_previous_month
 
 from . import models, registrators, serializers, utils
 
 logger = logging.getLogger(__name__)
 
+REPORT_CHUNK_SIZE = 1000
+
+CURRENT_COST_LAST_RUN_CACHE_KEY = 'invoices.update_invoices_current_cost.last_run'
+
 
 @shared_task(name='invoices.create_monthly_invoices')
 def create_monthly_invoices():
@@ -98,6 +104,24 @@ def send_invoice_notification(invoice_uuid):
     )
 
 
+def get_report_invoices(year, month):
+    invoices = models.Invoice.objects.filter(year=year, month=month)
+
+    # Report should include only organizations that had accounting running during the invoice period.
+    if settings.WALDUR_CORE['ENABLE_ACCOUNTING_START_DATE']:
+        invoices = invoices.filter(
+            customer__accounting_start_date__lte=core_utils.month_end(
+                datetime.date(year=year, month=month, day=1)
+            )
+        )
+
+    return invoices
+
+
+def get_report_filename(year, month):
+    return '3M%02d%dWaldur.txt' % (month, year)
+
+
 @shared_task(name='invoices.send_invoice_report')
 def send_invoice_report():
     """ Sends aggregate accounting data as CSV """
@@ -108,17 +132,10 @@ def send_invoice_report():
     body = render_to_string(
         'invoices/report_body.txt', {'month': date.month, 'year': date.year,}
     ).strip()
-    filename = '3M%02d%dWaldur.txt' % (date.month, date.year)
-    invoices = models.Invoice.objects.filter(year=date.year, month=date.month)
-
-    # Report should include only organizations that had accounting running during the invoice period.
-    if settings.WALDUR_CORE['ENABLE_ACCOUNTING_START_DATE']:
-        invoices = invoices.filter(
-            customer__accounting_start_date__lte=core_utils.month_end(date)
-        )
+    filename = get_report_filename(date.year, date.month)
+    invoices = get_report_invoices(date.year, date.month)
 
-    # Report should not include customers with 0 invoice items.
-    invoices = [invoice for invoice in invoices if invoice.items.count() > 0]
+    # Customers with 0 invoice items are skipped because empty items are not reported.
     text_message = format_invoice_csv(invoices)
 
     # Please note that email body could be empty if there are no valid invoices
@@ -133,46 +150,116 @@ def send_invoice_report():
     )
 
 
-def format_invoice_csv(invoices):
-    if not isinstance(invoices, list):
-        invoices = [invoices]
+class Echo:
+    """ File-like object which returns written value instead of buffering it """
+
+    def write(self, value):
+        return value
 
+
+def iter_invoice_report_items(invoices, ordering):
+    """
+    Iterate over non-empty items of invoices with server-side cursor.
+
+    Items of the same invoice share single invoice object with precomputed price,
+    so that invoice totals are not recomputed for every item.
+    """
+    if isinstance(invoices, QuerySet):
+        invoices = invoices.select_related('customer')
+    invoices = {invoice.id: invoice for invoice in invoices}
+    prices = models.InvoiceItem.objects.filter(
+        invoice_id__in=invoices.keys()
+    ).get_price_by_invoice()
+    for invoice_id, invoice in invoices.items():
+        invoice._price = quantize_price(prices.get(invoice_id, 0))
+
+    items = (
+        models.InvoiceItem.objects.filter(invoice_id__in=invoices.keys())
+        .select_related('resource__offering')
+        .order_by('invoice_id', *ordering)
+        .iterator(chunk_size=REPORT_CHUNK_SIZE)
+    )
+    for item in items:
+        item.invoice = invoices[item.invoice_id]
+        # skip empty, but leave in credit and debit
+        if item.total != 0:
+            yield item
+
+
+def iter_invoice_csv(invoices):
+    """
+    Generate invoice report line by line, so that it could be written
+    to a file or streamed to HTTP response without keeping it in memory.
+    """
     csv_params = settings.WALDUR_INVOICES['INVOICE_REPORTING']['CSV_PARAMS']
 
     if settings.WALDUR_INVOICES['INVOICE_REPORTING'].get('USE_SAF'):
-        fields = serializers.SAFReportSerializer.Meta.fields
-        stream = StringIO()
-        writer = DictWriter(stream, fieldnames=fields, **csv_params)
-        writer.writeheader()
-
-        for invoice in invoices:
-            items = utils.filter_invoice_items(
-                invoice.items.order_by('project_name', 'name')
-            )
-            serializer = serializers.SAFReportSerializer(items, many=True)
-            writer.writerows(serializer.data)
-        return stream.getvalue()
+        serializer = serializers.SAFReportSerializer(context={})
+        ordering = ('project_name', 'name')
+    else:
+        serializer = serializers.InvoiceItemReportSerializer(context={})
+        ordering = ('id',)
 
-    fields = serializers.InvoiceItemReportSerializer.Meta.fields
-    stream = StringIO()
-    writer = DictWriter(stream, fieldnames=fields, **csv_params)
-    writer.writeheader()
+    fields = serializer.Meta.fields
+    writer = DictWriter(Echo(), fieldnames=fields, **csv_params)
+    yield writer.writerow(dict(zip(fields, fields)))
 
-    for invoice in invoices:
-        items = utils.filter_invoice_items(invoice.items.all())
-        serializer = serializers.InvoiceItemReportSerializer(items, many=True)
-        writer.writerows(serializer.data)
+    for item in iter_invoice_report_items(invoices, ordering):
+        yield writer.writerow(serializer.to_representation(item))
 
-    return stream.getvalue()
+
+def format_invoice_csv(invoices):
+    if isinstance(invoices, models.Invoice):
+        invoices = [invoices]
+
+    return ''.join(iter_invoice_csv(invoices))
 
 
 @shared_task(name='invoices.update_invoices_current_cost')
 def update_invoices_current_cost():
+    """
+    Reconcile cached current cost of current month invoices.
+
+    Current cost is adjusted by handlers when invoice items are changed,
+    so only invoices which items have been changed since the last run
+    or which have running hourly or daily items are recomputed.
+    """
+    now = timezone.now()
     year = utils.get_current_year()
     month = utils.get_current_month()
 
-    for invoice in models.Invoice.objects.filter(year=year, month=month):
-        invoice.update_current_cost()
+    invoices = models.Invoice.objects.filter(year=year, month=month)
+    last_run = cache.get(CURRENT_COST_LAST_RUN_CACHE_KEY)
+    if last_run:
+        # Current price of hourly and daily items grows until they end
+        accruing_items = models.InvoiceItem.objects.filter(
+            invoice__year=year,
+            invoice__month=month,
+            quantity=0,
+            unit__in=(models.Units.PER_HOUR, models.Units.PER_DAY),
+            start__lt=now,
+            end__gt=last_run,
+        )
+        invoices = invoices.filter(
+            Q(items_modified__gte=last_run)
+            | Q(id__in=accruing_items.values('invoice_id'))
+        )
+
+    invoices = invoices.only('id', 'tax_percent', 'current_cost')
+    prices = models.InvoiceItem.objects.filter(
+        invoice__in=invoices
+    ).get_price_by_invoice(current=True)
+
+    changed_invoices = []
+    for invoice in invoices.iterator():
+        price = prices.get(invoice.id, 0)
+        total_current = price + price * invoice.tax_percent / 100
+        if invoice.current_cost != total_current:
+            invoice.current_cost = total_current
+            changed_invoices.append(invoice)
+
+    models.Invoice.objects.bulk_update(changed_invoices, ['current_cost'])
+    cache.set(CURRENT_COST_LAST_RUN_CACHE_KEY, now, None)
 
 
 @shared_task
@@ -2,10 +2,13 @@ import datetime
 from unittest import mock
 
 from django.test import TransactionTestCase
+from django.urls import reverse
 from django.utils import timezone
 from freezegun import freeze_time
+from rest_framework import status, test
 
 from waldur_core.core.tests.helpers import override_waldur_core_settings
+from waldur_core.structure.tests import factories as structure_factories
 from waldur_mastermind.invoices import models, tasks
 from waldur_mastermind.invoices import utils as invoices_utils
 from waldur_mastermind.invoices.tasks import format_invoice_csv
@@ -251,3 +254,39 @@ class MonthlyReportTaskTest(TransactionTestCase):
         ][0]
         self.assertEqual(customer_2_context['end_date_alarm'], False)
         self.assertEqual(customer_2_context['payments_alarm'], None)
+
+
+@freeze_time('2017-11-01')
+class InvoiceReportViewTest(test.APITransactionTestCase):
+    def setUp(self):
+        self.fixture = fixtures.InvoiceFixture()
+        self.invoice = self.fixture.invoice
+        self.invoice.year = 2017
+        self.invoice.month = 10
+        self.invoice.save()
+        self.fixture.invoice_item
+        self.url = 'http://testserver' + reverse('invoice-report')
+
+    def test_staff_can_download_report_for_previous_month(self):
+        self.client.force_authenticate(self.fixture.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('3M102017Waldur.txt', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 2)
+
+    def test_report_for_other_month_is_empty(self):
+        self.client.force_authenticate(self.fixture.staff)
+        response = self.client.get(self.url, {'year': 2017, 'month': 9})
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 1)
+
+    def test_other_users_can_not_download_report(self):
+        self.client.force_authenticate(self.fixture.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_month_is_validated(self):
+        self.client.force_authenticate(structure_factories.UserFactory(is_staff=True))
+        response = self.client.get(self.url, {'year': 2017, 'month': 13})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
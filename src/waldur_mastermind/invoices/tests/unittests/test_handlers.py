@@ -71,6 +71,29 @@ class UpdateInvoiceCurrentCostTest(TransactionTestCase):
         self.invoice.refresh_from_db()
         self.assertEqual(0, self.invoice.current_cost)
 
+    def test_current_cost_is_adjusted_by_price_difference_including_tax(self):
+        self.invoice.tax_percent = 20
+        self.invoice.save()
+        invoice_item = self.create_invoice_item()
+        self.create_invoice_item()
+
+        invoice_item.unit_price = 50
+        invoice_item.save(update_fields=['unit_price'])
+
+        self.invoice.refresh_from_db()
+        self.assertEqual(180, self.invoice.current_cost)
+        self.assertIsNotNone(self.invoice.items_modified)
+
+    def test_current_cost_is_not_changed_if_price_is_not_changed(self):
+        invoice_item = self.create_invoice_item()
+        models.Invoice.objects.filter(id=self.invoice.id).update(current_cost=10)
+
+        invoice_item.name = 'New name'
+        invoice_item.save()
+
+        self.invoice.refresh_from_db()
+        self.assertEqual(10, self.invoice.current_cost)
+
 
 class MoveProjectInvoiceTest(TransactionTestCase):
     def test_delete_invoice_items_if_project_customer_has_been_changed(self):
@@ -0,0 +1,157 @@
+import decimal
+
+from ddt import data, ddt
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from freezegun import freeze_time
+
+from waldur_core.structure.tests import factories as structure_factories
+from waldur_mastermind.common.utils import parse_datetime, quantize_price
+from waldur_mastermind.invoices import models, tasks
+
+from .. import factories
+
+Units = models.InvoiceItem.Units
+
+PERIODS = (
+    ('2016-11-01 00:00:00', '2016-11-30 23:59:59'),
+    ('2016-11-01 14:00:00', '2016-11-08 14:00:00'),
+    ('2016-11-01 00:00:00', '2016-11-15 23:59:59'),
+    ('2016-11-01 00:00:00', '2016-11-20 10:00:00'),
+    ('2016-11-16 00:00:00', '2016-11-30 23:59:59'),
+    ('2016-11-10 08:30:00', '2016-11-30 23:59:59'),
+    ('2016-11-17 14:00:00', '2016-11-25 09:15:00'),
+    ('2016-02-03 00:00:00', '2016-02-29 23:59:59'),
+    ('2017-02-16 00:00:00', '2017-02-28 23:59:59'),
+    ('2019-08-09 10:00:00', '2019-08-09 14:00:00'),
+    ('2019-08-09 10:00:00', '2019-08-09 14:00:01'),
+)
+
+
+@ddt
+class InvoiceItemPriceAnnotationTest(TestCase):
+    """
+    Equivalence of set-based price computation with InvoiceItem.get_factor rules.
+    """
+
+    def setUp(self):
+        self.invoice = factories.InvoiceFactory()
+
+    def create_items(self, unit, quantity=0):
+        for start, end in PERIODS:
+            factories.InvoiceItemFactory(
+                invoice=self.invoice,
+                start=parse_datetime(start),
+                end=parse_datetime(end),
+                unit=unit,
+                unit_price=decimal.Decimal('12.3456789'),
+                quantity=quantity,
+            )
+
+    def assert_prices_are_equal(self, current=False):
+        items = models.InvoiceItem.objects.filter(invoice=self.invoice)
+        for item in items.annotate_price(current):
+            self.assertEqual(item.computed_factor, item.get_factor(current), item)
+            self.assertEqual(item.computed_price, item._price(current), item)
+
+    @data(Units.PER_MONTH, Units.PER_HALF_MONTH, Units.PER_DAY, Units.PER_HOUR)
+    def test_factor_and_price_match_python_rules(self, unit):
+        self.create_items(unit)
+        self.assert_prices_are_equal()
+
+    @data(Units.PER_MONTH, Units.PER_HALF_MONTH, Units.PER_DAY, Units.PER_HOUR)
+    def test_current_factor_and_price_match_python_rules(self, unit):
+        self.create_items(unit)
+        with freeze_time('2016-11-12 17:30:00'):
+            self.assert_prices_are_equal(current=True)
+
+    @data(Units.QUANTITY, Units.PER_MONTH, Units.PER_DAY)
+    def test_quantity_overrides_unit(self, unit):
+        self.create_items(unit, quantity=3)
+        self.assert_prices_are_equal()
+
+    def test_invoice_price_is_equal_to_sum_of_item_prices(self):
+        self.create_items(Units.PER_DAY)
+        self.create_items(Units.PER_HALF_MONTH)
+        expected = quantize_price(
+            decimal.Decimal(sum(item.price for item in self.invoice.items.all()))
+        )
+        self.assertEqual(self.invoice.price, expected)
+
+    def test_invoice_price_is_zero_if_there_are_no_items(self):
+        self.assertEqual(self.invoice.price, 0)
+        self.assertEqual(self.invoice.price_current, 0)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+)
+class UpdateInvoicesCurrentCostTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @freeze_time('2016-11-12')
+    def test_current_cost_is_updated_for_current_month_invoices(self):
+        customer = structure_factories.CustomerFactory(default_tax_percent=20)
+        invoice = factories.InvoiceFactory(customer=customer)
+        factories.InvoiceItemFactory(
+            invoice=invoice,
+            start=parse_datetime('2016-11-01 00:00:00'),
+            end=parse_datetime('2016-11-30 23:59:59'),
+            unit=Units.PER_DAY,
+            unit_price=10,
+        )
+        models.Invoice.objects.filter(id=invoice.id).update(current_cost=0)
+
+        tasks.update_invoices_current_cost()
+
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.current_cost, 11 * 10 * decimal.Decimal('1.2'))
+
+    def create_invoice_item(self, invoice, unit):
+        return factories.InvoiceItemFactory(
+            invoice=invoice,
+            start=parse_datetime('2016-11-01 00:00:00'),
+            end=parse_datetime('2016-11-30 23:59:59'),
+            unit=unit,
+            unit_price=10,
+        )
+
+    def test_invoices_without_changes_are_skipped(self):
+        with freeze_time('2016-11-12'):
+            invoice = factories.InvoiceFactory()
+            self.create_invoice_item(invoice, Units.PER_MONTH)
+            tasks.update_invoices_current_cost()
+
+        with freeze_time('2016-11-13'):
+            models.Invoice.objects.filter(id=invoice.id).update(current_cost=0)
+            tasks.update_invoices_current_cost()
+
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.current_cost, 0)
+
+    def test_invoices_with_running_daily_items_are_updated(self):
+        with freeze_time('2016-11-12'):
+            invoice = factories.InvoiceFactory()
+            self.create_invoice_item(invoice, Units.PER_DAY)
+            tasks.update_invoices_current_cost()
+
+        with freeze_time('2016-11-13 12:00:00'):
+            tasks.update_invoices_current_cost()
+
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.current_cost, 13 * 10)
+
+    def test_invoices_with_changed_items_are_updated(self):
+        with freeze_time('2016-11-12'):
+            invoice = factories.InvoiceFactory()
+            self.create_invoice_item(invoice, Units.PER_MONTH)
+            tasks.update_invoices_current_cost()
+
+        with freeze_time('2016-11-13'):
+            self.create_invoice_item(invoice, Units.PER_MONTH)
+            models.Invoice.objects.filter(id=invoice.id).update(current_cost=0)
+            tasks.update_invoices_current_cost()
+
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.current_cost, 20)
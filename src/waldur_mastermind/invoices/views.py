@@ -1,10 +1,9 @@
 import datetime
-import decimal
 
 from dateutil.relativedelta import relativedelta
 from django.db import transaction
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils.translation import ugettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import exceptions, status
@@ -118,40 +117,66 @@ class InvoiceViewSet(core_views.ReadOnlyActionsViewSet):
     @action(detail=True)
     def stats(self, request, uuid=None):
         invoice = self.get_object()
-        offerings = {}
-
-        for item in invoice.items.all():
-            if not item.resource:
-                continue
-
-            resource = item.resource
-            offering = resource.offering
-            customer = offering.customer
-            service_category_title = offering.category.title
-            service_provider_name = customer.name
-            service_provider_uuid = customer.serviceprovider.uuid.hex
-
-            if offering.uuid.hex not in offerings.keys():
-                offerings[offering.uuid.hex] = {
-                    'offering_name': offering.name,
-                    'aggregated_cost': item.total,
-                    'service_category_title': service_category_title,
-                    'service_provider_name': service_provider_name,
-                    'service_provider_uuid': service_provider_uuid,
-                }
-            else:
-                offerings[offering.uuid.hex]['aggregated_cost'] += item.total
-
-        queryset = [dict(uuid=key, **details) for (key, details) in offerings.items()]
-
-        for item in queryset:
-            item['aggregated_cost'] = quantize_price(
-                decimal.Decimal(item['aggregated_cost'])
+        rows = (
+            invoice.items.filter(resource__isnull=False)
+            .annotate_price()
+            .order_by()
+            .values(
+                'resource__offering__uuid',
+                'resource__offering__name',
+                'resource__offering__category__title',
+                'resource__offering__customer__name',
+                'resource__offering__customer__serviceprovider__uuid',
             )
+            .annotate(price=Sum('computed_price'))
+            .order_by('resource__offering__name')
+        )
+
+        queryset = [
+            {
+                'uuid': row['resource__offering__uuid'].hex,
+                'offering_name': row['resource__offering__name'],
+                'aggregated_cost': quantize_price(
+                    row['price'] + row['price'] * invoice.tax_percent / 100
+                ),
+                'service_category_title': row['resource__offering__category__title'],
+                'service_provider_name': row['resource__offering__customer__name'],
+                'service_provider_uuid': row[
+                    'resource__offering__customer__serviceprovider__uuid'
+                ].hex,
+            }
+            for row in rows
+        ]
 
         page = self.paginate_queryset(queryset)
         return self.get_paginated_response(page)
 
+    @action(detail=False)
+    def report(self, request):
+        """ Stream accounting report for all invoices of the given month as CSV """
+        if not self.request.user.is_staff:
+            raise exceptions.PermissionDenied()
+
+        date = utils.get_previous_month()
+        try:
+            year = int(request.query_params.get('year', date.year))
+            month = int(request.query_params.get('month', date.month))
+        except ValueError:
+            raise exceptions.ValidationError(_('Year and month should be numbers.'))
+
+        if not 1 <= month <= 12:
+            raise exceptions.ValidationError(_('Month should be between 1 and 12.'))
+
+        invoices = tasks.get_report_invoices(year, month)
+        response = StreamingHttpResponse(
+            tasks.iter_invoice_csv(invoices), content_type='text/csv'
+        )
+        filename = tasks.get_report_filename(year, month)
+        response['Content-Disposition'] = 'attachment; filename="{filename}"'.format(
+            filename=filename
+        )
+        return response
+
     @action(detail=False)
     def growth(self, request):
         if not self.request.user.is_staff and not request.user.is_support:
@@ -1414,6 +1414,7 @@ class OfferingPermission(core_models.UuidMixin, structure_models.BasePermission)
         on_delete=models.CASCADE, to=Offering, related_name='permissions'
     )
     tracker = FieldTracker(fields=['expiration_time'])
+    scope_field = 'offering'
 
     @classmethod
     def get_url_name(cls):
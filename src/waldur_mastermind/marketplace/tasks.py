@@ -96,20 +96,14 @@ def filter_aggregate_by_scope(queryset, scope):
     return queryset
 
 
-def aggregate_reported_usage(start, end, scope):
-    queryset = models.ComponentUsage.objects.filter(
+def get_reported_usage_queryset(start, end):
+    return models.ComponentUsage.objects.filter(
         date__gte=start, date__lte=end
     ).exclude(component__parent=None)
 
-    queryset = filter_aggregate_by_scope(queryset, scope)
-
-    queryset = queryset.values('component__parent_id').annotate(total=Sum('usage'))
-
-    return {row['component__parent_id']: row['total'] for row in queryset}
-
 
-def aggregate_fixed_usage(start, end, scope):
-    queryset = models.ResourcePlanPeriod.objects.filter(
+def get_fixed_usage_queryset(start, end):
+    return models.ResourcePlanPeriod.objects.filter(
         # Resource has been active during billing period
         Q(start__gte=start, end__lte=end)
         | Q(end__isnull=True)  # Resource is still active
@@ -117,6 +111,19 @@ def aggregate_fixed_usage(start, end, scope):
             end__gte=start, end__lte=end
         )  # Resource has been launched in previous billing period and stopped in current
     )
+
+
+def aggregate_reported_usage(start, end, scope):
+    queryset = get_reported_usage_queryset(start, end)
+    queryset = filter_aggregate_by_scope(queryset, scope)
+
+    queryset = queryset.values('component__parent_id').annotate(total=Sum('usage'))
+
+    return {row['component__parent_id']: row['total'] for row in queryset}
+
+
+def aggregate_fixed_usage(start, end, scope):
+    queryset = get_fixed_usage_queryset(start, end)
     queryset = filter_aggregate_by_scope(queryset, scope)
 
     queryset = queryset.values('plan__components__component__parent_id').annotate(
@@ -149,19 +156,106 @@ def calculate_usage_for_scope(start, end, scope):
         )
 
 
+SCOPE_PATHS = (
+    (structure_models.Customer, 'resource__project__customer_id'),
+    (structure_models.Project, 'resource__project_id'),
+)
+
+
+def aggregate_usage_by_scopes(queryset, scope_path, component_path, usage_path):
+    """
+    Returns dictionary where key is tuple of scope ID and category component ID
+    and value is total usage of this component within scope.
+    """
+    rows = (
+        queryset.values(scope_path, component_path)
+        .annotate(total=Sum(usage_path))
+        .order_by()
+    )
+    return {
+        (row[scope_path], row[component_path]): row['total']
+        for row in rows
+        # OfferingComponent.parent can be None
+        if row[component_path] is not None
+    }
+
+
+def calculate_usage_for_all_scopes(start, end):
+    """
+    Calculate usage of category components for all customers and projects
+    using two grouped queries per scope model instead of per scope queries.
+    """
+    usages = {}
+    for model, scope_path in SCOPE_PATHS:
+        content_type = ContentType.objects.get_for_model(model)
+        reported_usage = aggregate_usage_by_scopes(
+            get_reported_usage_queryset(start, end),
+            scope_path,
+            'component__parent_id',
+            'usage',
+        )
+        fixed_usage = aggregate_usage_by_scopes(
+            get_fixed_usage_queryset(start, end),
+            scope_path,
+            'plan__components__component__parent_id',
+            'plan__components__amount',
+        )
+        scope_ids = set(model.objects.values_list('id', flat=True))
+        for key in set(reported_usage.keys()) | set(fixed_usage.keys()):
+            scope_id, component_id = key
+            if scope_id in scope_ids:
+                usages[(content_type.id, scope_id, component_id)] = (
+                    reported_usage.get(key),
+                    fixed_usage.get(key),
+                )
+    return usages
+
+
+@transaction.atomic
+def save_usage_for_all_scopes(start, usages):
+    changed_usages = []
+    existing_usages = models.CategoryComponentUsage.objects.filter(
+        date=start,
+        content_type_id__in={content_type_id for (content_type_id, _, _) in usages},
+    )
+    for usage in existing_usages:
+        key = (usage.content_type_id, usage.object_id, usage.component_id)
+        if key not in usages:
+            continue
+        reported_usage, fixed_usage = usages.pop(key)
+        if (usage.reported_usage, usage.fixed_usage) != (reported_usage, fixed_usage):
+            usage.reported_usage = reported_usage
+            usage.fixed_usage = fixed_usage
+            changed_usages.append(usage)
+
+    models.CategoryComponentUsage.objects.bulk_update(
+        changed_usages, ['reported_usage', 'fixed_usage'], batch_size=1000
+    )
+    models.CategoryComponentUsage.objects.bulk_create(
+        [
+            models.CategoryComponentUsage(
+                content_type_id=content_type_id,
+                object_id=object_id,
+                component_id=component_id,
+                date=start,
+                reported_usage=reported_usage,
+                fixed_usage=fixed_usage,
+            )
+            for (content_type_id, object_id, component_id), (
+                reported_usage,
+                fixed_usage,
+            ) in usages.items()
+        ],
+        batch_size=1000,
+    )
+
+
 @shared_task(name='waldur_mastermind.marketplace.calculate_usage_for_current_month')
 def calculate_usage_for_current_month():
     start = invoice_utils.get_current_month_start()
     end = invoice_utils.get_current_month_end()
-    scopes = []
-
-    for customer in structure_models.Customer.objects.all():
-        scopes.append(customer)
-        for project in customer.projects.all():
-            scopes.append(project)
-
-    for scope in scopes:
-        calculate_usage_for_scope(start, end, scope)
+    usages = calculate_usage_for_all_scopes(start, end)
+    save_usage_for_all_scopes(start, usages)
 
 
 @shared_task(name='waldur_mastermind.marketplace.send_notifications_about_usages')
@@ -1,5 +1,7 @@
+from django.utils import timezone
 from django.utils.functional import cached_property
 
+from waldur_core.core import utils as core_utils
 from waldur_core.structure import models as structure_models
 from waldur_core.structure.tests import factories as structure_factories
 from waldur_core.structure.tests import fixtures as structure_fixtures
@@ -86,3 +88,58 @@ class MarketplaceFixture(structure_fixtures.ProjectFixture):
             user, role=structure_models.CustomerRole.OWNER
         )
         return user
+
+
+class CategoryUsageBenchmarkFixture:
+    """
+    Projects with resources reporting usage of the same category component.
+    Projects and resources are created in bulk, so that default size
+    is suitable for benchmarking usage calculation.
+    """
+
+    def __init__(self, project_count=10000, customer_count=100):
+        self.category_component = marketplace_factories.CategoryComponentFactory()
+        self.offering_component = marketplace_factories.OfferingComponentFactory(
+            parent=self.category_component,
+            billing_type=marketplace_models.OfferingComponent.BillingTypes.USAGE,
+        )
+        self.plan = marketplace_factories.PlanFactory(
+            offering=self.offering_component.offering
+        )
+        marketplace_factories.PlanComponentFactory(
+            plan=self.plan, component=self.offering_component, amount=1
+        )
+        self.customers = structure_factories.CustomerFactory.create_batch(
+            customer_count
+        )
+        self.projects = structure_models.Project.objects.bulk_create(
+            structure_factories.ProjectFactory.build(
+                customer=self.customers[index % customer_count]
+            )
+            for index in range(project_count)
+        )
+        self.resources = marketplace_models.Resource.objects.bulk_create(
+            marketplace_factories.ResourceFactory.build(
+                offering=self.offering_component.offering,
+                plan=self.plan,
+                project=project,
+            )
+            for project in self.projects
+        )
+        plan_periods = marketplace_models.ResourcePlanPeriod.objects.bulk_create(
+            marketplace_models.ResourcePlanPeriod(
+                resource=resource, plan=self.plan, start=timezone.now()
+            )
+            for resource in self.resources
+        )
+        marketplace_models.ComponentUsage.objects.bulk_create(
+            marketplace_models.ComponentUsage(
+                resource=plan_period.resource,
+                component=self.offering_component,
+                usage=10,
+                date=timezone.now(),
+                billing_period=core_utils.month_start(timezone.now()),
+                plan_period=plan_period,
+            )
+            for plan_period in plan_periods
+        )
@@ -190,6 +190,12 @@ class CostsStatsTest(StatsBaseTest):
             self.resource.save()
             self._check_stats()
 
+    def test_costs_of_closed_months_are_cached(self):
+        with freeze_time('2020-03-01'):
+            self._check_stats()
+            invoices_models.InvoiceItem.objects.filter(resource=self.resource).delete()
+            self._check_stats()
+
     def _check_stats(self):
         self.client.force_authenticate(self.fixture.staff)
         result = self.client.get(self.url, {'start': '2020-01', 'end': '2020-02'})
@@ -323,6 +329,23 @@ class ComponentStatsTest(StatsBaseTest):
             ],
         )
 
+    def test_limit_usage_is_summed_for_all_resources_of_period(self):
+        self.resource.offering.type = PLUGIN_NAME
+        self.resource.offering.save()
+        factories.ResourceFactory(
+            offering=self.offering,
+            project=self.resource.project,
+            state=models.Resource.States.OK,
+            plan=self.plan,
+            limits={'cores': 1},
+        )
+
+        self._create_items()
+        self.client.force_authenticate(self.fixture.staff)
+        result = self.client.get(self.url, {'start': '2020-03', 'end': '2020-03'})
+        self.assertEqual(len(result.data), 1)
+        self.assertEqual(result.data[0]['usage'], 62)
+
     def test_handler(self):
         self.resource.offering.type = PLUGIN_NAME
         self.resource.offering.save()
@@ -1,6 +1,9 @@
 import datetime
 
+from django.contrib.contenttypes.models import ContentType
 from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from freezegun import freeze_time
 from rest_framework import test
@@ -51,6 +54,51 @@ class CalculateUsageForCurrentMonthTest(test.APITransactionTestCase):
         self.assertEqual(models.CategoryComponentUsage.objects.count(), 0)
 
 
+class CalculateUsageForAllScopesTest(test.APITransactionTestCase):
+    def get_usage(self, scope):
+        return models.CategoryComponentUsage.objects.get(
+            content_type=ContentType.objects.get_for_model(scope),
+            object_id=scope.id,
+        )
+
+    def test_usage_is_aggregated_for_customers_and_projects(self):
+        fixture = fixtures.CategoryUsageBenchmarkFixture(
+            project_count=4, customer_count=2
+        )
+        tasks.calculate_usage_for_current_month()
+
+        customer_usage = self.get_usage(fixture.customers[0])
+        self.assertEqual(customer_usage.reported_usage, 20)
+        self.assertEqual(customer_usage.fixed_usage, 2)
+        project_usage = self.get_usage(fixture.projects[0])
+        self.assertEqual(project_usage.reported_usage, 10)
+        self.assertEqual(project_usage.fixed_usage, 1)
+
+    def test_existing_usage_is_updated(self):
+        fixture = fixtures.CategoryUsageBenchmarkFixture(
+            project_count=2, customer_count=1
+        )
+        tasks.calculate_usage_for_current_month()
+        models.ComponentUsage.objects.filter(resource=fixture.resources[0]).update(
+            usage=30
+        )
+        tasks.calculate_usage_for_current_month()
+
+        self.assertEqual(models.CategoryComponentUsage.objects.count(), 3)
+        self.assertEqual(self.get_usage(fixture.customers[0]).reported_usage, 40)
+
+    def test_number_of_queries_does_not_depend_on_number_of_projects(self):
+        fixtures.CategoryUsageBenchmarkFixture(project_count=2, customer_count=1)
+        with CaptureQueriesContext(connection) as small_queries:
+            tasks.calculate_usage_for_current_month()
+
+        fixtures.CategoryUsageBenchmarkFixture(project_count=20, customer_count=5)
+        with CaptureQueriesContext(connection) as large_queries:
+            tasks.calculate_usage_for_current_month()
+
+        self.assertEqual(len(small_queries), len(large_queries))
+
+
 class NotificationTest(test.APITransactionTestCase):
     def test_notify_about_resource_change(self):
         project_fixture = structure_fixtures.ProjectFixture()
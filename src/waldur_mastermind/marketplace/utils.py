@@ -1,4 +1,5 @@
 import base64
+import collections
 import datetime
 import logging
 import os
@@ -8,11 +9,13 @@ from io import BytesIO
 import pdfkit
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
+from django.contrib.postgres.fields.jsonb import KeyTextTransform
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage as storage
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Q, Sum
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
@@ -25,7 +28,7 @@ from waldur_core.core import serializers as core_serializers
 from waldur_core.core import utils as core_utils
 from waldur_core.structure import filters as structure_filters
 from waldur_core.structure import models as structure_models
-from waldur_mastermind.common.utils import create_request
+from waldur_mastermind.common.utils import create_request, quantize_price
 from waldur_mastermind.invoices import models as invoice_models
 from waldur_mastermind.invoices import registrators
 from waldur_mastermind.invoices.utils import get_full_days
@@ -464,38 +467,125 @@ def add_marketplace_offering(sender, fields, **kwargs):
     setattr(sender, 'get_is_limit_based', get_is_limit_based)
 
 
-def get_offering_costs(offering, active_customers, start, end):
-    costs = []
-    date = start
+OFFERING_STATS_CACHE_KEY = 'waldur_mastermind.marketplace.offering_stats.%s.%s.%s'
+
+OFFERING_STATS_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
 
+def get_months(start, end):
+    dates = []
+    date = start
     while date <= end:
-        year = date.year
-        month = date.month
-
-        invoice_items = invoice_models.InvoiceItem.objects.filter(
-            details__offering_uuid=offering.uuid.hex,
-            project__customer__in=active_customers,
-            invoice__year=year,
-            invoice__month=month,
+        dates.append(date)
+        date += relativedelta(months=1)
+    return dates
+
+
+def get_period(date):
+    return '%s-%02d' % (date.year, date.month)
+
+
+def is_closed_month(date):
+    today = timezone.now()
+    return (date.year, date.month) < (today.year, today.month)
+
+
+def filter_invoice_items_by_months(queryset, dates):
+    query = Q()
+    for date in dates:
+        query |= Q(invoice__year=date.year, invoice__month=date.month)
+    return queryset.filter(query)
+
+
+def get_offering_stats_rows(name, offering, dates, calculate):
+    """
+    Returns dictionary mapping month to rows calculated by calculate function for given months.
+    Invoices of closed months are not changed anymore, therefore their rows
+    are cached per offering and month and calculated only once.
+    """
+    keys = {
+        date: OFFERING_STATS_CACHE_KEY % (name, offering.uuid.hex, get_period(date))
+        for date in dates
+        if is_closed_month(date)
+    }
+    cached_rows = cache.get_many(keys.values())
+    rows = {date: cached_rows[key] for date, key in keys.items() if key in cached_rows}
+    missing_dates = [date for date in dates if date not in rows]
+    if not missing_dates:
+        return rows
+
+    calculated_rows = calculate(offering, missing_dates)
+    for date in missing_dates:
+        rows[date] = calculated_rows.get(date, [])
+    cache.set_many(
+        {keys[date]: rows[date] for date in missing_dates if date in keys},
+        OFFERING_STATS_CACHE_TIMEOUT,
+    )
+    return rows
+
+
+def calculate_offering_costs(offering, dates):
+    """
+    Returns price of invoice items of the offering grouped by month, customer and tax percent.
+    """
+    invoice_items = filter_invoice_items_by_months(
+        invoice_models.InvoiceItem.objects.filter(
+            details__offering_uuid=offering.uuid.hex
+        ),
+        dates,
+    )
+    fields = (
+        'invoice__year',
+        'invoice__month',
+        'project__customer_id',
+        'invoice__tax_percent',
+    )
+    rows = {}
+    for current, price_field in ((False, 'price'), (True, 'price_current')):
+        queryset = (
+            invoice_items.annotate_price(current)
+            .order_by()
+            .values(*fields)
+            .annotate(price=Sum('computed_price'))
         )
+        for row in queryset:
+            key = tuple(row[field] for field in fields)
+            rows.setdefault(key, {'price': 0, 'price_current': 0})
+            rows[key][price_field] = quantize_price(row['price'])
+
+    result = collections.defaultdict(list)
+    for (year, month, customer_id, tax_percent), prices in rows.items():
+        result[datetime.date(year=year, month=month, day=1)].append(
+            dict(customer_id=customer_id, tax_percent=tax_percent, **prices)
+        )
+    return result
+
 
+def get_offering_costs(offering, active_customers, start, end):
+    costs = []
+    dates = get_months(start, end)
+    customer_ids = set(active_customers.values_list('id', flat=True))
+    rows = get_offering_stats_rows('costs', offering, dates, calculate_offering_costs)
+
+    for date in dates:
         stats = {
             'tax': 0,
             'total': 0,
             'price': 0,
             'price_current': 0,
-            'period': '%s-%02d' % (year, month),
+            'period': get_period(date),
         }
-        for item in invoice_items:
-            stats['tax'] += item.tax
-            stats['total'] += item.total
-            stats['price'] += item.price
-            stats['price_current'] += item.price_current
+        for row in rows[date]:
+            if row['customer_id'] not in customer_ids:
+                continue
+            tax = row['price'] * row['tax_percent'] / 100
+            stats['tax'] += tax
+            stats['total'] += row['price'] + tax
+            stats['price'] += row['price']
+            stats['price_current'] += row['price_current']
 
         costs.append(stats)
 
-        date += relativedelta(months=1)
-
     return costs
 
 
@@ -530,126 +620,130 @@ def get_active_customers(request, view):
     )
 
 
-def get_offering_component_stats(offering, active_customers, start, end):
-    component_stats = []
+def calculate_offering_component_stats(offering, dates):
+    """
+    Returns quantity and factor of invoice items of the offering grouped by
+    month, customer and plan component along with reported usage of offering components.
+    """
+    invoice_items = (
+        filter_invoice_items_by_months(
+            invoice_models.InvoiceItem.objects.filter(resource__offering=offering),
+            dates,
+        )
+        .annotate(plan_component_id=KeyTextTransform('plan_component_id', 'details'))
+        .filter(plan_component_id__isnull=False)
+        .annotate_factor()
+        .order_by()
+        .values(
+            'invoice__year',
+            'invoice__month',
+            'resource__project__customer_id',
+            'plan_component_id',
+        )
+        .annotate(quantity=Sum('quantity'), factor=Sum('computed_factor'))
+    )
+    component_usages = (
+        models.ComponentUsage.objects.filter(
+            component__offering=offering, billing_period__in=dates
+        )
+        .order_by()
+        .values('component_id', 'billing_period')
+        .annotate(usage=Sum('usage'))
+    )
 
-    resources = models.Resource.objects.filter(
-        offering=offering, project__customer__in=active_customers,
+    result = {date: {'items': [], 'usages': {}} for date in dates}
+    for row in invoice_items:
+        date = datetime.date(
+            year=row['invoice__year'], month=row['invoice__month'], day=1
+        )
+        result[date]['items'].append(
+            {
+                'customer_id': row['resource__project__customer_id'],
+                'plan_component_id': int(row['plan_component_id']),
+                'quantity': row['quantity'],
+                'factor': row['factor'],
+            }
+        )
+    for row in component_usages:
+        result[row['billing_period']]['usages'][row['component_id']] = row['usage']
+    return result
+
+
+def get_offering_component_stats(offering, active_customers, start, end):
+    component_stats = {}
+    dates = get_months(start, end)
+    customer_ids = set(active_customers.values_list('id', flat=True))
+    rows = get_offering_stats_rows(
+        'component_stats', offering, dates, calculate_offering_component_stats
+    )
+    plan_component_ids = {
+        item['plan_component_id'] for date in dates for item in rows[date]['items']
+    }
+    plan_components = models.PlanComponent.objects.select_related('component').in_bulk(
+        plan_component_ids
     )
-    resources_ids = resources.values_list('id', flat=True)
-    date = start
 
-    while date <= end:
-        year = date.year
-        month = date.month
-        period = '%s-%02d' % (year, month)
+    for date in dates:
+        period = get_period(date)
         # for consistency with usage resource usage reporting, assume values at the beginning of the last day
         period_visible = (
             core_utils.month_end(date)
             .replace(hour=0, minute=0, second=0, microsecond=0)
             .isoformat()
         )
-        invoice_items = invoice_models.InvoiceItem.objects.filter(
-            resource_id__in=resources_ids, invoice__year=year, invoice__month=month,
-        )
-
-        for item in invoice_items:
-            # Case when invoice item details includes plan component data.
-            plan_component_id = item.details.get('plan_component_id')
 
-            if not plan_component_id:
+        for item in rows[date]['items']:
+            if item['customer_id'] not in customer_ids:
                 continue
 
-            try:
-                plan_component = models.PlanComponent.objects.get(pk=plan_component_id)
-                offering_component = plan_component.component
-
-                if (
-                    offering_component.billing_type
-                    == models.OfferingComponent.BillingTypes.LIMIT
-                ):
-                    component_stats.append(
-                        {
-                            'usage': item.quantity,
-                            'description': offering_component.description,
-                            'measured_unit': offering_component.measured_unit,
-                            'type': offering_component.type,
-                            'name': offering_component.name,
-                            'period': period,
-                            'date': period_visible,
-                            'offering_component_id': offering_component.id,
-                        }
-                    )
+            plan_component_id = item['plan_component_id']
+            if plan_component_id not in plan_components:
+                logger.error(
+                    'PlanComponent with id %s is not found.' % plan_component_id
+                )
+                continue
 
-                if (
-                    offering_component.billing_type
-                    == models.OfferingComponent.BillingTypes.USAGE
-                ):
-                    if [
-                        *filter(
-                            lambda x: x['period'] == period
-                            and x['offering_component_id'] == offering_component.id,
-                            component_stats,
-                        )
-                    ]:
-                        continue
-
-                    usages = models.ComponentUsage.objects.filter(
-                        component=offering_component, billing_period=date
-                    ).aggregate(usage=Sum('usage'))['usage']
-
-                    component_stats.append(
-                        {
-                            'usage': usages,
-                            'description': offering_component.description,
-                            'measured_unit': offering_component.measured_unit,
-                            'type': offering_component.type,
-                            'name': offering_component.name,
-                            'period': period,
-                            'date': period_visible,
-                            'offering_component_id': offering_component.id,
-                        }
-                    )
+            offering_component = plan_components[plan_component_id].component
+            key = (period, offering_component.id)
+
+            if (
+                offering_component.billing_type
+                == models.OfferingComponent.BillingTypes.USAGE
+            ):
+                usage = rows[date]['usages'].get(offering_component.id)
+            elif (
+                offering_component.billing_type
+                == models.OfferingComponent.BillingTypes.LIMIT
+            ):
+                usage = item['quantity']
+            elif (
+                offering_component.billing_type
+                == models.OfferingComponent.BillingTypes.FIXED
+            ):
+                usage = item['factor']
+            else:
+                continue
 
+            if key in component_stats:
+                # Usage of usage-based component is reported for the whole offering
                 if (
                     offering_component.billing_type
-                    == models.OfferingComponent.BillingTypes.FIXED
+                    != models.OfferingComponent.BillingTypes.USAGE
                 ):
-                    other = [
-                        *filter(
-                            lambda x: x['period'] == period
-                            and x['offering_component_id'] == offering_component.id,
-                            component_stats,
-                        )
-                    ]
-                    if other:
-                        other[0]['usage'] += item.get_factor()
-                        continue
-
-                    component_stats.append(
-                        {
-                            'usage': item.get_factor(),
-                            'description': offering_component.description,
-                            'measured_unit': offering_component.measured_unit,
-                            'type': offering_component.type,
-                            'name': offering_component.name,
-                            'period': period,
-                            'date': period_visible,
-                            'offering_component_id': offering_component.id,
-                        }
-                    )
-
-            except models.PlanComponent.DoesNotExist:
-                logger.error(
-                    'PlanComponent with id %s is not found.' % plan_component_id
-                )
-
-        date += relativedelta(months=1)
+                    component_stats[key]['usage'] += usage
+                continue
 
-    # delete internal data
-    [s.pop('offering_component_id', None) for s in component_stats]
+            component_stats[key] = {
+                'usage': usage,
+                'description': offering_component.description,
+                'measured_unit': offering_component.measured_unit,
+                'type': offering_component.type,
+                'name': offering_component.name,
+                'period': period,
+                'date': period_visible,
+            }
 
-    return component_stats
+    return list(component_stats.values())
 
 
 class MoveResourceException(Exception):
@@ -57,19 +57,20 @@ class SecurityGroup(structure_models.SubResource):
         return 'openstack-sgp'
 
     def increase_backend_quotas_usage(self, validate=True):
-        self.tenant.add_quota_usage(
-            self.tenant.Quotas.security_group_count, 1, validate=validate
-        )
-        self.tenant.add_quota_usage(
-            self.tenant.Quotas.security_group_rule_count,
-            self.rules.count(),
+        self.tenant.add_quota_usages(
+            {
+                self.tenant.Quotas.security_group_count: 1,
+                self.tenant.Quotas.security_group_rule_count: self.rules.count(),
+            },
             validate=validate,
         )
 
     def decrease_backend_quotas_usage(self):
-        self.tenant.add_quota_usage(self.tenant.Quotas.security_group_count, -1)
-        self.tenant.add_quota_usage(
-            self.tenant.Quotas.security_group_rule_count, -self.rules.count()
+        self.tenant.add_quota_usages(
+            {
+                self.tenant.Quotas.security_group_count: -1,
+                self.tenant.Quotas.security_group_rule_count: -self.rules.count(),
+            }
         )
 
     def change_backend_quotas_usage_on_rules_update(
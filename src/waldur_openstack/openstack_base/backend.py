@@ -2,7 +2,12 @@ import datetime
 import hashlib
 import json
 import logging
+import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from cinderclient import exceptions as cinder_exceptions
 from cinderclient.v2 import client as cinder_client
@@ -24,10 +29,14 @@ from requests import ConnectionError
 from waldur_core.core.utils import QuietSession
 from waldur_core.structure.backend import ServiceBackend
 from waldur_core.structure.exceptions import SerializableBackendError
+from waldur_core.structure.utils import reconciliation
 from waldur_openstack.openstack.models import Tenant
 
 logger = logging.getLogger(__name__)
 
+# Number of threads used to list service properties concurrently
+PULL_WORKERS = 8
+
 VALID_VOLUME_TYPE_NAME_PATTERN = re.compile(r'^gigabytes_[a-z]+[-_a-z]+$')
 
 
@@ -111,6 +120,22 @@ class OpenStackSession(dict):
 
         raise OpenStackSessionExpired('OpenStack session is expired')
 
+    def refresh(self):
+        """
+        Issue new token within the same keystone session,
+        so that its HTTP connections are reused.
+        Session recovered from token can not be refreshed.
+        """
+        if not isinstance(self.auth, v3.Password):
+            raise OpenStackSessionExpired('OpenStack session is expired')
+
+        self.keystone_session.invalidate()
+        try:
+            self.keystone_session.get_auth_headers()
+        except keystone_exceptions.ClientException as e:
+            raise OpenStackAuthorizationFailed(e)
+        self['auth_ref'] = self.auth.auth_ref
+
     def __str__(self):
         return str({k: v if k != 'password' else '***' for k, v in self.items()})
 
@@ -121,7 +146,7 @@ class OpenStackClient:
     def __init__(self, session=None, verify_ssl=False, **credentials):
         self.verify_ssl = verify_ssl
         if session:
-            if isinstance(session, dict):
+            if isinstance(session, dict) and not isinstance(session, OpenStackSession):
                 logger.debug('Trying to recover OpenStack session.')
                 self.session = OpenStackSession.recover(session, verify_ssl=verify_ssl)
                 self.session.validate()
@@ -177,6 +202,116 @@ class OpenStackClient:
             raise OpenStackBackendError(e)
 
 
+class OpenStackSessionPool:
+    """
+    Per-process pool of authenticated OpenStack sessions.
+
+    Keystone session keeps token and HTTP connections,
+    so reusing it allows to skip authentication and TLS handshake
+    for each backend instance. Sessions which are about to expire
+    are refreshed before being returned.
+    Statistics of the pool are logged periodically.
+    """
+
+    # Minimum number of seconds between logging of statistics.
+    stats_log_interval = 600
+
+    def __init__(self, size=100):
+        self.size = size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.sessions = OrderedDict()
+        self.stats = dict(
+            hits=0, misses=0, refreshes=0, evictions=0, creations=0, creation_time=0.0
+        )
+        self.stats_logged_at = time.monotonic()
+
+    def get_or_create(self, key, create):
+        session = self.get(key)
+        if session is None:
+            started = time.perf_counter()
+            session = create()
+            elapsed = time.perf_counter() - started
+            logger.debug('OpenStack session has been created in %.3f seconds.', elapsed)
+            with self.lock:
+                self.stats['creations'] += 1
+                self.stats['creation_time'] += elapsed
+            self.put(key, session)
+        self.log_stats()
+        return session
+
+    def get(self, key):
+        with self.lock:
+            if self.pid != os.getpid():
+                # Connections must not be shared with parent process
+                self.reset()
+            session = self.sessions.get(key)
+            if session is None:
+                self.stats['misses'] += 1
+                return None
+            self.sessions.move_to_end(key)
+
+        try:
+            session.validate()
+        except OpenStackSessionExpired:
+            try:
+                session.refresh()
+            except OpenStackBackendError:
+                self.remove(key)
+                with self.lock:
+                    self.stats['misses'] += 1
+                return None
+            with self.lock:
+                self.stats['refreshes'] += 1
+
+        with self.lock:
+            self.stats['hits'] += 1
+        return session
+
+    def put(self, key, session):
+        with self.lock:
+            self.sessions[key] = session
+            self.sessions.move_to_end(key)
+            while len(self.sessions) > self.size:
+                self.sessions.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def remove(self, key):
+        with self.lock:
+            self.sessions.pop(key, None)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, size=len(self.sessions))
+
+    def log_stats(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.stats_logged_at < self.stats_log_interval:
+                return
+            self.stats_logged_at = now
+        stats = self.get_stats()
+        logger.info(
+            'OpenStack session pool of process %s: %s hits, %s misses, '
+            '%s refreshes, %s evictions, %s sessions created in %.3f seconds, '
+            '%s sessions are cached.',
+            self.pid,
+            stats['hits'],
+            stats['misses'],
+            stats['refreshes'],
+            stats['evictions'],
+            stats['creations'],
+            stats['creation_time'],
+            stats['size'],
+        )
+
+
+session_pool = OpenStackSessionPool()
+
+
 class BaseOpenStackBackend(ServiceBackend):
     def __init__(self, settings, tenant_id=None):
         self.settings = settings
@@ -216,30 +351,36 @@ class BaseOpenStackBackend(ServiceBackend):
         if not self.settings.uuid:
             return OpenStackClient(**credentials)
 
-        client = None
         attr_name = 'admin_session' if admin else 'session'
-        key = self._get_cached_session_key(admin)
         if hasattr(self, attr_name):  # try to get client from object
             client = getattr(self, attr_name)
-        elif key in cache:  # try to get session from cache
-            session = cache.get(key)
-            # Cache miss is signified by a return value of None
-            if session is not None:
-                try:
-                    client = OpenStackClient(session=session)
-                except (OpenStackSessionExpired, OpenStackAuthorizationFailed):
-                    pass
-
-        if client is None:  # create new token if session is not cached or expired
-            client = OpenStackClient(**credentials)
+        else:
+            key = self._get_cached_session_key(admin)
+            session = session_pool.get_or_create(
+                key, lambda: self._get_session(key, credentials)
+            )
+            client = OpenStackClient(session=session)
             setattr(self, attr_name, client)  # Cache client in the object
-            cache.set(key, dict(client.session), 10 * 60 * 60)  # Add session to cache
 
         if name:
             return getattr(client, name)
         else:
             return client
 
+    def _get_session(self, key, credentials):
+        session = cache.get(key)
+        # Cache miss is signified by a return value of None
+        if session is not None:  # try to recover session from cache
+            try:
+                return OpenStackClient(session=session).session
+            except (OpenStackSessionExpired, OpenStackAuthorizationFailed):
+                pass
+
+        # create new token if session is not cached or expired
+        client = OpenStackClient(**credentials)
+        cache.set(key, dict(client.session), 10 * 60 * 60)  # Add session to cache
+        return client.session
+
     def __getattr__(self, name):
         clients = 'keystone', 'nova', 'neutron', 'cinder', 'glance'
         for client in clients:
@@ -271,13 +412,25 @@ class BaseOpenStackBackend(ServiceBackend):
         else:
             return True
 
-    def _pull_tenant_quotas(self, backend_id, scope):
+    def _get_tenant_quotas(self, backend_id):
+        """
+        Return pair of quota limits and usages of tenant.
+        """
         # Cinder volumes and snapshots manager does not implement filtering by tenant_id.
         # Therefore we need to assume that tenant_id field is set up in backend settings.
         backend = BaseOpenStackBackend(self.settings, backend_id)
-        for quota_name, limit in backend.get_tenant_quotas_limits(backend_id).items():
+        return (
+            backend.get_tenant_quotas_limits(backend_id),
+            backend.get_tenant_quotas_usage(backend_id),
+        )
+
+    def _pull_tenant_quotas(self, backend_id, scope, quotas=None):
+        if quotas is None:
+            quotas = self._get_tenant_quotas(backend_id)
+        limits, usages = quotas
+        for quota_name, limit in limits.items():
             scope.set_quota_limit(quota_name, limit)
-        for quota_name, usage in backend.get_tenant_quotas_usage(backend_id).items():
+        for quota_name, usage in usages.items():
             scope.set_quota_usage(quota_name, usage)
 
     def get_tenant_quotas_limits(self, tenant_backend_id, admin=False):
@@ -432,13 +585,17 @@ class BaseOpenStackBackend(ServiceBackend):
     def _get_current_properties(self, model):
         return {p.backend_id: p for p in model.objects.filter(settings=self.settings)}
 
-    def _pull_images(self, model_class, filter_function=None, admin=False):
+    def _get_images(self, admin=False):
         glance = self.get_client('glance', admin)
         try:
-            images = glance.images.list()
+            return list(glance.images.list())
         except glance_exceptions.ClientException as e:
             raise OpenStackBackendError(e)
 
+    def _pull_images(self, model_class, filter_function=None, admin=False, images=None):
+        if images is None:
+            images = self._get_images(admin)
+
         images = [image for image in images if not image['status'] == 'deleted']
         if filter_function:
             images = list(filter(filter_function, images))
@@ -460,6 +617,56 @@ class BaseOpenStackBackend(ServiceBackend):
                 backend_id__in=cur_images.keys(), settings=self.settings
             ).delete()
 
+    def _pull_properties_concurrently(self, steps):
+        """
+        Steps are triples of name, listing function and pull function.
+        Listing functions issue independent API calls, so that they are run in
+        thread pool. They must not access database. Their results are passed
+        to pull functions which are run sequentially in the order of steps,
+        because later steps may depend on objects created by earlier ones.
+        Step is skipped if its listing function returns None.
+        Changes made by pull helpers are saved in bulk at the end of each step,
+        so that next steps read them from the database.
+        Return timing report in seconds of each step.
+        """
+
+        def pull_step(pull_items, items):
+            with reconciliation():
+                pull_items(items)
+
+        def timed(func):
+            started = time.perf_counter()
+            result = func()
+            return result, time.perf_counter() - started
+
+        # Authenticate once before sharing session between threads
+        self.get_client()
+
+        report = OrderedDict()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=PULL_WORKERS) as executor:
+            futures = [
+                (name, executor.submit(timed, get_items), pull_items)
+                for name, get_items, pull_items in steps
+            ]
+            for name, future, pull_items in futures:
+                items, fetch_time = future.result()
+                pull_time = 0.0
+                if items is not None:
+                    _, pull_time = timed(lambda: pull_step(pull_items, items))
+                report[name] = dict(fetch=fetch_time, pull=pull_time)
+
+        logger.info(
+            'Properties of service settings %s have been pulled in %.2f seconds. %s',
+            self.settings,
+            time.perf_counter() - started,
+            ', '.join(
+                '%s: fetch %.2f, pull %.2f' % (name, times['fetch'], times['pull'])
+                for name, times in report.items()
+            ),
+        )
+        return report
+
     def _delete_backend_floating_ip(self, backend_id, tenant_backend_id):
         neutron = self.neutron_client
         try:
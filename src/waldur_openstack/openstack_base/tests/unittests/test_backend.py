@@ -1,5 +1,5 @@
 import pickle  # noqa: S403
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from cinderclient import exceptions as cinder_exceptions
 from ddt import data, ddt
@@ -8,7 +8,11 @@ from keystoneclient import exceptions as keystone_exceptions
 from neutronclient.client import exceptions as neutron_exceptions
 from novaclient import exceptions as nova_exceptions
 
-from waldur_openstack.openstack_base.backend import OpenStackBackendError
+from waldur_openstack.openstack_base.backend import (
+    OpenStackBackendError,
+    OpenStackSessionExpired,
+    OpenStackSessionPool,
+)
 
 
 @ddt
@@ -36,3 +40,69 @@ class TestOpenStackBackendError(TestCase):
             pickle.loads(pickle.dumps(exc))  # noqa: S301
         except Exception as e:
             self.fail('Reraised exception is not serializable: %s' % str(e))
+
+
+class OpenStackSessionPoolTest(TestCase):
+    def setUp(self):
+        self.pool = OpenStackSessionPool(size=2)
+        self.session = mock.Mock()
+        self.create = mock.Mock(return_value=self.session)
+
+    def test_session_is_created_only_once(self):
+        self.assertEqual(self.pool.get_or_create('key', self.create), self.session)
+        self.assertEqual(self.pool.get_or_create('key', self.create), self.session)
+
+        self.create.assert_called_once()
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['creations'], 1)
+
+    def test_expiring_session_is_refreshed(self):
+        self.session.validate.side_effect = OpenStackSessionExpired()
+        self.pool.put('key', self.session)
+
+        self.assertEqual(self.pool.get_or_create('key', self.create), self.session)
+
+        self.session.refresh.assert_called_once()
+        self.create.assert_not_called()
+        self.assertEqual(self.pool.get_stats()['refreshes'], 1)
+
+    def test_session_is_created_if_it_can_not_be_refreshed(self):
+        expired_session = mock.Mock()
+        expired_session.validate.side_effect = OpenStackSessionExpired()
+        expired_session.refresh.side_effect = OpenStackSessionExpired()
+        self.pool.put('key', expired_session)
+
+        self.assertEqual(self.pool.get_or_create('key', self.create), self.session)
+        self.create.assert_called_once()
+
+    def test_least_recently_used_session_is_evicted(self):
+        self.pool.put('first', mock.Mock())
+        self.pool.put('second', mock.Mock())
+        self.pool.get('first')
+        self.pool.put('third', mock.Mock())
+
+        self.assertIsNotNone(self.pool.get('first'))
+        self.assertIsNone(self.pool.get('second'))
+        self.assertEqual(self.pool.get_stats()['evictions'], 1)
+
+    def test_pool_is_reset_in_forked_process(self):
+        self.pool.put('key', self.session)
+        self.pool.pid = -1
+        self.assertIsNone(self.pool.get('key'))
+
+    def test_stats_are_logged_periodically(self):
+        self.pool.stats_log_interval = 0
+        with self.assertLogs(
+            'waldur_openstack.openstack_base.backend', level='INFO'
+        ) as logs:
+            self.pool.get_or_create('key', self.create)
+        self.assertIn('1 sessions created', logs.output[0])
+
+    def test_stats_are_not_logged_before_interval_passes(self):
+        with mock.patch(
+            'waldur_openstack.openstack_base.backend.logger.info'
+        ) as log_info:
+            self.pool.get_or_create('key', self.create)
+        log_info.assert_not_called()
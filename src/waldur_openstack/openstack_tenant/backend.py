@@ -1,9 +1,11 @@
+import collections
 import logging
 import re
 
 from cinderclient import exceptions as cinder_exceptions
 from cinderclient.v2.contrib import list_extensions
 from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.utils import dateparse, timezone
 from django.utils.functional import cached_property
 from keystoneclient import exceptions as keystone_exceptions
@@ -12,11 +14,7 @@ from novaclient import exceptions as nova_exceptions
 
 from waldur_core.structure.backend import log_backend_action
 from waldur_core.structure.registry import get_resource_type
-from waldur_core.structure.utils import (
-    handle_resource_not_found,
-    handle_resource_update_success,
-    update_pulled_fields,
-)
+from waldur_core.structure.utils import reconcile_pulled_resources, update_pulled_fields
 from waldur_openstack.openstack_base.backend import (
     BaseOpenStackBackend,
     OpenStackBackendError,
@@ -57,21 +55,26 @@ class InternalIPSynchronizer:
     It is assumed that all subnets for the current tenant have been successfully synchronized.
     """
 
-    def __init__(self, neutron_client, tenant_id, settings):
+    def __init__(self, neutron_client, tenant_id, settings, backend_ports=None):
         self.neutron_client = neutron_client
         self.tenant_id = tenant_id
         self.settings = settings
+        self.backend_ports = backend_ports
 
     @cached_property
     def remote_ips(self):
         """
-        Fetch all Neutron ports for the current tenant.
+        Fetch all Neutron ports for the current tenant unless they are already fetched.
         Convert Neutron port to local internal IP model.
         """
-        try:
-            ips = self.neutron_client.list_ports(tenant_id=self.tenant_id)['ports']
-        except neutron_exceptions.NeutronClientException as e:
-            raise OpenStackBackendError(e)
+        ips = self.backend_ports
+        if ips is None:
+            try:
+                ips = self.neutron_client.list_ports(tenant_id=self.tenant_id)[
+                    'ports'
+                ]
+            except neutron_exceptions.NeutronClientException as e:
+                raise OpenStackBackendError(e)
 
         return [backend_internal_ip_to_internal_ip(ip) for ip in ips]
 
@@ -207,17 +210,37 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         return self.settings.options['external_network_id']
 
     def pull_service_properties(self):
-        self.pull_flavors()
-        self.pull_images()
-        self.pull_security_groups()
-        self.pull_quotas()
-        self.pull_networks()
-        self.pull_subnets()
-        self.pull_internal_ips()
-        self.pull_floating_ips()
-        self.pull_volume_types()
-        self.pull_volume_availability_zones()
-        self.pull_instance_availability_zones()
+        return self._pull_properties_concurrently(
+            self.get_service_properties_pull_steps()
+        )
+
+    def get_service_properties_pull_steps(self):
+        """
+        Steps are listed in dependency order:
+        internal IPs refer to subnets and subnets refer to networks,
+        floating IPs refer to internal IPs.
+        """
+        return [
+            ('flavors', self.get_flavors, self.pull_flavors),
+            ('images', self.get_images, self.pull_images),
+            ('security_groups', self.get_security_groups, self.pull_security_groups),
+            ('quotas', self.get_quotas, self.pull_quotas),
+            ('networks', self.get_networks, self.pull_networks),
+            ('subnets', self.get_subnets, self.pull_subnets),
+            ('internal_ips', self.get_ports, self.pull_internal_ips),
+            ('floating_ips', self.get_floating_ips, self.pull_floating_ips),
+            ('volume_types', self.get_volume_types, self.pull_volume_types),
+            (
+                'volume_availability_zones',
+                self.get_volume_availability_zones,
+                self.pull_volume_availability_zones,
+            ),
+            (
+                'instance_availability_zones',
+                self.get_instance_availability_zones,
+                self.pull_instance_availability_zones,
+            ),
+        ]
 
     def pull_resources(self):
         self.pull_volumes()
@@ -230,20 +253,11 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             service_settings=self.settings,
             state__in=[models.Volume.States.OK, models.Volume.States.ERRED],
         )
-        backend_volumes_map = {
-            backend_volume.backend_id: backend_volume
-            for backend_volume in backend_volumes
-        }
-        for volume in volumes:
-            try:
-                backend_volume = backend_volumes_map[volume.backend_id]
-            except KeyError:
-                handle_resource_not_found(volume)
-            else:
-                update_pulled_fields(
-                    volume, backend_volume, models.Volume.get_backend_fields()
-                )
-                handle_resource_update_success(volume)
+        reconcile_pulled_resources(
+            volumes,
+            backend_volumes,
+            lambda volume, backend_volume: models.Volume.get_backend_fields(),
+        )
 
     def pull_snapshots(self):
         backend_snapshots = self.get_snapshots()
@@ -251,20 +265,11 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             service_settings=self.settings,
             state__in=[models.Snapshot.States.OK, models.Snapshot.States.ERRED],
         )
-        backend_snapshots_map = {
-            backend_snapshot.backend_id: backend_snapshot
-            for backend_snapshot in backend_snapshots
-        }
-        for snapshot in snapshots:
-            try:
-                backend_snapshot = backend_snapshots_map[snapshot.backend_id]
-            except KeyError:
-                handle_resource_not_found(snapshot)
-            else:
-                update_pulled_fields(
-                    snapshot, backend_snapshot, models.Snapshot.get_backend_fields()
-                )
-                handle_resource_update_success(snapshot)
+        reconcile_pulled_resources(
+            snapshots,
+            backend_snapshots,
+            lambda snapshot, backend_snapshot: models.Snapshot.get_backend_fields(),
+        )
 
     def pull_instances(self):
         backend_instances = self.get_instances()
@@ -272,38 +277,31 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             service_settings=self.settings,
             state__in=[models.Instance.States.OK, models.Instance.States.ERRED],
         )
-        backend_instances_map = {
-            backend_instance.backend_id: backend_instance
-            for backend_instance in backend_instances
-        }
-        for instance in instances:
-            try:
-                backend_instance = backend_instances_map[instance.backend_id]
-            except KeyError:
-                handle_resource_not_found(instance)
-            else:
-                self.update_instance_fields(instance, backend_instance)
-                # XXX: can be optimized after https://goo.gl/BZKo8Y will be resolved.
-                self.pull_instance_security_groups(instance)
-                handle_resource_update_success(instance)
+        pulled_instances = reconcile_pulled_resources(
+            instances, backend_instances, self.get_instance_pulled_fields
+        )
+        self.pull_instances_security_groups(
+            [instance for (instance, _) in pulled_instances]
+        )
 
-    def update_instance_fields(self, instance, backend_instance):
+    def get_instance_pulled_fields(self, instance, backend_instance):
         # Preserve flavor fields in Waldur database if flavor is deleted in OpenStack
         fields = set(models.Instance.get_backend_fields())
         flavor_fields = {'flavor_name', 'flavor_disk', 'ram', 'cores', 'disk'}
         if not backend_instance.flavor_name:
             fields = fields - flavor_fields
-        fields = list(fields)
+        return list(fields)
 
-        update_pulled_fields(instance, backend_instance, fields)
-
-    def pull_flavors(self):
-        nova = self.nova_client
+    def get_flavors(self):
         try:
-            flavors = nova.flavors.findall()
+            return self.nova_client.flavors.findall()
         except nova_exceptions.ClientException as e:
             raise OpenStackBackendError(e)
 
+    def pull_flavors(self, flavors=None):
+        if flavors is None:
+            flavors = self.get_flavors()
+
         flavor_exclude_regex = self.settings.options.get('flavor_exclude_regex', '')
         name_pattern = (
             re.compile(flavor_exclude_regex) if flavor_exclude_regex else None
@@ -338,20 +336,25 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
                 backend_id__in=cur_flavors.keys(), settings=self.settings
             ).delete()
 
-    def pull_images(self):
-        self._pull_images(models.Image)
+    def get_images(self):
+        return self._get_images()
 
-    def pull_floating_ips(self):
-        # method assumes that instance internal IPs is up to date.
-        neutron = self.neutron_client
+    def pull_images(self, images=None):
+        self._pull_images(models.Image, images=images)
 
+    def get_floating_ips(self):
         try:
-            backend_floating_ips = neutron.list_floatingips(tenant_id=self.tenant_id)[
+            return self.neutron_client.list_floatingips(tenant_id=self.tenant_id)[
                 'floatingips'
             ]
         except neutron_exceptions.NeutronClientException as e:
             raise OpenStackBackendError(e)
 
+    def pull_floating_ips(self, backend_floating_ips=None):
+        # method assumes that instance internal IPs is up to date.
+        if backend_floating_ips is None:
+            backend_floating_ips = self.get_floating_ips()
+
         # Step 1. Prepare data
         imported_ips = {
             ip.backend_id: ip
@@ -457,15 +460,18 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
                     settings=self.settings, backend_id__in=stale_ids
                 ).delete()
 
-    def pull_security_groups(self):
-        neutron = self.neutron_client
+    def get_security_groups(self):
         try:
-            security_groups = neutron.list_security_groups(tenant_id=self.tenant_id)[
+            return self.neutron_client.list_security_groups(tenant_id=self.tenant_id)[
                 'security_groups'
             ]
         except neutron_exceptions.NeutronClientException as e:
             raise OpenStackBackendError(e)
 
+    def pull_security_groups(self, security_groups=None):
+        if security_groups is None:
+            security_groups = self.get_security_groups()
+
         for backend_security_group in security_groups:
             backend_id = backend_security_group['id']
             defaults = {
@@ -490,16 +496,24 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
 
         self._delete_stale_properties(models.SecurityGroup, security_groups)
 
-    def pull_quotas(self):
-        self._pull_tenant_quotas(self.tenant_id, self.settings)
+    def get_quotas(self):
+        return self._get_tenant_quotas(self.tenant_id)
 
-    def pull_networks(self):
-        neutron = self.neutron_client
+    def pull_quotas(self, quotas=None):
+        self._pull_tenant_quotas(self.tenant_id, self.settings, quotas=quotas)
+
+    def get_networks(self):
         try:
-            networks = neutron.list_networks(tenant_id=self.tenant_id)['networks']
+            return self.neutron_client.list_networks(tenant_id=self.tenant_id)[
+                'networks'
+            ]
         except neutron_exceptions.NeutronClientException as e:
             raise OpenStackBackendError(e)
 
+    def pull_networks(self, networks=None):
+        if networks is None:
+            networks = self.get_networks()
+
         for backend_network in networks:
             defaults = {
                 'name': backend_network['name'],
@@ -526,13 +540,18 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
 
         self._delete_stale_properties(models.Network, networks)
 
-    def pull_subnets(self):
-        neutron = self.neutron_client
+    def get_subnets(self):
         try:
-            subnets = neutron.list_subnets(tenant_id=self.tenant_id)['subnets']
+            return self.neutron_client.list_subnets(tenant_id=self.tenant_id)[
+                'subnets'
+            ]
         except neutron_exceptions.NeutronClientException as e:
             raise OpenStackBackendError(e)
 
+    def pull_subnets(self, subnets=None):
+        if subnets is None:
+            subnets = self.get_subnets()
+
         current_networks = {
             network.backend_id: network.id
             for network in models.Network.objects.filter(settings=self.settings).only(
@@ -1478,14 +1497,18 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
                 zone.available = actual
                 zone.save(update_fields=['available'])
 
-    def pull_instance_availability_zones(self):
+    def get_instance_availability_zones(self):
         try:
             # By default detailed flag is True, but OpenStack policy for detailed data is disabled.
             # Therefore we should explicitly pass detailed=False. Otherwise request fails.
-            backend_zones = self.nova_client.availability_zones.list(detailed=False)
+            return self.nova_client.availability_zones.list(detailed=False)
         except nova_exceptions.ClientException as e:
             raise OpenStackBackendError(e)
 
+    def pull_instance_availability_zones(self, backend_zones=None):
+        if backend_zones is None:
+            backend_zones = self.get_instance_availability_zones()
+
         self._pull_zones(backend_zones, models.InstanceAvailabilityZone)
 
     @log_backend_action()
@@ -1594,9 +1617,15 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
                 logger.info('About to delete internal IPs with IDs %s', stale_ids)
                 instance.internal_ips_set.filter(backend_id__in=stale_ids).delete()
 
-    def pull_internal_ips(self):
+    def get_ports(self):
+        try:
+            return self.neutron_client.list_ports(tenant_id=self.tenant_id)['ports']
+        except neutron_exceptions.NeutronClientException as e:
+            raise OpenStackBackendError(e)
+
+    def pull_internal_ips(self, backend_ports=None):
         synchronizer = InternalIPSynchronizer(
-            self.neutron_client, self.tenant_id, self.settings
+            self.neutron_client, self.tenant_id, self.settings, backend_ports
         )
         synchronizer.execute()
 
@@ -1770,6 +1799,68 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             else:
                 instance.security_groups.add(security_group)
 
+    def pull_instances_security_groups(self, instances):
+        """
+        Synchronize security groups of all instances using single listing of tenant ports
+        instead of one Nova call per instance. Security groups of instance are
+        security groups of its ports, the same way as Nova reports them.
+        """
+        if not instances:
+            return
+        try:
+            ports = self.neutron_client.list_ports(tenant_id=self.tenant_id)['ports']
+        except neutron_exceptions.NeutronClientException as e:
+            raise OpenStackBackendError(e)
+
+        backend_ids = collections.defaultdict(set)
+        for port in ports:
+            backend_ids[port['device_id']].update(port.get('security_groups', []))
+
+        security_groups = {
+            security_group.backend_id: security_group
+            for security_group in models.SecurityGroup.objects.filter(
+                settings=self.settings
+            ).exclude(backend_id='')
+        }
+        Membership = models.Instance.security_groups.through
+        local_ids = collections.defaultdict(set)
+        for instance_id, backend_id in (
+            Membership.objects.filter(instance__in=instances)
+            .exclude(securitygroup__backend_id='')
+            .values_list('instance_id', 'securitygroup__backend_id')
+        ):
+            local_ids[instance_id].add(backend_id)
+
+        stale_memberships = Q()
+        new_memberships = []
+        for instance in instances:
+            instance_backend_ids = backend_ids[instance.backend_id]
+            instance_local_ids = local_ids[instance.id]
+
+            stale_ids = instance_local_ids - instance_backend_ids
+            if stale_ids:
+                stale_memberships |= Q(
+                    instance_id=instance.id, securitygroup__backend_id__in=stale_ids
+                )
+
+            for group_id in instance_backend_ids - instance_local_ids:
+                try:
+                    security_group = security_groups[group_id]
+                except KeyError:
+                    logger.error(
+                        'Security group with id %s does not exist in database. '
+                        'Settings ID: %s' % (group_id, self.settings.id)
+                    )
+                else:
+                    new_memberships.append(
+                        Membership(instance=instance, securitygroup=security_group)
+                    )
+
+        with transaction.atomic():
+            if stale_memberships:
+                Membership.objects.filter(stale_memberships).delete()
+            Membership.objects.bulk_create(new_memberships)
+
     @log_backend_action()
     def push_instance_security_groups(self, instance):
         nova = self.nova_client
@@ -1936,7 +2027,10 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
     def _get_current_volume_types(self):
         return self._get_current_properties(models.VolumeType)
 
-    def pull_volume_types(self):
+    def get_volume_types(self):
+        """
+        Return list of volume types and ID of default volume type.
+        """
         try:
             volume_types = self.cinder_client.volume_types.list()
         except cinder_exceptions.ClientException as e:
@@ -1950,6 +2044,13 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         except cinder_exceptions.ClientException as e:
             raise OpenStackBackendError(e)
 
+        return volume_types, default_volume_type_id
+
+    def pull_volume_types(self, volume_types=None):
+        if volume_types is None:
+            volume_types = self.get_volume_types()
+        volume_types, default_volume_type_id = volume_types
+
         with transaction.atomic():
             cur_volume_types = self._get_current_volume_types()
             for backend_type in volume_types:
@@ -1968,13 +2069,22 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
                 backend_id__in=cur_volume_types.keys(), settings=self.settings
             ).delete()
 
-    def pull_volume_availability_zones(self):
+    def get_volume_availability_zones(self):
+        """
+        Return None if availability zones are not supported by Cinder.
+        """
         if not self.is_volume_availability_zone_supported():
-            return
+            return None
 
         try:
-            backend_zones = self.cinder_client.availability_zones.list()
+            return self.cinder_client.availability_zones.list()
         except cinder_exceptions.ClientException as e:
             raise OpenStackBackendError(e)
 
+    def pull_volume_availability_zones(self, backend_zones=None):
+        if backend_zones is None:
+            backend_zones = self.get_volume_availability_zones()
+        if backend_zones is None:
+            return
+
         self._pull_zones(backend_zones, models.VolumeAvailabilityZone)
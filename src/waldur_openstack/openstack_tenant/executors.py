@@ -969,6 +969,13 @@ class BackupDeleteExecutor(core_executors.DeleteExecutor):
             snapshot.save(update_fields=['state'])
         core_executors.DeleteExecutor.pre_apply(backup)
 
+    @classmethod
+    @transaction.atomic
+    def pre_apply_many(cls, backups, **kwargs):
+        snapshots = models.Snapshot.objects.filter(backups__in=backups).distinct()
+        core_utils.bulk_transition(list(snapshots), 'schedule_deleting')
+        return core_utils.bulk_transition(backups, 'schedule_deleting')
+
     @classmethod
     def get_task_signature(cls, backup, serialized_backup, force=False, **kwargs):
         serialized_snapshots = [
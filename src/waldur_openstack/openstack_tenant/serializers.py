@@ -16,6 +16,7 @@ from rest_framework.reverse import reverse
 from waldur_core.core import serializers as core_serializers
 from waldur_core.core import signals as core_signals
 from waldur_core.core import utils as core_utils
+from waldur_core.quotas import models as quotas_models
 from waldur_core.quotas import serializers as quotas_serializers
 from waldur_core.structure import models as structure_models
 from waldur_core.structure import serializers as structure_serializers
@@ -365,16 +366,15 @@ class VolumeExtendSerializer(serializers.Serializer):
     def update(self, instance: models.Volume, validated_data):
         new_size = validated_data.get('disk_size')
 
-        for quota_holder in instance.get_quota_scopes():
-            if not quota_holder:
-                continue
-            quota_holder.add_quota_usage(
-                quota_holder.Quotas.storage, new_size - instance.size, validate=True
-            )
-            if instance.type:
-                key = 'gigabytes_' + instance.type.name
-                delta = (new_size - instance.size) / 1024
-                quota_holder.add_quota_usage(key, delta, validate=True)
+        deltas = {'storage': new_size - instance.size}
+        if instance.type:
+            deltas['gigabytes_' + instance.type.name] = (
+                new_size - instance.size
+            ) / 1024
+        quotas_models.add_quota_usages(
+            [(quota_holder, deltas) for quota_holder in instance.get_quota_scopes()],
+            validate=True,
+        )
 
         instance.size = new_size
         instance.save(update_fields=['size'])
@@ -462,15 +462,14 @@ class VolumeRetypeSerializer(serializers.HyperlinkedModelSerializer):
         old_type = instance.type
         new_type = validated_data.get('type')
 
-        for quota_holder in instance.get_quota_scopes():
-            if not quota_holder:
-                continue
-            quota_holder.add_quota_usage(
-                'gigabytes_' + old_type.name, -1 * instance.size / 1024, validate=True,
-            )
-            quota_holder.add_quota_usage(
-                'gigabytes_' + new_type.name, instance.size / 1024, validate=True
-            )
+        deltas = {
+            'gigabytes_' + old_type.name: -1 * instance.size / 1024,
+            'gigabytes_' + new_type.name: instance.size / 1024,
+        }
+        quotas_models.add_quota_usages(
+            [(quota_holder, deltas) for quota_holder in instance.get_quota_scopes()],
+            validate=True,
+        )
 
         return super(VolumeRetypeSerializer, self).update(instance, validated_data)
 
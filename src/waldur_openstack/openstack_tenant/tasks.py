@@ -155,9 +155,6 @@ class BaseScheduleTask(core_tasks.BackgroundTask):
     model = NotImplemented
     resource_attribute = NotImplemented
 
-    def is_equal(self, other_task):
-        return self.name == other_task.get('name')
-
     @transaction.atomic()
     def run(self):
         schedules = self.model.objects.filter(
@@ -300,9 +297,6 @@ class ScheduleBackups(BaseScheduleTask):
 class BaseDeleteExpiredResourcesTask(core_tasks.BackgroundTask):
     model = NotImplemented
 
-    def is_equal(self, other_task):
-        return self.name == other_task.get('name')
-
     def _get_executor(self):
         raise NotImplementedError()
 
@@ -312,8 +306,7 @@ class BaseDeleteExpiredResourcesTask(core_tasks.BackgroundTask):
         resources = self.model.objects.filter(
             kept_until__lt=timezone.now(), state=core_models.StateMixin.States.OK
         )
-        for resource in resources:
-            executor.execute(resource)
+        executor.execute_many(list(resources))
 
 
 class DeleteExpiredBackups(BaseDeleteExpiredResourcesTask):
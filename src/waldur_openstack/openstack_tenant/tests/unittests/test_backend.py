@@ -3,10 +3,14 @@ from unittest import mock
 
 from cinderclient.v2.volumes import Volume
 from ddt import data, ddt
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from novaclient.v2.flavors import Flavor
 from novaclient.v2.servers import Server
 
+from waldur_core.core.utils import serialize_instance
+from waldur_core.structure.tasks import ServicePropertiesPullTask
 from waldur_openstack.openstack_tenant import models
 from waldur_openstack.openstack_tenant.backend import OpenStackTenantBackend
 
@@ -429,6 +433,103 @@ class PullSubnetsTest(BaseBackendTest):
         self.assertEqual(subnet.name, 'subnet-1')
 
 
+class PullServicePropertiesTest(BaseBackendTest):
+    def setUp(self):
+        super(PullServicePropertiesTest, self).setUp()
+        self.neutron_client_mock.list_networks.return_value = {
+            'networks': [{'id': 'network_id', 'name': 'Private', 'description': ''}]
+        }
+        self.neutron_client_mock.list_subnets.return_value = {
+            'subnets': [
+                {
+                    'id': 'subnet_id',
+                    'network_id': 'network_id',
+                    'name': 'subnet-1',
+                    'description': '',
+                    'cidr': '192.168.42.0/24',
+                    'ip_version': 4,
+                    'allocation_pools': [],
+                }
+            ]
+        }
+        backend = self.tenant_backend
+        backend.get_client = mock.Mock()
+        backend.get_service_properties_pull_steps = lambda: [
+            ('networks', backend.get_networks, backend.pull_networks),
+            ('subnets', backend.get_subnets, backend.pull_subnets),
+        ]
+
+    def test_subnets_are_pulled_after_networks(self):
+        self.tenant_backend.pull_service_properties()
+
+        subnet = models.SubNet.objects.get(settings=self.settings)
+        self.assertEqual(subnet.network.backend_id, 'network_id')
+
+    def test_timing_report_is_returned_for_each_step(self):
+        report = self.tenant_backend.pull_service_properties()
+
+        self.assertEqual(list(report.keys()), ['networks', 'subnets'])
+        self.assertEqual(set(report['networks'].keys()), {'fetch', 'pull'})
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+)
+class PullServicePropertiesTaskTest(BaseBackendTest):
+    def setUp(self):
+        super(PullServicePropertiesTaskTest, self).setUp()
+        self.instance = self.fixture.instance
+        self.internal_ip = self.fixture.internal_ip
+        self.internal_ip.backend_id = None
+        self.internal_ip.save()
+
+        self.neutron_client_mock.list_ports.return_value = {
+            'ports': [
+                {
+                    'id': 'port_id',
+                    'mac_address': 'DC-D6-5E-9B-49-70',
+                    'device_id': self.instance.backend_id,
+                    'device_owner': 'compute:nova',
+                    'fixed_ips': [
+                        {
+                            'ip_address': '10.0.0.2',
+                            'subnet_id': self.internal_ip.subnet.backend_id,
+                        }
+                    ],
+                }
+            ]
+        }
+        self.neutron_client_mock.list_floatingips.return_value = {
+            'floatingips': [
+                {
+                    'floating_ip_address': '0.0.0.0',  # noqa: S104
+                    'floating_network_id': 'new_backend_network_id',
+                    'status': 'DOWN',
+                    'id': 'new_backend_id',
+                    'port_id': 'port_id',
+                }
+            ]
+        }
+        backend = self.tenant_backend
+        backend.get_client = mock.Mock()
+        backend.get_service_properties_pull_steps = lambda: [
+            ('internal_ips', backend.get_ports, backend.pull_internal_ips),
+            ('floating_ips', backend.get_floating_ips, backend.pull_floating_ips),
+        ]
+
+    def test_floating_ip_is_linked_to_internal_ip_pulled_in_the_same_run(self):
+        with mock.patch(
+            'waldur_core.structure.models.ServiceSettings.get_backend',
+            return_value=self.tenant_backend,
+        ):
+            ServicePropertiesPullTask().run(serialize_instance(self.settings))
+
+        floating_ip = models.FloatingIP.objects.get(
+            settings=self.settings, backend_id='new_backend_id'
+        )
+        self.assertEqual(floating_ip.internal_ip, self.internal_ip)
+
+
 class VolumesBaseTest(BaseBackendTest):
     def _generate_volumes(self, backend=False, count=1):
         volumes = []
@@ -1123,6 +1224,100 @@ class GetInstancesTest(BaseBackendTest):
         self.assertEqual(sorted(returned_backend_ids), sorted(expected_backend_ids))
 
 
+class PullInstancesTest(BaseBackendTest):
+    def setUp(self):
+        super(PullInstancesTest, self).setUp()
+        self.security_group = factories.SecurityGroupFactory(settings=self.settings)
+        self.neutron_client_mock.list_ports.return_value = {'ports': []}
+
+    def _create_instances(self, count, **kwargs):
+        return factories.InstanceFactory.create_batch(
+            count,
+            service_settings=self.settings,
+            project=self.fixture.project,
+            state=models.Instance.States.OK,
+            **kwargs
+        )
+
+    def _pull_instances(self, instances, **kwargs):
+        backend_instances = [
+            models.Instance(
+                backend_id=instance.backend_id,
+                name=instance.name,
+                ram=instance.ram,
+                runtime_state=instance.runtime_state,
+                **kwargs
+            )
+            for instance in instances
+        ]
+        with mock.patch.object(
+            self.tenant_backend, 'get_instances', return_value=backend_instances
+        ):
+            self.tenant_backend.pull_instances()
+
+    def test_changed_fields_are_updated(self):
+        instances = self._create_instances(2)
+
+        self._pull_instances(instances, runtime_state='SHUTOFF')
+
+        for instance in instances:
+            instance.refresh_from_db()
+            self.assertEqual(instance.runtime_state, 'SHUTOFF')
+
+    def test_missing_instance_is_marked_as_erred(self):
+        instance, missing_instance = self._create_instances(2)
+
+        self._pull_instances([instance])
+
+        missing_instance.refresh_from_db()
+        self.assertEqual(missing_instance.state, models.Instance.States.ERRED)
+        self.assertEqual(missing_instance.error_message, 'Does not exist at backend.')
+
+    def test_erred_instance_is_recovered(self):
+        instance = self._create_instances(
+            1, state=models.Instance.States.ERRED, error_message='Failure'
+        )[0]
+
+        self._pull_instances([instance])
+
+        instance.refresh_from_db()
+        self.assertEqual(instance.state, models.Instance.States.OK)
+        self.assertEqual(instance.error_message, '')
+
+    def test_security_groups_are_pulled_with_single_listing(self):
+        instance, other_instance = self._create_instances(2)
+        stale_group = factories.SecurityGroupFactory(settings=self.settings)
+        other_instance.security_groups.add(stale_group)
+        self.neutron_client_mock.list_ports.return_value = {
+            'ports': [
+                {
+                    'device_id': instance.backend_id,
+                    'security_groups': [self.security_group.backend_id],
+                }
+            ]
+        }
+
+        self._pull_instances([instance, other_instance])
+
+        self.assertEqual(list(instance.security_groups.all()), [self.security_group])
+        self.assertEqual(other_instance.security_groups.count(), 0)
+        self.assertEqual(self.neutron_client_mock.list_ports.call_count, 1)
+        self.assertEqual(
+            self.nova_client_mock.servers.list_security_group.call_count, 0
+        )
+
+    def test_number_of_queries_does_not_depend_on_number_of_instances(self):
+        instances = self._create_instances(2)
+        with CaptureQueriesContext(connection) as small_queries:
+            self._pull_instances(instances)
+
+        instances += self._create_instances(20)
+        with CaptureQueriesContext(connection) as large_queries:
+            self._pull_instances(instances)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+
+
 class ImportInstanceTest(BaseBackendTest):
     def setUp(self):
         super(ImportInstanceTest, self).setUp()
@@ -27,14 +27,18 @@ class DeleteExpiredBackupsTaskTest(TestCase):
         )
 
     @mock.patch(
-        'waldur_openstack.openstack_tenant.executors.BackupDeleteExecutor.execute'
+        'waldur_openstack.openstack_tenant.executors.BackupDeleteExecutor.apply_signature'
     )
-    def test_command_starts_backend_deletion(self, mocked_execute):
+    def test_command_starts_backend_deletion(self, mocked_apply):
         tasks.DeleteExpiredBackups().run()
-        mocked_execute.assert_has_calls(
+        mocked_apply.assert_has_calls(
             [mock.call(self.expired_backup1), mock.call(self.expired_backup2),],
             any_order=True,
         )
+        self.expired_backup1.refresh_from_db()
+        self.assertEqual(
+            self.expired_backup1.state, models.Backup.States.DELETION_SCHEDULED
+        )
 
 
 class DeleteExpiredSnapshotsTaskTest(TestCase):
@@ -49,14 +53,18 @@ class DeleteExpiredSnapshotsTaskTest(TestCase):
         )
 
     @mock.patch(
-        'waldur_openstack.openstack_tenant.executors.SnapshotDeleteExecutor.execute'
+        'waldur_openstack.openstack_tenant.executors.SnapshotDeleteExecutor.apply_signature'
     )
-    def test_command_starts_snapshot_deletion(self, mocked_execute):
+    def test_command_starts_snapshot_deletion(self, mocked_apply):
         tasks.DeleteExpiredSnapshots().run()
-        mocked_execute.assert_has_calls(
+        mocked_apply.assert_has_calls(
             [mock.call(self.expired_snapshot1), mock.call(self.expired_snapshot2),],
             any_order=True,
         )
+        self.expired_snapshot1.refresh_from_db()
+        self.assertEqual(
+            self.expired_snapshot1.state, models.Snapshot.States.DELETION_SCHEDULED
+        )
 
 
 class BackupScheduleTaskTest(TestCase):
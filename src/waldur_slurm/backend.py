@@ -31,6 +31,7 @@ class SlurmBackend(ServiceBackend):
             port=settings.options.get('port', 22),
             key_path=django_settings.WALDUR_SLURM['PRIVATE_KEY_PATH'],
             use_sudo=settings.options.get('use_sudo', False),
+            control_persist=django_settings.WALDUR_SLURM['SSH_CONTROL_PERSIST'],
         )
 
     def pull_resources(self):
@@ -54,9 +55,53 @@ class SlurmBackend(ServiceBackend):
             return True
 
     def add_new_users(self, allocation):
+        """
+        Create missing associations between customer users and SLURM account.
+        Existing associations are fetched at once and missing ones
+        are created in a single round trip. If it fails, signal is sent
+        for associations which have been created before failure.
+        """
         users = allocation.project.customer.get_users()
-        for profile in freeipa_models.Profile.objects.filter(user__in=users):
-            self.add_user(allocation, profile.user, profile.username.lower())
+        profiles = freeipa_models.Profile.objects.filter(user__in=users)
+        if not profiles.exists():
+            return
+
+        account = allocation.backend_id
+
+        if not account.strip():
+            raise ServiceBackendError(
+                'Empty backend_id for allocation: %s' % allocation
+            )
+
+        existing_usernames = set(self.client.list_account_users(account))
+        new_profiles = {}
+        for profile in profiles:
+            username = profile.username.lower()
+            if username not in existing_usernames:
+                new_profiles[username] = profile
+        if not new_profiles:
+            return
+
+        default_account = self.settings.options.get('default_account')
+        usernames = sorted(new_profiles)
+        try:
+            self.client.create_associations(usernames, account, default_account)
+        except base.BatchError as e:
+            created_usernames = usernames[: len(e.outputs)]
+            self._notify_associations_created(
+                allocation, new_profiles, created_usernames
+            )
+            raise
+        self._notify_associations_created(allocation, new_profiles, usernames)
+
+    def _notify_associations_created(self, allocation, profiles, usernames):
+        for username in usernames:
+            signals.slurm_association_created.send(
+                models.Allocation,
+                allocation=allocation,
+                user=profiles[username].user,
+                username=username,
+            )
 
     def create_allocation(self, allocation):
         project = allocation.project
@@ -1,25 +1,39 @@
 import abc
 import logging
-import subprocess  # noqa: S404
 
 from django.utils.functional import cached_property
 
 from .structures import Quotas
+from .transports import SSHTransport, TransportError
 
 logger = logging.getLogger(__name__)
 
 
 class BatchError(Exception):
-    pass
+    def __init__(self, message, outputs=None):
+        super(BatchError, self).__init__(message)
+        self.outputs = outputs or []
 
 
 class BaseBatchClient(metaclass=abc.ABCMeta):
-    def __init__(self, hostname, key_path, username='root', port=22, use_sudo=False):
+    def __init__(
+        self,
+        hostname,
+        key_path,
+        username='root',
+        port=22,
+        use_sudo=False,
+        transport=None,
+        control_persist=0,
+    ):
         self.hostname = hostname
         self.key_path = key_path
         self.username = username
         self.port = port
         self.use_sudo = use_sudo
+        self.transport = transport or SSHTransport(
+            hostname, key_path, username, port, control_persist
+        )
 
     @abc.abstractmethod
     def list_accounts(self):
@@ -110,40 +124,30 @@ class BaseBatchClient(metaclass=abc.ABCMeta):
         raise NotImplementedError()
 
     def execute_command(self, command):
-        server = '%s@%s' % (self.username, self.hostname)
-        port = str(self.port)
-        if self.use_sudo:
-            account_command = ['sudo']
-        else:
-            account_command = []
-
-        account_command.extend(command)
-        ssh_command = [
-            'ssh',
-            '-o',
-            'UserKnownHostsFile=/dev/null',
-            '-o',
-            'StrictHostKeyChecking=no',
-            server,
-            '-p',
-            port,
-            '-i',
-            self.key_path,
-            ' '.join(account_command),
-        ]
         try:
-            logger.debug('Executing SSH command: %s', ' '.join(ssh_command))
-            return subprocess.check_output(  # noqa: S603
-                ssh_command, stderr=subprocess.STDOUT, encoding='utf-8'
+            return self.transport.execute(self._get_command(command))
+        except TransportError as e:
+            raise BatchError(e.output)
+
+    def execute_commands(self, commands):
+        """
+        Execute several commands in a single round trip.
+        :param commands: list[list[string]]
+        :return: list[string] output of each command
+        :raise: BatchError if any command has failed,
+        it contains output of commands completed before failure
+        """
+        try:
+            return self.transport.execute_many(
+                [self._get_command(command) for command in commands]
             )
-        except subprocess.CalledProcessError as e:
-            logger.exception('Failed to execute command "%s".', ssh_command)
-            stdout = e.output or ''
-            lines = stdout.splitlines()
-            if len(lines) > 0 and lines[0].startswith('Warning: Permanently added'):
-                lines = lines[1:]
-            stdout = '\n'.join(lines)
-            raise BatchError(stdout)
+        except TransportError as e:
+            raise BatchError(e.output, e.outputs)
+
+    def _get_command(self, command):
+        if self.use_sudo:
+            return ['sudo'] + command
+        return command
 
 
 class BaseReportLine(metaclass=abc.ABCMeta):
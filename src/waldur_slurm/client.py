@@ -94,15 +94,31 @@ class SlurmClient(BaseBatchClient):
 
     def create_association(self, username, account, default_account=''):
         return self._execute_command(
+            self._get_association_command(username, account, default_account)
+        )
+
+    def create_associations(self, usernames, account, default_account=''):
+        """
+        Create associations between users and account in a single round trip.
+        """
+        return self.execute_commands(
             [
-                'add',
-                'user',
-                username,
-                'account=%s' % account,
-                'DefaultAccount=%s' % default_account,
+                self._format_command(
+                    self._get_association_command(username, account, default_account)
+                )
+                for username in usernames
             ]
         )
 
+    def _get_association_command(self, username, account, default_account):
+        return [
+            'add',
+            'user',
+            username,
+            'account=%s' % account,
+            'DefaultAccount=%s' % default_account,
+        ]
+
     def delete_association(self, username, account):
         return self._execute_command(
             [
@@ -160,8 +176,13 @@ class SlurmClient(BaseBatchClient):
         ]
 
     def _execute_command(self, command, command_name='sacctmgr', immediate=True):
+        return self.execute_command(
+            self._format_command(command, command_name, immediate)
+        )
+
+    def _format_command(self, command, command_name='sacctmgr', immediate=True):
         account_command = [command_name, '--parsable2', '--noheader']
         if immediate:
             account_command.append('--immediate')
         account_command.extend(command)
-        return self.execute_command(account_command)
+        return account_command
@@ -1,3 +1,5 @@
+import os
+import tempfile
 from unittest import mock
 
 from django.conf import settings as django_settings
@@ -5,11 +7,13 @@ from django.test import TestCase
 from freezegun import freeze_time
 
 from waldur_freeipa import models as freeipa_models
-from waldur_slurm import models
+from waldur_slurm import models, signals
+from waldur_slurm.base import BatchError
 from waldur_slurm.client import SlurmClient
 from waldur_slurm.parser import SlurmReportLine
 
 from . import factories, fixtures
+from .utils import FakeTransport
 
 VALID_REPORT = """
 allocation1|cpu=1,mem=51200M,node=1,gres/gpu=1,gres/gpu:tesla=1|00:01:00|user1|
@@ -65,6 +69,12 @@ class BackendTest(TestCase):
             'UserKnownHostsFile=/dev/null',
             '-o',
             'StrictHostKeyChecking=no',
+            '-o',
+            'ControlMaster=auto',
+            '-o',
+            'ControlPath=%s' % os.path.join(tempfile.gettempdir(), 'waldur-ssh-%C'),
+            '-o',
+            'ControlPersist=600',
             'root@localhost',
             '-p',
             '22',
@@ -240,3 +250,49 @@ class BackendTest(TestCase):
         self.allocation.refresh_from_db()
         self.assertEqual(3, self.allocation.associations.count())
         self.assertNotIn(stale_association, self.allocation.associations.all())
+
+    def add_new_users(self, failures=None):
+        for user, username in (
+            (self.fixture.owner, 'user1'),
+            (self.fixture.manager, 'user2'),
+            (self.fixture.admin, 'user3'),
+        ):
+            freeipa_models.Profile.objects.create(user=user, username=username)
+        list_users = (
+            'sacctmgr --parsable2 --noheader --immediate list associations'
+            ' format=account,user where account=%s' % self.account
+        )
+        transport = FakeTransport(
+            {list_users: '%s|user1' % self.account}, failures=failures
+        )
+
+        backend = self.allocation.get_backend()
+        backend.client.transport = transport
+        with mock.patch.object(signals.slurm_association_created, 'send') as send:
+            try:
+                backend.add_new_users(self.allocation)
+            finally:
+                self.created_usernames = [
+                    call[1]['username'] for call in send.call_args_list
+                ]
+        return transport
+
+    def test_new_users_are_added_in_single_round_trip(self):
+        transport = self.add_new_users()
+
+        self.assertEqual(2, len(transport.round_trips))
+        self.assertEqual(
+            {'user2', 'user3'}, {command[6] for command in transport.round_trips[1]},
+        )
+        self.assertEqual(['user2', 'user3'], self.created_usernames)
+
+    def test_signal_is_sent_for_users_added_before_failure(self):
+        failed_command = (
+            'sacctmgr --parsable2 --noheader --immediate add user user3'
+            ' account=%s DefaultAccount=None' % self.account
+        )
+
+        with self.assertRaises(BatchError):
+            self.add_new_users(failures={failed_command})
+
+        self.assertEqual(['user2'], self.created_usernames)
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from waldur_slurm.transports import LocalTransport, SSHTransport, TransportError
+
+
+class LocalTransportTest(TestCase):
+    def setUp(self):
+        self.transport = LocalTransport()
+
+    def test_command_output_is_returned(self):
+        self.assertEqual('value\n', self.transport.execute(['echo', 'value']))
+
+    def test_pipelined_commands_outputs_are_split(self):
+        outputs = self.transport.execute_many(
+            [['echo', 'first'], ['true'], ['echo', 'third']]
+        )
+        self.assertEqual(['first', '', 'third'], outputs)
+
+    def test_pipeline_stops_at_first_failed_command(self):
+        with self.assertRaises(TransportError) as context:
+            self.transport.execute_many(
+                [['echo', 'first'], ['echo', 'failed', ';', 'false'], ['echo', 'last']]
+            )
+        self.assertEqual('failed', context.exception.output)
+        self.assertEqual(['first'], context.exception.outputs)
+
+
+class SSHTransportTest(TestCase):
+    @mock.patch('subprocess.check_output')
+    def test_pipelined_commands_are_sent_in_single_connection(self, check_output):
+        check_output.return_value = (
+            'a\n__WALDUR_EXIT_STATUS__ 0\nb\n__WALDUR_EXIT_STATUS__ 0\n'
+        )
+        transport = SSHTransport('localhost', '/etc/waldur/id_rsa', control_persist=60)
+        outputs = transport.execute_many([['echo', 'a'], ['echo', 'b']])
+
+        self.assertEqual(['a', 'b'], outputs)
+        self.assertEqual(1, check_output.call_count)
+        command = check_output.call_args[0][0]
+        self.assertIn('ControlMaster=auto', command)
+        self.assertIn('ControlPersist=60', command)
+
+    @mock.patch('subprocess.check_output')
+    def test_multiplexing_is_disabled(self, check_output):
+        transport = SSHTransport('localhost', '/etc/waldur/id_rsa')
+        transport.execute(['echo', 'a'])
+        command = check_output.call_args[0][0]
+        self.assertNotIn('ControlMaster=auto', command)
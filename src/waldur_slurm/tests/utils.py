@@ -3,8 +3,47 @@ import copy
 from django.conf import settings
 from django.test import override_settings
 
+from waldur_slurm.transports import BaseTransport, TransportError
+
 
 def override_plugin_settings(**kwargs):
     os_settings = copy.deepcopy(settings.WALDUR_SLURM)
     os_settings.update(kwargs)
     return override_settings(WALDUR_SLURM=os_settings)
+
+
+class FakeTransport(BaseTransport):
+    """
+    Transport which records commands instead of executing them.
+    Output is looked up by command line, empty output is returned by default.
+    Commands listed in failures fail with their output.
+    It allows to count round trips in tests and benchmarks.
+    """
+
+    def __init__(self, outputs=None, failures=None):
+        self.outputs = outputs or {}
+        self.failures = failures or set()
+        self.round_trips = []
+
+    def run(self, script):
+        return ''
+
+    def execute(self, command):
+        self.round_trips.append([command])
+        return self.execute_one(command, [])
+
+    def execute_many(self, commands):
+        self.round_trips.append(commands)
+        outputs = []
+        for command in commands:
+            outputs.append(self.execute_one(command, outputs))
+        return outputs
+
+    def execute_one(self, command, outputs):
+        output = self.get_output(command)
+        if ' '.join(command) in self.failures:
+            raise TransportError(output, outputs)
+        return output
+
+    def get_output(self, command):
+        return self.outputs.get(' '.join(command), '')
@@ -0,0 +1,183 @@
+import abc
+import logging
+import os
+import subprocess  # noqa: S404
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+EXIT_MARKER = '__WALDUR_EXIT_STATUS__'
+
+
+class TransportError(Exception):
+    def __init__(self, output, outputs=None):
+        """
+        :param output: [string] output of failed command
+        :param outputs: list[string] output of commands completed before failure
+        """
+        super(TransportError, self).__init__(output)
+        self.output = output
+        self.outputs = outputs or []
+
+
+class BaseTransport(metaclass=abc.ABCMeta):
+    """
+    Transport executes batch commands on SLURM master.
+    Several commands may be pipelined into a single round trip.
+    """
+
+    @abc.abstractmethod
+    def run(self, script):
+        """
+        Execute shell script.
+        :param script: [string] shell script
+        :return: [string] combined stdout and stderr of the script
+        :raise: subprocess.CalledProcessError if script has failed
+        """
+        raise NotImplementedError()
+
+    def execute(self, command):
+        """
+        Execute single command.
+        :param command: list[string] command and its arguments
+        :return: [string] command output
+        :raise: TransportError if command has failed
+        """
+        try:
+            return self.run(' '.join(command))
+        except subprocess.CalledProcessError as e:
+            logger.exception('Failed to execute command "%s".', command)
+            raise TransportError(self.clean_output(e.output))
+
+    def execute_many(self, commands):
+        """
+        Execute commands in a single round trip. Execution stops at first failed command.
+        :param commands: list[list[string]] commands and their arguments
+        :return: list[string] output of each command
+        :raise: TransportError if any command has failed,
+        it contains output of commands completed before failure
+        """
+        if not commands:
+            return []
+        script = '\n'.join(
+            '%s\nstatus=$?\necho %s $status\n[ $status -eq 0 ] || exit $status'
+            % (' '.join(command), EXIT_MARKER)
+            for command in commands
+        )
+        try:
+            output = self.run(script)
+        except subprocess.CalledProcessError as e:
+            logger.exception('Failed to execute commands "%s".', commands)
+            outputs = self.split_output(self.clean_output(e.output))
+            if outputs:
+                raise TransportError(outputs[-1], outputs[:-1])
+            raise TransportError(self.clean_output(e.output))
+        outputs = self.split_output(self.clean_output(output))
+        return outputs + [''] * (len(commands) - len(outputs))
+
+    def split_output(self, output):
+        """
+        Split output of pipelined script into outputs of separate commands.
+        """
+        outputs = []
+        lines = []
+        for line in (output or '').splitlines():
+            if line.startswith(EXIT_MARKER):
+                outputs.append('\n'.join(lines))
+                lines = []
+            else:
+                lines.append(line)
+        return outputs
+
+    def clean_output(self, output):
+        return output or ''
+
+    def close(self):
+        pass
+
+
+class LocalTransport(BaseTransport):
+    """
+    Execute commands on the local host. It is suitable when
+    Waldur runs on SLURM master or for benchmarking without network.
+    """
+
+    def run(self, script):
+        logger.debug('Executing local command: %s', script)
+        return subprocess.check_output(  # noqa: S603
+            ['sh', '-c', script], stderr=subprocess.STDOUT, encoding='utf-8'
+        )
+
+
+class SSHTransport(BaseTransport):
+    """
+    Execute commands over SSH. Connection is multiplexed via OpenSSH
+    control master, so that only the first command performs SSH handshake
+    and subsequent commands reuse the connection until it is idle
+    for control_persist seconds. Multiplexing is disabled if it is zero.
+    """
+
+    def __init__(self, hostname, key_path, username='root', port=22, control_persist=0):
+        self.hostname = hostname
+        self.key_path = key_path
+        self.username = username
+        self.port = port
+        self.control_persist = control_persist
+
+    @property
+    def control_path(self):
+        return os.path.join(tempfile.gettempdir(), 'waldur-ssh-%C')
+
+    def get_options(self):
+        options = [
+            'UserKnownHostsFile=/dev/null',
+            'StrictHostKeyChecking=no',
+        ]
+        if self.control_persist:
+            options += [
+                'ControlMaster=auto',
+                'ControlPath=%s' % self.control_path,
+                'ControlPersist=%s' % self.control_persist,
+            ]
+        return options
+
+    def get_command(self, script):
+        command = ['ssh']
+        for option in self.get_options():
+            command.extend(['-o', option])
+        command.extend(
+            [
+                '%s@%s' % (self.username, self.hostname),
+                '-p',
+                str(self.port),
+                '-i',
+                self.key_path,
+                script,
+            ]
+        )
+        return command
+
+    def run(self, script):
+        ssh_command = self.get_command(script)
+        logger.debug('Executing SSH command: %s', ' '.join(ssh_command))
+        return subprocess.check_output(  # noqa: S603
+            ssh_command, stderr=subprocess.STDOUT, encoding='utf-8'
+        )
+
+    def clean_output(self, output):
+        lines = (output or '').splitlines()
+        if len(lines) > 0 and lines[0].startswith('Warning: Permanently added'):
+            lines = lines[1:]
+        return '\n'.join(lines)
+
+    def close(self):
+        """
+        Stop control master so that connection is closed immediately.
+        """
+        if not self.control_persist:
+            return
+        command = self.get_command('')[:-1]
+        command[1:1] = ['-O', 'exit']
+        subprocess.call(  # noqa: S603
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )